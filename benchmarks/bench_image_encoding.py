@@ -0,0 +1,85 @@
+# bench_image_encoding.py
+# 对比不同缩放/格式/质量设置下的上传体积、视觉token数、编码耗时与（可选）模型响应延迟
+# 用法: python benchmarks/bench_image_encoding.py labeled.png [--live] [--repeat 5]
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from core.image_encoder import ImageEncoder, estimate_vision_tokens
+
+SETTINGS = [
+    (None, "PNG", 0),
+    (1920, "PNG", 0),
+    (1280, "PNG", 0),
+    (1920, "JPEG", 85),
+    (1280, "JPEG", 85),
+    (1280, "JPEG", 70),
+    (1280, "WEBP", 80),
+    (1024, "WEBP", 80),
+]
+
+
+def measure_live(encoded, model: str) -> tuple:
+    """发送一次最小请求，返回(延迟秒数, 服务端统计的输入token数)"""
+    from core.model_parser import ModelParser
+    parser = ModelParser()
+    start_time = time.time()
+    response = parser.client_qwen.chat.completions.create(
+        model=model,
+        messages=[{
+            "role": "user",
+            "content": [
+                {"type": "image_url", "image_url": {"url": encoded.data_url}},
+                {"type": "text", "text": "图中有多少个被框选的元素？只回答数字。"}
+            ]
+        }],
+        max_tokens=8
+    )
+    latency = time.time() - start_time
+    prompt_tokens = response.usage.prompt_tokens if response.usage else -1
+    return latency, prompt_tokens
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="VL图像编码设置对比")
+    arg_parser.add_argument("image", help="待测试的标注截图")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="每个设置的编码次数")
+    arg_parser.add_argument("--live", action="store_true", help="实际调用视觉模型测量延迟与token")
+    arg_parser.add_argument("--model", default="qwen2.5-vl-72b-instruct")
+    args = arg_parser.parse_args()
+
+    raw = Path(args.image).read_bytes()
+    header = f"{'最长边':>6} {'格式':>5} {'质量':>4} {'尺寸':>11} {'体积KB':>8} {'估算token':>9} {'编码ms':>7} {'缓存命中ms':>10}"
+    if args.live:
+        header += f" {'模型延迟s':>9} {'实际token':>9}"
+    print(header)
+
+    for max_long_side, image_format, quality in SETTINGS:
+        timings = []
+        for _ in range(args.repeat):
+            encoder = ImageEncoder(max_long_side, image_format, quality or 85)
+            start_time = time.perf_counter()
+            encoded = encoder.encode_bytes(raw)
+            timings.append((time.perf_counter() - start_time) * 1000)
+
+        start_time = time.perf_counter()
+        encoder.encode_bytes(raw)
+        cached_ms = (time.perf_counter() - start_time) * 1000
+
+        width, height = encoded.size
+        line = (
+            f"{str(max_long_side or '原图'):>6} {image_format:>5} {quality or '-':>4} "
+            f"{f'{width}x{height}':>11} {encoded.num_bytes / 1024:>8.1f} "
+            f"{estimate_vision_tokens(width, height):>9} {statistics.median(timings):>7.1f} {cached_ms:>10.2f}"
+        )
+        if args.live:
+            latency, prompt_tokens = measure_live(encoded, args.model)
+            line += f" {latency:>9.2f} {prompt_tokens:>9}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench_parse_data.py
+# 对比旧版parse_data（嵌套花括号正则 + json.loads/literal_eval逐条回退）与单遍解析器在大输出上的耗时
+# 用法: python benchmarks/bench_parse_data.py [--sizes 1000 10000] [--repeat 5]
+import argparse
+import ast
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from core.content_parser import parse_content
+from core.element_table import ElementTable
+
+_LEGACY_PATTERN = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
+
+
+def legacy_parse(result: str) -> ElementTable:
+    """旧版parse_data的解析部分"""
+    objs = []
+    for match in re.findall(_LEGACY_PATTERN, result):
+        try:
+            try:
+                icon_data = json.loads(match)
+            except json.JSONDecodeError:
+                icon_data = ast.literal_eval(match)
+            if all(key in icon_data for key in ["type", "content", "bbox"]):
+                objs.append(icon_data)
+        except Exception:
+            continue
+    return ElementTable.from_records((obj["type"], obj["content"], obj["bbox"]) for obj in objs)
+
+
+def make_elements(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    elements = []
+    for i in range(count):
+        x, y = rng.random() * 0.9, rng.random() * 0.9
+        elements.append({
+            "type": rng.choice(["text", "icon"]),
+            "bbox": [x, y, x + rng.random() * 0.1, y + rng.random() * 0.05],
+            "interactivity": rng.random() < 0.5,
+            "content": f"元素 {i} 'quoted' {{x}}" if i % 97 == 0 else f"按钮{i}",
+        })
+    return elements
+
+
+def as_python_repr(elements: list) -> str:
+    """解析服务默认的字符串格式: 每行"icon i: {Python字面量}"""
+    return "\n".join(f"icon {i}: {element!r}" for i, element in enumerate(elements))
+
+
+def as_json_lines(elements: list) -> str:
+    return "\n".join(f"icon {i}: {json.dumps(element, ensure_ascii=False)}" for i, element in enumerate(elements))
+
+
+def timed(func, payload, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(payload)
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="parse_data解析耗时对比")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"{'元素数':>6} {'格式':>8} {'旧版ms':>9} {'单遍ms':>9} {'加速比':>6}")
+    for size in args.sizes:
+        elements = make_elements(size)
+        for name, payload in (("python", as_python_repr(elements)), ("json", as_json_lines(elements))):
+            assert len(parse_content(payload).elements) == len(legacy_parse(payload)) == size
+            legacy_ms = timed(legacy_parse, payload, args.repeat)
+            single_ms = timed(parse_content, payload, args.repeat)
+            print(f"{size:>6} {name:>8} {legacy_ms:>9.1f} {single_ms:>9.1f} {legacy_ms / single_ms:>6.1f}x")
+        native_ms = timed(parse_content, elements, args.repeat)
+        print(f"{size:>6} {'原生list':>8} {'-':>9} {native_ms:>9.1f} {'-':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,13 @@
-from .screen_controller import PyAutoGUIWrapper 
-from .model_parser import ModelParser
+__all__ = ['PyAutoGUIWrapper', 'ModelParser']
 
-__all__ = ['PyAutoGUIWrapper', 'ModelParser']
\ No newline at end of file
+
+def __getattr__(name):
+    # 延迟导入：pyautogui在导入时即连接DISPLAY指定的X服务器，导入core包本身不应触发连接
+    # （并行回放的主进程没有显示器，需要先为每个工作进程设置好DISPLAY）
+    if name == 'PyAutoGUIWrapper':
+        from .screen_controller import PyAutoGUIWrapper
+        return PyAutoGUIWrapper
+    if name == 'ModelParser':
+        from .model_parser import ModelParser
+        return ModelParser
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,146 @@
+# action_history.py
+# 操作历史管理：保留最近K步原文，更早的操作压缩为滚动摘要，控制提示词随步数增长
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import config
+from core.prompt_compactor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 以原文形式保留的最近操作数
+HISTORY_KEEP_LAST = getattr(config, "HISTORY_KEEP_LAST", 3)
+# 滚动摘要的最大字符数
+HISTORY_SUMMARY_MAX_CHARS = getattr(config, "HISTORY_SUMMARY_MAX_CHARS", 300)
+
+
+class ActionHistory:
+    """操作历史管理器
+
+    对外表现为操作列表（可迭代、可取长度），用于保存完整记录；
+    render()生成发送给模型的压缩文本：连续重复的操作合并为一条并标注次数，
+    最近keep_last条保留原文，其余压缩为一行摘要。
+    """
+
+    def __init__(self, actions: Optional[Iterable[Dict[str, Any]]] = None,
+                 keep_last: int = HISTORY_KEEP_LAST,
+                 summary_max_chars: int = HISTORY_SUMMARY_MAX_CHARS):
+        self._actions: List[Dict[str, Any]] = list(actions or [])
+        self._notes: List[str] = []
+        self.keep_last = max(1, keep_last)
+        self.summary_max_chars = summary_max_chars
+        self._metrics = {"renders": 0, "raw_tokens": 0, "rendered_tokens": 0}
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._actions)
+
+    def __getitem__(self, index):
+        return self._actions[index]
+
+    def append(self, action: Dict[str, Any]) -> None:
+        """追加一条已执行的操作"""
+        self._actions.append(action)
+
+    def add_note(self, note: str) -> None:
+        """追加一条给模型的提示（如循环检测的换方法提示），不计入操作记录"""
+        self._notes = (self._notes + [note])[-2:]
+
+    def render(self) -> str:
+        """生成压缩后的历史文本
+
+        Returns:
+            历史文本，无操作时返回"无"
+        """
+        if not self._actions and not self._notes:
+            return "无"
+
+        collapsed = self._collapse_repeats(self._actions)
+        older, recent = collapsed[:-self.keep_last], collapsed[-self.keep_last:]
+
+        parts = []
+        if older:
+            parts.append(f"早期操作摘要({sum(n for _, n in older)}步): {self._summarize(older)}")
+        if recent:
+            parts.append("最近操作: " + "; ".join(
+                self._dumps(action) + (f" (重复{count}次)" if count > 1 else "")
+                for action, count in recent
+            ))
+        parts.extend(f"提示: {note}" for note in self._notes)
+        rendered = "\n".join(parts)
+
+        self._record_metrics(rendered)
+        return rendered
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """累计的token节省统计"""
+        saved = self._metrics["raw_tokens"] - self._metrics["rendered_tokens"]
+        return {**self._metrics, "saved_tokens": saved}
+
+    def _record_metrics(self, rendered: str) -> None:
+        """记录本次渲染相对于完整列表的token节省"""
+        raw_tokens = estimate_tokens(str(self._actions))
+        rendered_tokens = estimate_tokens(rendered)
+        self._metrics["renders"] += 1
+        self._metrics["raw_tokens"] += raw_tokens
+        self._metrics["rendered_tokens"] += rendered_tokens
+        logger.debug(f"操作历史压缩: {raw_tokens} -> {rendered_tokens} tokens")
+
+    @staticmethod
+    def _signature(action: Dict[str, Any]) -> str:
+        """操作的唯一签名，用于识别重复操作"""
+        return json.dumps(action, ensure_ascii=False, sort_keys=True, default=str)
+
+    def _collapse_repeats(self, actions: List[Dict[str, Any]]) -> List[tuple]:
+        """合并连续重复的操作，返回(操作, 次数)列表"""
+        collapsed: List[list] = []
+        last_signature = None
+        for action in actions:
+            signature = self._signature(action)
+            if signature == last_signature:
+                collapsed[-1][1] += 1
+            else:
+                collapsed.append([action, 1])
+                last_signature = signature
+        return [tuple(item) for item in collapsed]
+
+    @staticmethod
+    def _dumps(action: Dict[str, Any]) -> str:
+        """紧凑的单行JSON"""
+        return json.dumps(action, ensure_ascii=False, separators=(',', ':'), default=str)
+
+    def _summarize(self, items: List[tuple]) -> str:
+        """将早期操作压缩为摘要，超出长度时仅保留最近部分"""
+        phrases = []
+        for action, count in items:
+            phrase = self._describe(action)
+            phrases.append(f"{phrase}×{count}" if count > 1 else phrase)
+
+        summary = " → ".join(phrases)
+        if len(summary) > self.summary_max_chars:
+            summary = "…" + summary[-(self.summary_max_chars - 1):]
+        return summary
+
+    @staticmethod
+    def _describe(action: Dict[str, Any]) -> str:
+        """单个操作的简短描述"""
+        if not isinstance(action, dict):
+            return str(action)[:30]
+        action_type = action.get('action', 'unknown')
+        params = action.get('params') or {}
+        if action_type == 'hotkey':
+            return f"hotkey {'+'.join(params.get('key_sequence') or [])}"
+        if action_type == 'input':
+            return f"input {action.get('target', '')}'{str(params.get('text_content', ''))[:20]}'"
+        return f"{action_type} {action.get('target', '')}".strip()
+
+
+def render_history(pre_actions: Iterable[Dict[str, Any]]) -> str:
+    """渲染操作历史，兼容普通列表与ActionHistory"""
+    if isinstance(pre_actions, ActionHistory):
+        return pre_actions.render()
+    return ActionHistory(pre_actions).render()
@@ -0,0 +1,52 @@
+# action_schema.py
+# 动作格式的公共定义，供执行（utils）与模型输出校验（model_parser）共用
+import config
+
+# 组合操作允许的最大子操作数
+MAX_COMPOSITE_ACTIONS = getattr(config, "MAX_COMPOSITE_ACTIONS", 6)
+# 组合操作中允许的子操作类型
+COMPOSITE_SUB_ACTIONS = ("click", "input", "hotkey")
+
+# 执行者输出的动作JSON格式
+JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "action": {"type": "string"},
+        "target": {"type": "string"},
+        "value": {
+            "type": "object",
+            "properties": {
+                "button_type": {"type": "string"},
+                "text_content": {"type": "string"},
+                "key_sequence": {"type": "array"},
+                "direction": {"type": "string"},
+                "clicks": {"type": "integer"}
+            },
+        },
+        "params": {
+            "type": "object",
+            "properties": {
+                # input输入后是否按回车，缺省时单独的input回车、composite中的input不回车
+                "press_enter": {"type": "boolean"},
+                # composite操作的子操作列表，子操作均针对同一界面上的元素
+                "actions": {
+                    "type": "array",
+                    "minItems": 1,
+                    "maxItems": MAX_COMPOSITE_ACTIONS,
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "action": {"enum": list(COMPOSITE_SUB_ACTIONS)},
+                            "target": {"type": "string"},
+                            "params": {"type": "object"}
+                        },
+                        "required": ["id", "action"]
+                    }
+                }
+            }
+        }
+    },
+    "required": ["id", "action", "target"]
+}
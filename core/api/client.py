@@ -11,6 +11,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 import config
 import cv2
+from core.geometry import get_geometry
 
 
 class ProcessResult(NamedTuple):
@@ -143,26 +144,18 @@ class APIClient:
         print(f"匹配结果: {result}")
         if max_val > threshold:
             h, w = template_image_cv.shape[:2]
-            return (max_loc[0] + w//2, max_loc[1] + h//2)
+            return get_geometry().image_to_screen(max_loc[0] + w//2, max_loc[1] + h//2)
         return None
 
 def bbox_to_coords(bbox: tuple) -> tuple[float, float]:
-    """将 bbox 坐标转换为屏幕坐标"""
-    screen_width, screen_height = pyautogui.size()
-    xmin, ymin, xmax, ymax = bbox
-
-    # 计算相对坐标
-    x_center = (xmin + xmax) / 2 * screen_width
-    y_center = (ymin + ymax) / 2 * screen_height
-
-    # 坐标边界检查
-    x_center = max(0, min(x_center, screen_width))
-    y_center = max(0, min(y_center, screen_height))
+    """将 bbox 坐标转换为屏幕坐标（考虑截图区域偏移，使用缓存的显示器布局）"""
+    geometry = get_geometry()
+    x_center, y_center = geometry.bbox_to_screen(bbox)[0].tolist()
 
     # 调试日志优化
     debug_info = (
         f"\n坐标转换详情："
-        f"屏幕尺寸: {screen_width}x{screen_height}\n"
+        f"截图区域: {geometry.capture_region}\n"
         f"原始bbox: {bbox}\n"
         f"计算结果: ({x_center:.1f}, {y_center:.1f})"
     )
@@ -171,9 +164,19 @@ def bbox_to_coords(bbox: tuple) -> tuple[float, float]:
     return x_center, y_center
 
 def find_coordinates(icons: list, target_icon: str) -> tuple:
-    """在解析内容中查找指定的图标坐标"""
+    """在解析内容中按元素id查找指定的图标坐标（跨帧跟踪后id不再等于列表下标）"""
     try:
         index = int(target_icon)
+        if hasattr(icons, 'index_of'):
+            position = icons.index_of(index)
+            if position is None:
+                raise KeyError(index)
+            return icons.bboxes[position].tolist()
+        for icon in icons:
+            if icon.get('id') == index:
+                return icon['bbox']
+        if any('id' in icon for icon in icons):
+            raise KeyError(index)
         return icons[index]['bbox']
     except (ValueError, IndexError, KeyError) as e:
         raise ValueError(f"无效的图标索引: {target_icon}") from e
@@ -0,0 +1,136 @@
+# content_parser.py
+# 解析服务输出的解析器：直接接受原生list/dict；字符串格式先用一遍词法扫描把Python字面量改写为JSON，
+# 再由C实现的JSON解码器逐个解码顶层片段，格式错误的片段记录下来而不逐条抛出异常
+import json
+import logging
+import re
+import time
+from ast import literal_eval
+from typing import Any, Iterable, List, NamedTuple, Tuple, Union
+
+from core.element_table import ElementTable
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("type", "content", "bbox")
+
+# 需要改写的词法单元：字符串、常量与元组括号；其余符号两种写法一致。先行断言跳过不可能开始词法单元的字符
+_LITERAL_TOKEN = re.compile(
+    r"""(?=['"TFN()])(?:'[^'\\\n]*(?:\\.[^'\\\n]*)*'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"|\b(?:True|False|None)\b|[()])"""
+)
+_JSON_CONSTANTS = {"True": "true", "False": "false", "None": "null", "(": "[", ")": "]"}
+_DECODER = json.JSONDecoder()
+
+
+class ParseReport(NamedTuple):
+    elements: ElementTable
+    errors: List[str]
+    duration: float
+
+
+def _json_token(match: "re.Match") -> str:
+    """将单个Python字面量词法单元改写为等价的JSON写法"""
+    token = match.group(0)
+    first = token[0]
+    if first == '"':
+        return token
+    if first != "'":
+        return _JSON_CONSTANTS[token]
+    body = token[1:-1]
+    if "\\" not in body and '"' not in body:
+        return f'"{body}"'
+    # 含转义或双引号的字符串较少，交给标准解析器处理
+    try:
+        return json.dumps(literal_eval(token), ensure_ascii=False)
+    except (ValueError, SyntaxError):
+        return token
+
+
+def to_json_text(text: str) -> str:
+    """一遍词法扫描把Python字面量写法（单引号、True/False/None、元组）改写为JSON"""
+    return _LITERAL_TOKEN.sub(_json_token, text)
+
+
+def _iter_string_items(text: str, errors: List[str]) -> Iterable[Any]:
+    """线性扫描字符串：跳过片段之间的说明文字（如"icon 0: "），用C实现的JSON解码器逐个解码顶层片段
+
+    先按原文尝试第一个片段，是JSON则整段按JSON解码；否则整段改写一次后再解码。
+    只有格式错误的片段才会走异常分支，正常元素不产生异常。
+    """
+    pos = text.find("{")
+    if pos == -1:
+        return
+    try:
+        _DECODER.raw_decode(text, pos)
+    except json.JSONDecodeError:
+        text = to_json_text(text)
+        pos = text.find("{")
+
+    raw_decode = _DECODER.raw_decode
+    while pos != -1:
+        try:
+            value, end = raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            try:
+                # JSON与Python字面量混排时，单独改写该片段再试一次
+                fragment_end = text.find("\n", pos)
+                fragment_end = len(text) if fragment_end == -1 else fragment_end
+                value, _ = _DECODER.raw_decode(to_json_text(text[pos:fragment_end]))
+                end = fragment_end
+            except json.JSONDecodeError:
+                errors.append(f"位置{e.pos}: {e.msg} - {text[pos:pos + 50]}")
+                # 从出错位置之后继续，保证整体为线性扫描
+                pos = text.find("{", max(e.pos, pos + 1))
+                continue
+        yield value
+        pos = text.find("{", end)
+
+
+def _record(item: Any) -> Union[str, Tuple[str, Any, List[float]]]:
+    """校验单个元素字典并提取(type, content, bbox)，不合法时返回原因字符串"""
+    if not isinstance(item, dict):
+        return f"不是字典: {type(item).__name__}"
+    missing = [key for key in REQUIRED_FIELDS if key not in item]
+    if missing:
+        return f"缺少必要字段{missing}"
+    bbox = item["bbox"]
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4 or not all(isinstance(v, (int, float)) for v in bbox):
+        return f"bbox格式错误: {str(bbox)[:40]}"
+    return item["type"], item["content"], bbox
+
+
+def parse_content(payload: Any) -> ParseReport:
+    """解析解析服务的parsed_content
+
+    Args:
+        payload: 原生的元素列表/字典，或"icon 0: {...}"形式的字符串
+
+    Returns:
+        元素表、格式错误的片段说明与耗时
+    """
+    start_time = time.time()
+    errors: List[str] = []
+    if payload is None:
+        items: Iterable[Any] = []
+    elif isinstance(payload, str):
+        items = _iter_string_items(payload, errors)
+    elif isinstance(payload, dict):
+        # 单个元素，或以列表形式包装在某个键下
+        nested = next((v for v in payload.values() if isinstance(v, list)), None)
+        items = [payload] if nested is None or all(k in payload for k in REQUIRED_FIELDS) else nested
+    else:
+        items = payload
+
+    records = []
+    for item in items:
+        record = _record(item)
+        if isinstance(record, str):
+            errors.append(f"{record} - {str(item)[:50]}")
+            continue
+        records.append(record)
+
+    elements = ElementTable.from_records(records)
+    duration = time.time() - start_time
+    if errors:
+        logger.warning(f"解析数据: {len(errors)}个片段格式错误，首个: {errors[0]}")
+    return ParseReport(elements, errors, duration)
@@ -0,0 +1,155 @@
+# element_cache.py
+# 元素内容缓存：以元素截图区域的感知哈希为键缓存类型与内容，
+# 相同的工具栏按钮、图标在后续帧中直接复用标签
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+import config
+from core.local_detector import ImageLike, to_rgb_array
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件路径，启动时从该文件预热；默认与预存操作目录放在同一数据目录下，不随启动时的工作目录变化
+ELEMENT_CACHE_PATH = getattr(config, "ELEMENT_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.normpath(config.PRE_ACTIONS_PATH)), "element_cache.json"))
+# 最大缓存条目数，超出时淘汰最久未使用的条目
+ELEMENT_CACHE_MAX_ENTRIES = getattr(config, "ELEMENT_CACHE_MAX_ENTRIES", 5000)
+# 差值哈希边长，16对应256位，降低不同文字区域的哈希碰撞
+_HASH_SIZE = 16
+# 过小的区域哈希区分度不足，不参与缓存
+_MIN_CROP_SIDE = 6
+
+
+def crop_hash(image: np.ndarray, bbox: List[float]) -> Optional[str]:
+    """计算元素区域的差值哈希
+
+    Args:
+        image: RGB截图数组
+        bbox: 归一化的[xmin, ymin, xmax, ymax]
+
+    Returns:
+        "哈希:宽x高"形式的键（尺寸按8像素取整），区域过小时返回None
+    """
+    height, width = image.shape[:2]
+    x1, y1 = int(bbox[0] * width), int(bbox[1] * height)
+    x2, y2 = int(round(bbox[2] * width)), int(round(bbox[3] * height))
+    if x2 - x1 < _MIN_CROP_SIDE or y2 - y1 < _MIN_CROP_SIDE:
+        return None
+    gray = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (_HASH_SIZE + 1, _HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    digest = np.packbits(bits).tobytes().hex()
+    return f"{digest}:{round((x2 - x1) / 8)}x{round((y2 - y1) / 8)}"
+
+
+class ElementCache:
+    """按区域哈希缓存元素类型与内容的LRU缓存
+
+    annotate()对一帧的元素逐个查询：内容为空的元素（本地检测结果）从缓存补全标签；
+    已有内容的元素（远程解析结果）保持原样并写入缓存。差值哈希对文字的细微差别不敏感
+    （"report_v1.docx"与"report_v7.docx"可能得到相同的键），因此缓存只用于补全，
+    不覆盖解析出的非空内容。
+    """
+
+    def __init__(self, path: str = ELEMENT_CACHE_PATH, max_entries: int = ELEMENT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "labeled": 0, "updated": 0}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry
+
+    def put(self, key: str, element_type: str, content: str) -> None:
+        with self._lock:
+            self._entries[key] = {"type": element_type, "content": content}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def annotate(self, image: ImageLike, objs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """用缓存补全一帧中内容为空的元素（原地修改），并以非空内容更新缓存
+
+        Args:
+            image: 该帧截图
+            objs: parse_data输出的元素列表
+
+        Returns:
+            同一元素列表
+        """
+        if not objs:
+            return objs
+        frame = to_rgb_array(image)
+        for obj in objs:
+            key = crop_hash(frame, obj["bbox"])
+            if key is None:
+                continue
+            cached = self.get(key)
+            content = str(obj.get("content") or "").strip()
+            if cached is None:
+                if content:
+                    self.put(key, obj["type"], content)
+            elif not content:
+                obj["type"], obj["content"] = cached["type"], cached["content"]
+                self._stats["labeled"] += 1
+            elif content != cached["content"] or obj["type"] != cached["type"]:
+                # 以最新的解析结果为准，后续帧补全时使用新内容
+                self.put(key, obj["type"], content)
+                self._stats["updated"] += 1
+        return objs
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"元素缓存文件损坏，已忽略: {e}")
+            return
+        # 文件按从旧到新的顺序保存，超出容量时保留最新的条目
+        for key, entry in list(entries.items())[-self.max_entries:]:
+            self._entries[key] = entry
+        logger.info(f"已从 {self.path} 预热{len(self._entries)}条元素缓存")
+
+    def save(self) -> None:
+        """先写临时文件再替换，避免中途退出导致文件损坏"""
+        with self._lock:
+            snapshot = dict(self._entries)
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"保存元素缓存失败: {e}")
@@ -0,0 +1,178 @@
+# element_table.py
+# 数组存储的界面元素表：bbox为(N,4)的float32数组，类型为驻留的整数编码，内容存放在连续的字符串池中，
+# 同时以字典视图的形式兼容原有按obj["id"]/obj.get("content")访问元素的代码
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 全局类型驻留表：类型名 <-> 整数编码，所有元素表共享
+_TYPE_CODES: Dict[str, int] = {}
+_TYPE_NAMES: List[str] = []
+
+
+def intern_type(name: str) -> int:
+    """返回类型名的整数编码，首次出现时分配新编码"""
+    code = _TYPE_CODES.get(name)
+    if code is None:
+        code = _TYPE_CODES[name] = len(_TYPE_NAMES)
+        _TYPE_NAMES.append(name)
+    return code
+
+
+def type_name(code: int) -> str:
+    return _TYPE_NAMES[code]
+
+
+class ElementView(MutableMapping):
+    """元素表中单个元素的字典视图，读写直接作用于元素表的数组"""
+
+    __slots__ = ("_table", "_index")
+    _KEYS = ("id", "type", "content", "bbox")
+
+    def __init__(self, table: "ElementTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        table, i = self._table, self._index
+        if key == "id":
+            return int(table.ids[i])
+        if key == "type":
+            return type_name(table.type_codes[i])
+        if key == "content":
+            return table.content(i)
+        if key == "bbox":
+            return table.bboxes[i].tolist()
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        table, i = self._table, self._index
+        if key == "id":
+            table.ids[i] = value
+        elif key == "type":
+            table.type_codes[i] = intern_type(value)
+        elif key == "content":
+            table.set_content(i, value)
+        elif key == "bbox":
+            table.bboxes[i] = value
+        else:
+            raise KeyError(f"元素表不支持的字段: {key}")
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("元素表的字段不可删除")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ElementTable:
+    """以数组存储的界面元素表
+
+    - ids: (N,) int32
+    - type_codes: (N,) int16，对应全局类型驻留表
+    - bboxes: (N, 4) float32，归一化的[xmin, ymin, xmax, ymax]
+    - 内容池: 所有内容拼接成的一个字符串与(N+1,)的偏移数组
+
+    按下标或迭代得到的是ElementView，可像原来的字典一样读写；
+    修改的内容先记录在覆盖表中，不重建字符串池。
+    """
+
+    def __init__(self, ids: np.ndarray, type_codes: np.ndarray, bboxes: np.ndarray,
+                 content_pool: str, content_offsets: np.ndarray):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.type_codes = np.asarray(type_codes, dtype=np.int16)
+        self.bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        self._pool = content_pool
+        self._offsets = np.asarray(content_offsets, dtype=np.int64)
+        self._overrides: Dict[int, str] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[str, Any, Sequence[float]]],
+                     ids: Optional[Sequence[int]] = None) -> "ElementTable":
+        """由(type, content, bbox)记录构建元素表，未提供ids时按顺序编号"""
+        type_codes, contents, bboxes = [], [], []
+        for element_type, content, bbox in records:
+            type_codes.append(intern_type(str(element_type)))
+            contents.append("" if content is None else str(content))
+            bboxes.append(bbox)
+        offsets = np.zeros(len(contents) + 1, dtype=np.int64)
+        if contents:
+            np.cumsum([len(c) for c in contents], out=offsets[1:])
+        return cls(
+            np.arange(len(contents)) if ids is None else ids,
+            type_codes,
+            np.array(bboxes, dtype=np.float32).reshape(-1, 4),
+            "".join(contents),
+            offsets
+        )
+
+    @classmethod
+    def from_dicts(cls, objs: Iterable[Dict[str, Any]]) -> "ElementTable":
+        """由字典列表构建元素表（兼容旧格式）"""
+        objs = list(objs)
+        ids = [obj["id"] for obj in objs] if all("id" in obj for obj in objs) else None
+        return cls.from_records(((obj["type"], obj["content"], obj["bbox"]) for obj in objs), ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            return ElementView(self, int(index))
+        return self.take(index)
+
+    def __iter__(self) -> Iterator[ElementView]:
+        for i in range(len(self)):
+            yield ElementView(self, i)
+
+    def __repr__(self) -> str:
+        return f"ElementTable({len(self)}个元素)"
+
+    def content(self, index: int) -> str:
+        override = self._overrides.get(index)
+        if override is not None:
+            return override
+        return self._pool[self._offsets[index]:self._offsets[index + 1]]
+
+    def set_content(self, index: int, content: Any) -> None:
+        self._overrides[index] = "" if content is None else str(content)
+
+    def contents(self) -> List[str]:
+        return [self.content(i) for i in range(len(self))]
+
+    def types(self) -> List[str]:
+        return [type_name(code) for code in self.type_codes]
+
+    def rows(self) -> Iterator[Tuple[int, str, str]]:
+        """逐行产出(id, type, content)，供提示词序列化使用，不创建字典"""
+        names = _TYPE_NAMES
+        for i, (element_id, code) in enumerate(zip(self.ids.tolist(), self.type_codes.tolist())):
+            yield element_id, names[code], self.content(i)
+
+    def take(self, indices) -> "ElementTable":
+        """按下标数组或布尔掩码取子表，保留原id"""
+        indices = np.arange(len(self))[indices] if np.asarray(indices).dtype == bool else np.asarray(indices, dtype=int)
+        contents = [self.content(i) for i in indices.tolist()]
+        offsets = np.zeros(len(contents) + 1, dtype=np.int64)
+        if contents:
+            np.cumsum([len(c) for c in contents], out=offsets[1:])
+        return ElementTable(self.ids[indices], self.type_codes[indices], self.bboxes[indices], "".join(contents), offsets)
+
+    def index_of(self, element_id: int) -> Optional[int]:
+        """按元素id查找下标"""
+        matches = np.flatnonzero(self.ids == element_id)
+        return int(matches[0]) if len(matches) else None
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(view) for view in self]
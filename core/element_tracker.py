@@ -0,0 +1,169 @@
+# element_tracker.py
+# 跨帧元素跟踪：按位置重叠与内容相似度匹配相邻两帧的元素，分配持久ID并给出元素变化
+import difflib
+import logging
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 匹配得分中IoU的权重，其余为内容相似度
+TRACKER_IOU_WEIGHT = getattr(config, "TRACKER_IOU_WEIGHT", 0.6)
+# 低于该得分的元素对不视为同一元素
+TRACKER_MATCH_THRESHOLD = getattr(config, "TRACKER_MATCH_THRESHOLD", 0.35)
+# 中心点偏移超过该值（归一化坐标）视为移动
+TRACKER_MOVE_TOLERANCE = getattr(config, "TRACKER_MOVE_TOLERANCE", 0.01)
+
+
+class ElementDiff(NamedTuple):
+    added: List[Dict[str, Any]]
+    removed: List[Dict[str, Any]]
+    moved: List[Dict[str, Any]]
+    unchanged: int
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.moved)
+
+    def summary(self) -> str:
+        return f"新增{len(self.added)} 移除{len(self.removed)} 移动{len(self.moved)} 不变{self.unchanged}"
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """计算两组框两两之间的IoU
+
+    Args:
+        boxes_a: (N, 4)的[xmin, ymin, xmax, ymax]
+        boxes_b: (M, 4)的[xmin, ymin, xmax, ymax]
+
+    Returns:
+        (N, M)的IoU矩阵
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def content_similarity(a: str, b: str) -> float:
+    """内容相似度；双方都为空时无法判断，取0.5"""
+    if not a and not b:
+        return 0.5
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def _bbox_array(objs) -> np.ndarray:
+    """元素表直接返回其bbox数组，字典列表则转换为数组"""
+    bboxes = getattr(objs, "bboxes", None)
+    if bboxes is None:
+        bboxes = np.array([obj["bbox"] for obj in objs], dtype=np.float32).reshape(-1, 4)
+    return bboxes
+
+
+def _snapshot(objs):
+    """保存当前帧元素的副本，作为下一帧匹配的基准"""
+    if hasattr(objs, "take"):
+        return objs.take(np.arange(len(objs)))
+    return [dict(obj) for obj in objs]
+
+
+class ElementTracker:
+    """为连续帧中的同一元素保持相同的ID
+
+    首帧沿用parse_data的编号；之后每帧与上一帧按 IoU×权重 + 内容相似度×(1-权重)
+    计算得分，类型不同的元素不匹配，按得分从高到低贪心分配。未匹配的新元素分配新ID，
+    ID在一次跟踪过程中不会复用。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._previous: List[Dict[str, Any]] = []
+        self._next_id = 0
+
+    def update(self, objs: List[Dict[str, Any]]) -> ElementDiff:
+        """匹配当前帧元素并原地改写其id
+
+        Args:
+            objs: parse_data输出的元素列表
+
+        Returns:
+            相对上一帧的元素变化
+        """
+        if not len(self._previous):
+            self._next_id = max((obj["id"] for obj in objs), default=-1) + 1
+            self._previous = _snapshot(objs)
+            return ElementDiff(list(objs), [], [], 0)
+
+        matches = self._match(self._previous, objs)
+        added, moved = [], []
+        for j, obj in enumerate(objs):
+            i = matches.get(j)
+            if i is None:
+                obj["id"] = self._next_id
+                self._next_id += 1
+                added.append(obj)
+                continue
+            previous = self._previous[i]
+            obj["id"] = previous["id"]
+            if self._center_shift(previous["bbox"], obj["bbox"]) > TRACKER_MOVE_TOLERANCE:
+                moved.append(obj)
+
+        matched = set(matches.values())
+        removed = [obj for i, obj in enumerate(self._previous) if i not in matched]
+        self._previous = _snapshot(objs)
+        diff = ElementDiff(added, removed, moved, len(matches) - len(moved))
+        logger.info(f"元素跟踪: {diff.summary()}")
+        return diff
+
+    @staticmethod
+    def _match(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Dict[int, int]:
+        """贪心匹配，返回 当前帧下标 -> 上一帧下标"""
+        if not len(previous) or not len(current):
+            return {}
+        ious = iou_matrix(_bbox_array(previous), _bbox_array(current))
+
+        # 只为有重叠或内容完全相同的元素对计算内容相似度，避免N×M次字符串比较
+        by_content: Dict[tuple, List[int]] = {}
+        for i, obj in enumerate(previous):
+            content = str(obj.get("content") or "")
+            if content:
+                by_content.setdefault((obj.get("type"), content), []).append(i)
+
+        candidates = []
+        for j, obj in enumerate(current):
+            content = str(obj.get("content") or "")
+            overlapping = set(np.nonzero(ious[:, j])[0].tolist())
+            overlapping.update(by_content.get((obj.get("type"), content), []))
+            for i in overlapping:
+                if previous[i].get("type") != obj.get("type"):
+                    continue
+                similarity = content_similarity(str(previous[i].get("content") or ""), content)
+                score = TRACKER_IOU_WEIGHT * float(ious[i, j]) + (1 - TRACKER_IOU_WEIGHT) * similarity
+                if score >= TRACKER_MATCH_THRESHOLD:
+                    candidates.append((score, i, j))
+
+        matches: Dict[int, int] = {}
+        used = set()
+        for score, i, j in sorted(candidates, reverse=True):
+            if i in used or j in matches:
+                continue
+            matches[j] = i
+            used.add(i)
+        return matches
+
+    @staticmethod
+    def _center_shift(bbox_a: List[float], bbox_b: List[float]) -> float:
+        dx = (bbox_a[0] + bbox_a[2] - bbox_b[0] - bbox_b[2]) / 2
+        dy = (bbox_a[1] + bbox_a[3] - bbox_b[1] - bbox_b[3]) / 2
+        return max(abs(dx), abs(dy))
@@ -0,0 +1,54 @@
+# file_lock.py
+# 跨进程文件锁：以独占方式创建锁文件，Windows与Linux通用，供多个进程共用的缓存文件读改写
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import config
+
+# 获取锁的超时时间（秒）
+FILE_LOCK_TIMEOUT = getattr(config, "FILE_LOCK_TIMEOUT", 10.0)
+# 锁文件超过该时长（秒）未释放视为持有者已崩溃，可以移除
+FILE_LOCK_STALE = getattr(config, "FILE_LOCK_STALE", 30.0)
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = FILE_LOCK_TIMEOUT, stale: float = FILE_LOCK_STALE,
+              poll: float = 0.01) -> Iterator[None]:
+    """持有锁文件期间执行
+
+    Args:
+        path: 锁文件路径
+        timeout: 获取锁的超时时间（秒）
+        stale: 锁文件存在超过该时长视为残留
+        poll: 重试间隔（秒）
+
+    Raises:
+        TimeoutError: 超时仍未获取到锁
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:
+                    os.remove(path)
+                    continue
+            except OSError:
+                # 锁文件恰好被持有者释放
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"获取文件锁超时: {path}")
+            time.sleep(poll)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
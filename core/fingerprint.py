@@ -0,0 +1,126 @@
+# fingerprint.py
+# 屏幕指纹：感知哈希 + 元素集签名，用于判断两个界面状态是否相同
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 感知哈希允许的最大汉明距离（共64位）
+FINGERPRINT_MAX_DISTANCE = getattr(config, "FINGERPRINT_MAX_DISTANCE", 6)
+
+ImageLike = Union[str, Image.Image, np.ndarray]
+
+
+def _to_gray_array(image: ImageLike) -> np.ndarray:
+    """将路径、PIL图像或数组统一转换为灰度数组"""
+    if isinstance(image, str):
+        image = Image.open(image)
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('L'))
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return image
+
+
+def perceptual_hash(image: ImageLike) -> str:
+    """计算64位DCT感知哈希
+
+    Args:
+        image: 图像路径、PIL图像或数组
+
+    Returns:
+        16位十六进制字符串
+    """
+    gray = cv2.resize(_to_gray_array(image), (32, 32), interpolation=cv2.INTER_AREA)
+    low_freq = cv2.dct(np.float32(gray))[:8, :8].flatten()
+    bits = low_freq > np.median(low_freq[1:])
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+
+def crop_box(image_size, x: float, y: float, half_width: int, half_height: int):
+    """以图像像素坐标(x, y)为中心的矩形(left, top, right, bottom)，裁剪到图像范围内"""
+    width, height = image_size
+    left, top = max(0, int(x - half_width)), max(0, int(y - half_height))
+    right, bottom = min(width, int(x + half_width)), min(height, int(y + half_height))
+    return left, top, max(left + 1, right), max(top + 1, bottom)
+
+
+def region_hash(image: ImageLike, box) -> str:
+    """图像中局部区域的感知哈希，用于判断某个元素附近是否与记录时一致"""
+    left, top, right, bottom = box
+    return perceptual_hash(_to_gray_array(image)[top:bottom, left:right])
+
+
+def region_difference(image_a: ImageLike, image_b: ImageLike, box) -> float:
+    """两张同尺寸截图在局部区域内的平均灰度差"""
+    left, top, right, bottom = box
+    crop_a = _to_gray_array(image_a)[top:bottom, left:right].astype(np.int16)
+    crop_b = _to_gray_array(image_b)[top:bottom, left:right].astype(np.int16)
+    return float(np.abs(crop_a - crop_b).mean())
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """两个十六进制哈希的汉明距离"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def element_signature(objs: Optional[Iterable[Dict[str, Any]]]) -> str:
+    """元素集签名：与元素顺序和细微位置偏移无关的类型与内容集合摘要
+
+    Args:
+        objs: 界面元素列表
+
+    Returns:
+        16位十六进制字符串，元素为空时返回空字符串
+    """
+    if not objs:
+        return ""
+    items = sorted(f"{obj.get('type', '')}:{str(obj.get('content', '')).strip()}" for obj in objs)
+    return hashlib.sha1("\n".join(items).encode("utf-8")).hexdigest()[:16]
+
+
+class ScreenFingerprint(NamedTuple):
+    phash: str
+    elements: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.phash}:{self.elements}"
+
+    def distance(self, other: "ScreenFingerprint") -> int:
+        return hamming_distance(self.phash, other.phash)
+
+    def matches(self, other: "ScreenFingerprint", max_distance: int = FINGERPRINT_MAX_DISTANCE) -> bool:
+        """判断是否为同一界面状态；任一方缺少元素签名时仅比较感知哈希"""
+        if self.distance(other) > max_distance:
+            return False
+        return not self.elements or not other.elements or self.elements == other.elements
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"phash": self.phash, "elements": self.elements}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["ScreenFingerprint"]:
+        if not data or not data.get("phash"):
+            return None
+        return cls(phash=data["phash"], elements=data.get("elements", ""))
+
+
+def fingerprint(image: ImageLike, objs: Optional[Iterable[Dict[str, Any]]] = None) -> ScreenFingerprint:
+    """计算屏幕指纹
+
+    Args:
+        image: 截图
+        objs: 解析出的界面元素，未解析时可省略
+
+    Returns:
+        屏幕指纹
+    """
+    return ScreenFingerprint(perceptual_hash(image), element_signature(objs))
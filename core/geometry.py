@@ -0,0 +1,210 @@
+# geometry.py
+# 显示几何服务：缓存显示器布局（位置、尺寸、DPI缩放）与当前截图区域，
+# 统一负责归一化bbox、截图像素与屏幕坐标之间的转换
+import logging
+import sys
+import threading
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pyautogui
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 没有显示器变化事件时，布局缓存的最长有效期（秒）
+GEOMETRY_REFRESH_INTERVAL = getattr(config, "GEOMETRY_REFRESH_INTERVAL", 5.0)
+
+
+class Monitor(NamedTuple):
+    """单个显示器，坐标为pyautogui使用的屏幕坐标"""
+    left: int
+    top: int
+    width: int
+    height: int
+    dpi_scale: float = 1.0  # 系统显示缩放比例，仅用于记录；坐标换算以实测的截图缩放为准
+    primary: bool = False
+
+    @property
+    def rect(self) -> Tuple[int, int, int, int]:
+        return self.left, self.top, self.width, self.height
+
+
+def _query_win32_monitors() -> List[Monitor]:
+    import ctypes
+    import win32api
+    monitors = []
+    for handle, _, (left, top, right, bottom) in win32api.EnumDisplayMonitors():
+        dpi_scale = 1.0
+        try:
+            factor = ctypes.c_uint()
+            ctypes.windll.shcore.GetScaleFactorForMonitor(int(handle), ctypes.byref(factor))
+            dpi_scale = factor.value / 100 or 1.0
+        except (AttributeError, OSError):
+            pass
+        primary = bool(win32api.GetMonitorInfo(handle).get("Flags", 0) & 1)
+        monitors.append(Monitor(left, top, right - left, bottom - top, dpi_scale, primary))
+    return monitors
+
+
+def query_monitors() -> List[Monitor]:
+    """查询当前显示器布局；平台接口不可用时退化为pyautogui报告的单个主屏"""
+    if sys.platform == "win32":
+        try:
+            monitors = _query_win32_monitors()
+            if monitors:
+                return monitors
+        except Exception as e:
+            logger.warning(f"枚举显示器失败，按单屏处理: {str(e)}")
+    width, height = pyautogui.size()
+    return [Monitor(0, 0, width, height, 1.0, True)]
+
+
+class DisplayGeometry:
+    """缓存的显示器布局与坐标转换
+
+    - monitors/primary/virtual_bounds: 显示器布局，超过刷新间隔或收到变化事件后重新查询
+    - capture_region: 当前截图覆盖的屏幕区域(left, top, width, height)，默认为主屏；
+      parse_data输出的归一化bbox即相对于该区域
+    - version: 布局或截图区域每变化一次加一，调用方可据此判断缓存的坐标是否失效
+    """
+
+    def __init__(self, refresh_interval: float = GEOMETRY_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self._monitors: List[Monitor] = []
+        self._checked_at = 0.0
+        self._capture_region: Optional[Tuple[int, int, int, int]] = None
+        self._capture_scale: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def monitors(self) -> List[Monitor]:
+        if not self._monitors or time.time() - self._checked_at > self.refresh_interval:
+            self.refresh()
+        return self._monitors
+
+    def refresh(self) -> bool:
+        """重新查询显示器布局，返回布局是否发生变化"""
+        monitors = query_monitors()
+        with self._lock:
+            self._checked_at = time.time()
+            if monitors == self._monitors:
+                return False
+            if self._monitors:
+                logger.info(f"显示器布局变化: {[m.rect for m in monitors]}")
+            self._monitors = monitors
+            self.version += 1
+            return True
+
+    def invalidate(self, *_) -> None:
+        """显示器变化事件的回调（如Qt的screenAdded/screenRemoved/geometryChanged），下次访问时重新查询"""
+        self._checked_at = 0.0
+
+    @property
+    def primary(self) -> Monitor:
+        monitors = self.monitors
+        return next((m for m in monitors if m.primary), monitors[0])
+
+    @property
+    def screen_size(self) -> Tuple[int, int]:
+        """主屏尺寸，等价于pyautogui.size()"""
+        primary = self.primary
+        return primary.width, primary.height
+
+    @property
+    def virtual_bounds(self) -> Tuple[int, int, int, int]:
+        """所有显示器合并后的外接矩形(left, top, width, height)"""
+        rects = np.array([(m.left, m.top, m.left + m.width, m.top + m.height) for m in self.monitors])
+        left, top = rects[:, :2].min(axis=0)
+        right, bottom = rects[:, 2:].max(axis=0)
+        return int(left), int(top), int(right - left), int(bottom - top)
+
+    def monitor_at(self, x: float, y: float) -> Monitor:
+        """包含该屏幕坐标的显示器，不在任何显示器上时返回主屏"""
+        for monitor in self.monitors:
+            if monitor.left <= x < monitor.left + monitor.width and monitor.top <= y < monitor.top + monitor.height:
+                return monitor
+        return self.primary
+
+    @property
+    def capture_region(self) -> Tuple[int, int, int, int]:
+        if self._capture_region is not None:
+            return self._capture_region
+        return self.primary.rect
+
+    @property
+    def custom_capture_region(self) -> Optional[Tuple[int, int, int, int]]:
+        """显式设置的截图区域，整屏截图时为None"""
+        return self._capture_region
+
+    def set_capture_region(self, region: Optional[Sequence[int]], image_size: Optional[Tuple[int, int]] = None) -> None:
+        """设置截图覆盖的屏幕区域，None表示恢复为主屏
+
+        Args:
+            region: (left, top, width, height)屏幕坐标
+            image_size: 该区域截图的像素尺寸，用于推算截图与屏幕坐标之间的缩放
+        """
+        region = None if region is None else tuple(int(v) for v in region)
+        scale = None
+        if image_size is not None:
+            width = (region or self.primary.rect)[2]
+            scale = image_size[0] / width if width else None
+        if region != self._capture_region or scale != self._capture_scale:
+            self._capture_region = region
+            self._capture_scale = scale
+            self.version += 1
+
+    @property
+    def capture_scale(self) -> float:
+        """截图像素 / 屏幕坐标。进程感知DPI时两者一致为1；
+        未感知DPI的高分屏（如macOS Retina）截图像素多于屏幕坐标，由set_capture_region实测得到"""
+        return self._capture_scale or 1.0
+
+    def bbox_to_screen(self, bboxes) -> np.ndarray:
+        """将归一化bbox（单个或(N,4)数组）的中心批量转换为屏幕坐标，裁剪到截图区域内，返回(N, 2)"""
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        left, top, width, height = self.capture_region
+        size = np.array([width, height], dtype=np.float64)
+        centers = (bboxes[:, :2] + bboxes[:, 2:]) / 2
+        return np.clip(centers * size, 0, size) + (left, top)
+
+    def screen_to_normalized(self, x: float, y: float) -> Tuple[float, float]:
+        """屏幕坐标转换为相对截图区域的归一化坐标，与parse_data输出的bbox可直接比较"""
+        left, top, width, height = self.capture_region
+        return (x - left) / width, (y - top) / height
+
+    def screen_to_image(self, x: float, y: float, image_size: Tuple[int, int],
+                        region: Optional[Sequence[int]] = None) -> Tuple[float, float]:
+        """屏幕坐标转换为截图中的像素坐标，image_to_screen的逆变换；缩放按截图实际尺寸计算
+
+        Args:
+            region: 该截图覆盖的屏幕区域，默认为整个主屏
+        """
+        left, top, width, _ = region or self.primary.rect
+        scale = image_size[0] / width if width else 1.0
+        return (x - left) * scale, (y - top) * scale
+
+    def image_to_screen(self, x: float, y: float,
+                        region: Optional[Sequence[int]] = None) -> Tuple[float, float]:
+        """截图中的像素坐标（如模板匹配结果）转换为屏幕坐标，处理DPI缩放与区域偏移
+
+        Args:
+            region: 该截图覆盖的屏幕区域，默认为整个主屏（pyautogui.screenshot的范围）
+        """
+        left, top = (region or self.primary.rect)[:2]
+        scale = self.capture_scale
+        return left + x / scale, top + y / scale
+
+
+_geometry = None
+
+
+def get_geometry() -> DisplayGeometry:
+    """获取共享的显示几何服务"""
+    global _geometry
+    if _geometry is None:
+        _geometry = DisplayGeometry()
+    return _geometry
@@ -0,0 +1,153 @@
+# image_encoder.py
+# 视觉模型图像编码：按内容哈希缓存编码结果，并按配置缩放与压缩上传图像
+import base64
+import hashlib
+import io
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 上传图像的最长边像素数，None表示保持原尺寸
+IMAGE_MAX_LONG_SIDE = getattr(config, "IMAGE_MAX_LONG_SIDE", 1920)
+# 上传格式：PNG/JPEG/WEBP
+IMAGE_FORMAT = getattr(config, "IMAGE_FORMAT", "PNG")
+# JPEG/WEBP的压缩质量
+IMAGE_QUALITY = getattr(config, "IMAGE_QUALITY", 85)
+# 视觉模型每个token对应的像素块边长（Qwen2.5-VL为28）
+VISION_PATCH_SIZE = 28
+
+_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class EncodedImage(NamedTuple):
+    data: str
+    mime: str
+    size: Tuple[int, int]
+    num_bytes: int
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime};base64,{self.data}"
+
+
+def estimate_vision_tokens(width: int, height: int, patch_size: int = VISION_PATCH_SIZE) -> int:
+    """估算图像占用的视觉token数（按像素块计）"""
+    return math.ceil(width / patch_size) * math.ceil(height / patch_size)
+
+
+class ImageEncoder:
+    """带缓存的图像编码器
+
+    缓存键为原始文件内容的哈希与编码参数，同一张图片重复发送（如失败重试）时
+    直接复用上次的编码结果，无需再次解码、缩放和base64编码。
+    """
+
+    def __init__(self, max_long_side: Optional[int] = IMAGE_MAX_LONG_SIDE,
+                 image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY,
+                 max_entries: int = 8):
+        image_format = image_format.upper()
+        if image_format not in _MIME_TYPES:
+            raise ValueError(f"不支持的图像格式: {image_format}")
+        self.max_long_side = max_long_side
+        self.image_format = image_format
+        self.quality = quality
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, EncodedImage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._encode_seconds = 0.0
+
+    def encode_file(self, image_path: str) -> EncodedImage:
+        """读取并编码图像文件
+
+        Args:
+            image_path: 图像文件路径
+
+        Returns:
+            编码结果
+
+        Raises:
+            ValueError: 当图像文件未找到或无法解码时
+        """
+        try:
+            with open(image_path, "rb") as image_file:
+                raw = image_file.read()
+        except FileNotFoundError as e:
+            raise ValueError(f"图像文件未找到: {image_path}") from e
+        return self.encode_bytes(raw)
+
+    def encode_bytes(self, raw: bytes) -> EncodedImage:
+        """编码原始图像字节，命中缓存时直接返回"""
+        key = f"{hashlib.sha1(raw).hexdigest()}:{self.max_long_side}:{self.image_format}:{self.quality}"
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return cached
+            self._misses += 1
+
+        start_time = time.time()
+        try:
+            encoded = self._encode(raw)
+        except OSError as e:
+            raise ValueError(f"图像编码失败: {e}") from e
+        self._encode_seconds += time.time() - start_time
+
+        with self._lock:
+            self._cache[key] = encoded
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return encoded
+
+    def _encode(self, raw: bytes) -> EncodedImage:
+        """缩放并按目标格式编码"""
+        image = Image.open(io.BytesIO(raw))
+        resized = self._resize(image)
+
+        # 原图无需缩放且格式一致时，直接使用原始字节
+        if resized is image and image.format == self.image_format:
+            payload = raw
+        else:
+            if self.image_format == "JPEG" and resized.mode not in ("RGB", "L"):
+                resized = resized.convert("RGB")
+            buffer = io.BytesIO()
+            save_kwargs: Dict[str, Any] = {}
+            if self.image_format in ("JPEG", "WEBP"):
+                save_kwargs["quality"] = self.quality
+            resized.save(buffer, format=self.image_format, **save_kwargs)
+            payload = buffer.getvalue()
+
+        return EncodedImage(
+            data=base64.b64encode(payload).decode("utf-8"),
+            mime=_MIME_TYPES[self.image_format],
+            size=resized.size,
+            num_bytes=len(payload)
+        )
+
+    def _resize(self, image: Image.Image) -> Image.Image:
+        """按最长边等比缩放，未超出限制时返回原图"""
+        if not self.max_long_side or max(image.size) <= self.max_long_side:
+            return image
+        scale = self.max_long_side / max(image.size)
+        new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(new_size, Image.LANCZOS)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """缓存命中与编码耗时统计"""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "encode_seconds": round(self._encode_seconds, 3),
+        }
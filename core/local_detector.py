@@ -0,0 +1,213 @@
+# local_detector.py
+# 本地界面元素检测：基于边缘轮廓、MSER字符块与形态学连通域的传统视觉方法，
+# 用于对话框、菜单、任务栏等简单界面，置信度足够时无需调用远程解析服务
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 是否启用本地检测快速路径
+LOCAL_DETECTOR_ENABLED = getattr(config, "LOCAL_DETECTOR_ENABLED", False)
+# 本地检测结果的最低置信度，低于该值时仍调用远程解析服务
+LOCAL_DETECTOR_MIN_CONFIDENCE = getattr(config, "LOCAL_DETECTOR_MIN_CONFIDENCE", 0.75)
+# 元素数超过该值视为复杂界面，交由远程解析服务处理
+LOCAL_DETECTOR_MAX_ELEMENTS = getattr(config, "LOCAL_DETECTOR_MAX_ELEMENTS", 80)
+# 非极大值抑制的IoU阈值
+LOCAL_DETECTOR_NMS_IOU = getattr(config, "LOCAL_DETECTOR_NMS_IOU", 0.5)
+
+# 控件框的最小边长（像素）
+_MIN_SIDE = 8
+# 合并相邻字符为文字行时的水平膨胀核
+_TEXT_LINE_KERNEL = (15, 3)
+
+ImageLike = Union[str, Image.Image, np.ndarray]
+
+
+class LocalDetection(NamedTuple):
+    elements: List[Dict[str, Any]]
+    confidence: float
+    duration: float
+
+    @property
+    def confident(self) -> bool:
+        return self.confidence >= LOCAL_DETECTOR_MIN_CONFIDENCE
+
+
+def to_rgb_array(image: ImageLike) -> np.ndarray:
+    """将路径、PIL图像或数组统一转换为RGB数组"""
+    if isinstance(image, str):
+        image = Image.open(image)
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('RGB'))
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    return image[..., :3]
+
+
+def _control_boxes(edges: np.ndarray) -> List[tuple]:
+    """由边缘轮廓得到矩形控件（按钮、输入框、面板）候选框，得分为轮廓面积与外接矩形面积之比"""
+    height, width = edges.shape
+    closed = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(closed, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w < _MIN_SIDE or h < _MIN_SIDE or w > 0.9 * width or h > 0.9 * height:
+            continue
+        # 仅保留近似为四边形的轮廓，排除文字、图标等不规则形状
+        polygon = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(polygon) != 4:
+            continue
+        rectangularity = cv2.contourArea(contour) / float(w * h)
+        if rectangularity < 0.5:
+            continue
+        boxes.append((x, y, x + w, y + h, "icon", min(1.0, rectangularity)))
+    return boxes
+
+
+def _blob_mask(gray: np.ndarray) -> np.ndarray:
+    """前景笔画掩码：形态学梯度二值化，并入MSER检测到的字符块"""
+    height, width = gray.shape
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+    mser = cv2.MSER_create()
+    mser.setMinArea(10)
+    mser.setMaxArea(max(100, height * width // 500))
+    _, regions = mser.detectRegions(gray)
+    for x, y, w, h in regions:
+        if h <= 3 * max(w, 1) and h < height / 10:
+            mask[y:y + h, x:x + w] = 255
+    return mask
+
+
+def _blob_boxes(gray: np.ndarray) -> List[tuple]:
+    """将笔画掩码水平闭运算后取连通域：扁长的为文字行，近似方形的为图标"""
+    height, width = gray.shape
+    mask = _blob_mask(gray)
+    if not mask.any():
+        return []
+
+    lines = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones(_TEXT_LINE_KERNEL[::-1], np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(lines, connectivity=8)
+    boxes = []
+    for x, y, w, h, _ in stats[1:count]:
+        if w < _MIN_SIDE or h < 4 or h > height / 8:
+            continue
+        fill = float(mask[y:y + h, x:x + w].mean()) / 255
+        aspect = w / float(h)
+        if aspect >= 1.5:
+            boxes.append((int(x), int(y), int(x + w), int(y + h), "text", min(1.0, 0.5 + fill)))
+        elif aspect >= 0.6 and h >= 12:
+            boxes.append((int(x), int(y), int(x + w), int(y + h), "icon", min(1.0, 0.4 + fill)))
+    return boxes
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = LOCAL_DETECTOR_NMS_IOU) -> np.ndarray:
+    """向量化的非极大值抑制
+
+    Args:
+        boxes: (N, 4)的像素坐标 x1, y1, x2, y2
+        scores: (N,)的得分
+        iou_threshold: 重叠超过该值的低分框被抑制
+
+    Returns:
+        保留框的索引
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=int)
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+
+def detect(image: ImageLike, max_elements: int = LOCAL_DETECTOR_MAX_ELEMENTS) -> LocalDetection:
+    """检测界面元素
+
+    Args:
+        image: 截图路径、PIL图像或数组
+        max_elements: 元素数上限，超过时置信度为0
+
+    Returns:
+        检测结果，元素bbox为按屏幕宽高归一化的[xmin, ymin, xmax, ymax]，与client.bbox_to_coords一致
+    """
+    start_time = time.time()
+    gray = cv2.cvtColor(to_rgb_array(image), cv2.COLOR_RGB2GRAY)
+    height, width = gray.shape
+    edges = cv2.Canny(gray, 50, 150)
+
+    candidates = _control_boxes(edges) + _blob_boxes(gray)
+    if candidates:
+        boxes = np.array([c[:4] for c in candidates], dtype=np.float32)
+        scores = np.array([c[5] for c in candidates], dtype=np.float32)
+        keep = non_max_suppression(boxes, scores)
+        # 按阅读顺序（从上到下、从左到右）编号
+        keep = sorted(keep, key=lambda i: (boxes[i][1] // 10, boxes[i][0]))
+    else:
+        boxes, scores, keep = np.empty((0, 4), np.float32), np.empty(0, np.float32), []
+
+    elements = []
+    for i in keep:
+        x1, y1, x2, y2 = boxes[i]
+        kind = candidates[i][4]
+        elements.append({
+            "type": kind,
+            "bbox": [round(float(x1) / width, 4), round(float(y1) / height, 4),
+                     round(float(x2) / width, 4), round(float(y2) / height, 4)],
+            "interactivity": kind == "icon",
+            "content": "",
+        })
+
+    confidence = _confidence(edges, boxes[keep] if len(keep) else boxes, scores[keep] if len(keep) else scores, max_elements)
+    duration = time.time() - start_time
+    logger.info(f"本地检测: {len(elements)}个元素，置信度{confidence:.2f}，耗时{duration * 1000:.0f}ms")
+    return LocalDetection(elements, confidence, duration)
+
+
+def _confidence(edges: np.ndarray, boxes: np.ndarray, scores: np.ndarray, max_elements: int) -> float:
+    """置信度 = 被检测框覆盖的边缘像素比例 × 平均得分；元素数为0或超出上限时为0"""
+    if len(boxes) == 0 or len(boxes) > max_elements:
+        return 0.0
+    edge_pixels = edges > 0
+    total = int(edge_pixels.sum())
+    if total == 0:
+        return 0.0
+    covered = np.zeros_like(edge_pixels)
+    for x1, y1, x2, y2 in boxes.astype(int):
+        covered[y1:y2 + 1, x1:x2 + 1] = True
+    explained = int((edge_pixels & covered).sum()) / total
+    return round(explained * float(scores.mean()), 4)
+
+
+def draw_labels(image: ImageLike, elements: List[Dict[str, Any]]) -> Image.Image:
+    """在截图上绘制元素框与编号（优先使用元素的id字段），供多模态模型识别元素id"""
+    labeled = Image.fromarray(to_rgb_array(image).copy())
+    draw = ImageDraw.Draw(labeled)
+    width, height = labeled.size
+    for position, element in enumerate(elements):
+        index = element.get("id", position)
+        xmin, ymin, xmax, ymax = element["bbox"]
+        box = (xmin * width, ymin * height, xmax * width, ymax * height)
+        color = (255, 0, 0) if element["type"] == "icon" else (0, 0, 255)
+        draw.rectangle(box, outline=color, width=2)
+        draw.rectangle((box[0], box[1], box[0] + 8 * len(str(index)) + 4, box[1] + 14), fill=color)
+        draw.text((box[0] + 2, box[1]), str(index), fill=(255, 255, 255))
+    return labeled
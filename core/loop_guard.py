@@ -0,0 +1,134 @@
+# loop_guard.py
+# 循环检测：识别同一界面上重复相同操作或无效操作的情况，并限制迭代次数、token与耗时预算
+import json
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import config
+from core.fingerprint import ScreenFingerprint
+
+logger = logging.getLogger(__name__)
+
+# 单个指令允许的最大迭代次数
+LOOP_MAX_ITERATIONS = getattr(config, "LOOP_MAX_ITERATIONS", 30)
+# 单个指令允许消耗的最大token数
+LOOP_MAX_TOKENS = getattr(config, "LOOP_MAX_TOKENS", 300000)
+# 单个指令允许的最长耗时（秒）
+LOOP_MAX_SECONDS = getattr(config, "LOOP_MAX_SECONDS", 900)
+# 同一界面上相同操作或连续无效操作达到该次数视为循环
+LOOP_REPEAT_THRESHOLD = getattr(config, "LOOP_REPEAT_THRESHOLD", 3)
+
+LOOP_HINT = "检测到在相同界面上重复执行同一操作且未达成目标，请换一种方法（如改用快捷键、选择其他元素或先关闭遮挡的窗口）。"
+
+
+class LoopVerdict(NamedTuple):
+    status: str
+    message: str = ""
+
+
+class LoopDetector:
+    """按(屏幕指纹, 操作)记录每次迭代，检测循环与无效操作
+
+    首次检测到循环时返回HINT，由调用方向模型注入换方法的提示；
+    提示后仍然循环，或超出迭代、token、耗时预算时返回ABORT并附带诊断信息。
+    提示后取得进展（离开提示时的界面，或不再重复被提示的操作）则清除提示状态，
+    之后再次出现的循环重新从提示开始。
+    """
+
+    OK = "ok"
+    HINT = "hint"
+    ABORT = "abort"
+
+    def __init__(self, max_iterations: int = LOOP_MAX_ITERATIONS,
+                 max_tokens: int = LOOP_MAX_TOKENS,
+                 max_seconds: float = LOOP_MAX_SECONDS,
+                 repeat_threshold: int = LOOP_REPEAT_THRESHOLD):
+        self.max_iterations = max_iterations
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.repeat_threshold = repeat_threshold
+        self.start_time = time.time()
+        self.iterations = 0
+        self._steps: List[Tuple[ScreenFingerprint, str]] = []
+        self._noop_streak = 0
+        self._hinted = False
+        # 提示时的(屏幕指纹, 重复的操作签名)，因连续无效操作提示时签名为None
+        self._hint_context: Optional[Tuple[ScreenFingerprint, Optional[str]]] = None
+
+    def check_budgets(self, tokens_used: int = 0) -> LoopVerdict:
+        """检查迭代次数、token和耗时预算"""
+        elapsed = time.time() - self.start_time
+        if self.iterations >= self.max_iterations:
+            return self._abort(f"迭代次数达到上限{self.max_iterations}")
+        if tokens_used >= self.max_tokens:
+            return self._abort(f"token消耗{tokens_used}达到上限{self.max_tokens}")
+        if elapsed >= self.max_seconds:
+            return self._abort(f"耗时{elapsed:.0f}s达到上限{self.max_seconds}s")
+        return LoopVerdict(self.OK)
+
+    def observe(self, screen_fp: ScreenFingerprint, action: Optional[Dict[str, Any]],
+                changed: bool, tokens_used: int = 0) -> LoopVerdict:
+        """记录一次迭代并给出判断
+
+        Args:
+            screen_fp: 执行操作前的屏幕指纹
+            action: 本次执行的操作
+            changed: 操作后界面是否发生变化
+            tokens_used: 本指令累计消耗的token数
+
+        Returns:
+            判断结果
+        """
+        self.iterations += 1
+        signature = self._signature(action)
+        if self._hinted and self._progressed(screen_fp, signature):
+            self._hinted = False
+        repeats = sum(
+            1 for fp, previous in self._steps
+            if previous == signature and fp.matches(screen_fp)
+        ) + 1
+        self._steps.append((screen_fp, signature))
+        self._noop_streak = 0 if changed else self._noop_streak + 1
+
+        reason = None
+        if repeats >= self.repeat_threshold:
+            reason = f"同一界面上重复执行相同操作{repeats}次: {signature[:80]}"
+        elif self._noop_streak >= self.repeat_threshold:
+            reason = f"连续{self._noop_streak}次操作未使界面发生变化"
+
+        if reason is None:
+            return self.check_budgets(tokens_used)
+        if self._hinted:
+            return self._abort(f"{reason}，提示换方法后仍未改善")
+
+        self._hinted = True
+        self._hint_context = (screen_fp, signature if repeats >= self.repeat_threshold else None)
+        logger.warning(f"检测到循环: {reason}")
+        return LoopVerdict(self.HINT, LOOP_HINT)
+
+    def _progressed(self, screen_fp: ScreenFingerprint, signature: str) -> bool:
+        """提示后是否取得进展：已离开提示时的界面，或换掉了被提示重复的操作"""
+        hint_fp, hint_signature = self._hint_context
+        if not hint_fp.matches(screen_fp):
+            return True
+        return hint_signature is not None and signature != hint_signature
+
+    def _abort(self, reason: str) -> LoopVerdict:
+        diagnostic = (
+            f"已中止: {reason}（迭代{self.iterations}次，"
+            f"耗时{time.time() - self.start_time:.0f}s，不同界面状态{len({fp.phash for fp, _ in self._steps})}个）"
+        )
+        logger.warning(diagnostic)
+        return LoopVerdict(self.ABORT, diagnostic)
+
+    @staticmethod
+    def _signature(action: Optional[Dict[str, Any]]) -> str:
+        """操作签名，忽略由坐标解析附加的x/y"""
+        if not isinstance(action, dict):
+            return str(action)
+        params = {k: v for k, v in (action.get("params") or {}).items() if k not in ("x", "y")}
+        return json.dumps(
+            {"action": action.get("action"), "id": action.get("id"), "params": params},
+            ensure_ascii=False, sort_keys=True, default=str
+        )
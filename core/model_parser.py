@@ -1,15 +1,454 @@
 # model_parser.py
 import base64
+import hashlib
+import json
 import logging
-from typing import Dict, List, Optional, Any, Union
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any, Set, Tuple, Union
 from openai import OpenAI
 from config import BASE_URLS, API_KEYS, LABELED_IMAGE_PATH
 import config
+from core.action_history import render_history
+from core.action_schema import JSON_SCHEMA, MAX_COMPOSITE_ACTIONS
+from core.image_encoder import ImageEncoder, estimate_vision_tokens
+from core.prompt_compactor import compact_elements, estimate_messages_tokens, estimate_tokens, normalize_content
+from core.response_cache import ResponseCache
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+TEXT_MODEL = "qwen-max"
+OMNI_MODEL = "qwen2.5-vl-72b-instruct"
+# 静态的单步要求放在系统提示词末尾，保证消息前缀在多轮调用间保持不变
+STEP_REQUIREMENT = "请只给出基于当前界面单步操作。"
+
+# 级联路由的模型层级：依次尝试，输出无效或置信度低时升级到下一层
+TEXT_MODEL_TIERS = getattr(config, "TEXT_MODEL_TIERS", ["qwen-turbo", TEXT_MODEL])
+OMNI_MODEL_TIERS = getattr(config, "OMNI_MODEL_TIERS", ["qwen2.5-vl-7b-instruct", OMNI_MODEL])
+
+# 对冲请求：主请求超过历史延迟的该分位数仍未返回时，向备用模型发出相同请求；
+# 对冲会增加API调用量，且备用模型需按实际部署配置HEDGE_BACKUPS，默认关闭
+HEDGE_ENABLED = getattr(config, "HEDGE_ENABLED", False)
+HEDGE_PERCENTILE = getattr(config, "HEDGE_PERCENTILE", 0.9)
+# 历史样本不足时使用的对冲延迟（秒）
+HEDGE_DEFAULT_DELAY = getattr(config, "HEDGE_DEFAULT_DELAY", 8.0)
+# 备用目标：调用类型 -> (客户端名称, 模型)，客户端名称对应BASE_URLS中的键；
+# 主请求均发往aliyun，备用目标放在另一个服务商，服务商排队或故障时对冲才有效
+HEDGE_BACKUPS = getattr(config, "HEDGE_BACKUPS", {
+    "text": ("local", "deepseek-v3"),
+    "omni": ("local", OMNI_MODEL),
+})
+# 对冲时单个请求的超时（秒）；建立连接、等待首个数据块期间无法通过取消中断，由超时兜底
+HEDGE_REQUEST_TIMEOUT = getattr(config, "HEDGE_REQUEST_TIMEOUT", 60.0)
+
+ACTION_TYPES = ("open", "click", "scroll", "input", "hotkey", "composite", "finish")
+TARGETED_ACTIONS = ("open", "click", "input")
+
+# 差量提示：元素id跨帧稳定时，文本解析在同一会话内只发送元素变化
+ELEMENT_DIFF_ENABLED = getattr(config, "ELEMENT_DIFF_ENABLED", True)
+# 会话内连续发送差量的最大轮数，达到后重新发送完整元素表，避免上下文无限增长
+ELEMENT_DIFF_RESET_TURNS = getattr(config, "ELEMENT_DIFF_RESET_TURNS", 5)
+# 分析者输出中的元素id引用，如"id 19"、"id：19"；"pid 1234"、"valid2"、"grid 3"等单词中的id不算，
+# 按ASCII判断词边界，使"按钮id 19"中紧跟汉字的id仍能匹配
+_ID_REFERENCE_PATTERN = re.compile(r'\bid\s*[:：=]?\s*(\d+)', re.IGNORECASE | re.ASCII)
+# 分析者输出中的结构化动作字段，如"action": "click"
+_ACTION_FIELD_PATTERN = re.compile(r'(?<![A-Za-z])["\']?action["\']?\s*[:：=]\s*["\']?([A-Za-z]+)', re.IGNORECASE)
+# 动作类型的中文表述；"输入框"等名词中的"输入"不算
+ACTION_ALIASES = {
+    "open": ("打开", "双击"),
+    "click": ("点击", "单击"),
+    "scroll": ("滚动",),
+    "input": ("输入(?!框)",),
+    "hotkey": ("快捷键",),
+}
+# 动作类型按整词匹配，"inputs"、"finished"等其他单词中的子串不算
+_ACTION_TOKEN_PATTERN = re.compile("|".join(
+    [rf"(?P<{action}>(?<![A-Za-z]){action}(?![A-Za-z])" + "".join(f"|{alias}" for alias in ACTION_ALIASES.get(action, ())) + ")"
+     for action in ACTION_TYPES]
+), re.IGNORECASE)
+
+
+def validate_action_json(content: str, valid_ids: Set[int], allow_finish: bool = False) -> Tuple[bool, str]:
+    """校验执行者输出的动作JSON
+
+    Args:
+        content: 模型输出
+        valid_ids: 当前界面存在的元素id
+        allow_finish: 是否接受finish，小模型的finish需交由大模型确认
+
+    Returns:
+        (是否可接受, 原因)
+    """
+    from jsonschema import ValidationError, validate
+
+    try:
+        action = json.loads(content)
+        validate(action, JSON_SCHEMA)
+    except (json.JSONDecodeError, ValidationError) as e:
+        return False, f"输出不符合JSON_SCHEMA: {str(e)[:80]}"
+
+    action_type = action["action"]
+    if action_type not in ACTION_TYPES:
+        return False, f"未知动作类型: {action_type}"
+    if action_type == "finish" and not allow_finish:
+        # finish会直接结束任务，交由大模型确认
+        return False, "finish需要确认"
+    if action_type == "composite":
+        sub_actions = (action.get("params") or {}).get("actions")
+        if not sub_actions:
+            return False, "composite缺少actions"
+        for index, sub_action in enumerate(sub_actions, 1):
+            ok, reason = _validate_action_fields(sub_action, valid_ids)
+            if not ok:
+                return False, f"composite第{index}个子操作: {reason}"
+        return True, "ok"
+    return _validate_action_fields(action, valid_ids)
+
+
+def _validate_action_fields(action: Dict[str, Any], valid_ids: Set[int]) -> Tuple[bool, str]:
+    """校验单个操作的目标元素与必填参数"""
+    action_type = action["action"]
+    params = action.get("params") or {}
+    if action_type in TARGETED_ACTIONS and action["id"] not in valid_ids:
+        return False, f"元素id {action['id']} 不在当前界面中"
+    if action_type == "input" and not params.get("text_content"):
+        return False, "input缺少text_content"
+    if action_type == "hotkey" and not params.get("key_sequence"):
+        return False, "hotkey缺少key_sequence"
+    return True, "ok"
+
+
+def analysis_action(content: str) -> Optional[str]:
+    """提取分析者给出的操作类型
+
+    分析者先推理后给出操作，推理中可能提到其他操作类型，因此优先取结构化的action字段，
+    否则取最后出现的操作类型（英文按整词匹配，或对应的中文表述）。
+
+    Returns:
+        操作类型，未给出时返回None
+    """
+    fields = [field.lower() for field in _ACTION_FIELD_PATTERN.findall(content)]
+    fields = [field for field in fields if field in ACTION_TYPES]
+    if fields:
+        return fields[-1]
+    matches = list(_ACTION_TOKEN_PATTERN.finditer(content))
+    return matches[-1].lastgroup if matches else None
+
+
+def validate_analysis(content: str, valid_ids: Set[int]) -> Tuple[bool, str]:
+    """校验分析者输出：必须给出操作类型，且引用的元素id都存在于当前界面
+
+    Args:
+        content: 模型输出
+        valid_ids: 当前界面存在的元素id
+
+    Returns:
+        (是否可接受, 原因)
+    """
+    if not content or not content.strip():
+        return False, "输出为空"
+    action = analysis_action(content)
+    if action is None:
+        return False, "未给出操作类型"
+    if action == "finish":
+        return False, "finish需要确认"
+    referenced = {int(i) for i in _ID_REFERENCE_PATTERN.findall(content)}
+    if referenced - valid_ids:
+        return False, f"引用了不存在的元素id: {sorted(referenced - valid_ids)}"
+    return True, "ok"
+
+
+class CascadeRouter:
+    """模型级联路由器：先用小模型，输出无效或置信度低时升级到大模型，并记录每次路由决策"""
+
+    def __init__(self, max_decisions: int = 200):
+        self.decisions: deque = deque(maxlen=max_decisions)
+        self._tier_latency: Dict[str, List[float]] = defaultdict(list)
+        self._requests = 0
+        self._escalations = 0
+
+    def run(self, kind: str, tiers: List[str], call: Callable[[str], str],
+            validate: Callable[[str], Tuple[bool, str]]) -> str:
+        """按层级依次调用模型，返回第一个通过校验的输出
+
+        最后一层的输出不再校验，直接返回；中间层调用失败视为需要升级。
+
+        Args:
+            kind: 调用类型（text/omni），用于统计
+            tiers: 模型层级列表
+            call: 以模型名调用并返回输出的函数
+            validate: 输出校验函数
+
+        Returns:
+            模型输出
+        """
+        self._requests += 1
+        for index, model in enumerate(tiers):
+            is_last = index == len(tiers) - 1
+            start_time = time.time()
+            try:
+                result = call(model)
+                accepted, reason = (True, "最终层") if is_last else validate(result)
+            except Exception as e:
+                if is_last:
+                    raise
+                result, accepted, reason = None, False, f"调用失败: {e}"
+            latency = time.time() - start_time
+
+            self._tier_latency[model].append(latency)
+            decision = {"kind": kind, "model": model, "tier": index, "latency": round(latency, 2),
+                        "accepted": accepted, "reason": reason}
+            self.decisions.append(decision)
+            logger.info(f"路由决策: {decision}")
+
+            if accepted:
+                return result
+            self._escalations += 1
+        raise ValueError("模型层级列表为空")
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """路由统计：升级率与各层平均延迟"""
+        return {
+            "requests": self._requests,
+            "escalations": self._escalations,
+            "escalation_rate": round(self._escalations / self._requests, 4) if self._requests else 0.0,
+            "tier_latency": {
+                model: {"calls": len(latencies), "avg": round(sum(latencies) / len(latencies), 2)}
+                for model, latencies in self._tier_latency.items()
+            },
+        }
+
+
+class CancelToken(threading.Event):
+    """取消事件，置位时依次调用已注册的回调（如关闭流式连接）"""
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks: List[Callable[[], None]] = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """注册取消回调；已取消时立即调用"""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self) -> None:
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"取消回调失败: {e}")
+
+
+class RequestHedger:
+    """对冲请求执行器
+
+    主请求超过历史延迟的指定分位数仍未返回时，向备用目标发出相同请求，
+    先返回且通过校验的结果胜出，另一路通过取消事件关闭其流式连接。
+    主请求被取消时以其已耗时作为延迟样本（真实延迟的下界），
+    否则慢请求总被备用请求抢先、从不进入样本，对冲延迟会持续偏低。
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE,
+                 default_delay: float = HEDGE_DEFAULT_DELAY,
+                 min_samples: int = 10, window: int = 100):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedge")
+        self._stats = {"requests": 0, "hedged": 0, "backup_wins": 0, "latency_gain": 0.0}
+
+    def hedge_delay(self, kind: str) -> float:
+        """根据主请求的历史延迟计算对冲延迟"""
+        samples = sorted(self._latencies[kind])
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile))]
+
+    def run(self, kind: str, primary: Callable[[threading.Event], str],
+            backup: Callable[[threading.Event], str],
+            validate: Callable[[str], bool]) -> str:
+        """执行对冲请求
+
+        Args:
+            kind: 调用类型（text/omni），各自维护延迟分布
+            primary: 主请求，参数为取消事件
+            backup: 备用请求，参数为取消事件
+            validate: 输出校验函数
+
+        Returns:
+            最先返回且通过校验的输出；都未通过时返回主请求的输出
+        """
+        self._stats["requests"] += 1
+        start_time = time.time()
+        cancel_events = {"primary": CancelToken(), "backup": CancelToken()}
+        futures = {self._executor.submit(primary, cancel_events["primary"]): "primary"}
+        results: Dict[str, Any] = {}
+
+        done, _ = wait(futures, timeout=self.hedge_delay(kind))
+        while True:
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    results[name] = e
+                    logger.warning(f"对冲请求{name}失败: {e}")
+                    continue
+                results[name] = result
+                elapsed = time.time() - start_time
+                if name == "primary":
+                    self._latencies[kind].append(elapsed)
+                if validate(result):
+                    self._finish(name, elapsed, kind, futures, cancel_events)
+                    return result
+
+            # 主请求超时、失败或输出无效且尚未对冲时，发出备用请求
+            if "backup" not in results and "backup" not in futures.values():
+                self._stats["hedged"] += 1
+                logger.info(f"主请求{time.time() - start_time:.2f}s未返回有效结果，发出对冲请求")
+                futures[self._executor.submit(backup, cancel_events["backup"])] = "backup"
+
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+        primary_result = results.get("primary")
+        if isinstance(primary_result, str):
+            return primary_result
+        backup_result = results.get("backup")
+        if isinstance(backup_result, str):
+            return backup_result
+        raise primary_result if isinstance(primary_result, Exception) else RuntimeError("对冲请求均失败")
+
+    def _finish(self, winner: str, elapsed: float, kind: str,
+                pending: Dict[Any, str], cancel_events: Dict[str, CancelToken]) -> None:
+        """取消未完成的请求并记录统计"""
+        for name in pending.values():
+            cancel_events[name].set()
+        if "primary" in pending.values():
+            self._latencies[kind].append(elapsed)
+        if winner == "backup":
+            self._stats["backup_wins"] += 1
+            # 以主请求的历史中位延迟估算收益
+            samples = sorted(self._latencies[kind])
+            expected = samples[len(samples) // 2] if samples else self.default_delay
+            self._stats["latency_gain"] += max(0.0, expected - elapsed)
+        logger.info(f"对冲请求完成: 胜出={winner}, 耗时={elapsed:.2f}s")
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """对冲率、备用胜出次数与估算的延迟收益"""
+        requests = self._stats["requests"]
+        return {
+            **self._stats,
+            "latency_gain": round(self._stats["latency_gain"], 2),
+            "hedge_rate": round(self._stats["hedged"] / requests, 4) if requests else 0.0,
+        }
+
+
+def _element_ids(data: Iterable[Dict[str, Any]]) -> Set[int]:
+    """提取当前界面的元素id集合"""
+    ids = set()
+    for obj in data or []:
+        try:
+            ids.add(int(obj["id"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return ids
+
+class ElementPromptSession:
+    """文本解析的多轮会话
+
+    首轮发送完整元素表，之后每轮只追加元素变化（新增、移除、内容变化），
+    模型结合会话中前几轮的元素表理解当前界面。指令改变、达到轮数上限、
+    差量不比完整表短或上一轮调用失败时重新开始会话。
+    """
+
+    def __init__(self, reset_turns: int = ELEMENT_DIFF_RESET_TURNS):
+        self.reset_turns = reset_turns
+        self.reset()
+
+    def reset(self) -> None:
+        self._instruction: Optional[str] = None
+        self._messages: List[Dict[str, Any]] = []
+        self._rows: Dict[int, str] = {}
+        self._pending_rows: Dict[int, str] = {}
+        self._turns = 0
+
+    def build(self, system_prompt: str, instruction: str, data: Iterable[Dict[str, Any]],
+              full_prompt: str, history: str, analysis: str) -> List[Dict[str, Any]]:
+        """构建本轮消息
+
+        Args:
+            system_prompt: 系统提示词
+            instruction: 用户指令
+            data: 当前界面元素（id需跨帧稳定）
+            full_prompt: 包含完整元素表的用户提示
+            history: 渲染后的操作历史
+            analysis: 分析结果
+
+        Returns:
+            消息列表
+        """
+        rows = {obj["id"]: f"{obj.get('type', '')}|{normalize_content(obj.get('content'))}" for obj in data}
+        diff = self._render_diff(rows)
+        restart = (
+            not ELEMENT_DIFF_ENABLED
+            or instruction != self._instruction
+            or not self._messages
+            or self._turns >= self.reset_turns
+            or estimate_tokens(diff) >= estimate_tokens(full_prompt)
+        )
+        if restart:
+            self._messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": full_prompt}
+            ]
+            self._turns = 0
+        else:
+            self._messages.append({
+                "role": "user",
+                "content": f"已经执行过的指令有:\n{history}\n界面元素相对上一轮的变化:\n{diff}\n分析者给出的建议为:{analysis}"
+            })
+            self._turns += 1
+            logger.info(f"差量提示第{self._turns}轮: 元素变化{estimate_tokens(diff)} tokens，完整提示{estimate_tokens(full_prompt)} tokens")
+        self._instruction = instruction
+        self._pending_rows = rows
+        return list(self._messages)
+
+    def commit(self, answer: str) -> None:
+        """记录本轮模型回答，下一轮的差量以本轮元素为基准"""
+        self._messages.append({"role": "assistant", "content": answer})
+        self._rows = self._pending_rows
+
+    def _render_diff(self, rows: Dict[int, str]) -> str:
+        added = [f"{i}|{row}" for i, row in rows.items() if i not in self._rows]
+        changed = [f"{i}|{row}" for i, row in rows.items() if i in self._rows and self._rows[i] != row]
+        removed = [str(i) for i in self._rows if i not in rows]
+        lines = []
+        if added:
+            lines.append("新增(id|type|content):\n" + "\n".join(added))
+        if changed:
+            lines.append("内容变化(id|type|content):\n" + "\n".join(changed))
+        if removed:
+            lines.append("已消失的id: " + ",".join(removed))
+        return "\n".join(lines) or "无变化"
+
+
 class ModelParser:
     """模型解析器，负责与AI模型交互并解析指令"""
     
@@ -18,6 +457,16 @@ class ModelParser:
         try:
             self.client_ds = OpenAI(api_key=API_KEYS["local"], base_url=BASE_URLS["local"])
             self.client_qwen = OpenAI(api_key=API_KEYS["aliyun"], base_url=BASE_URLS["aliyun"])
+            self.response_cache = ResponseCache()
+            self.image_encoder = ImageEncoder()
+            self.router = CascadeRouter()
+            self.hedger = RequestHedger()
+            self.element_session = ElementPromptSession()
+            # 最近一次文本解析的缓存键，该响应执行失败时据此作废
+            self._last_response_key: Optional[str] = None
+            self._last_analysis_key: Optional[str] = None
+            self._clients = {"local": self.client_ds, "aliyun": self.client_qwen}
+            self.total_tokens = 0
             logger.info("ModelParser初始化成功")
         except Exception as e:
             logger.error(f"ModelParser初始化失败: {e}")
@@ -53,20 +502,21 @@ class ModelParser:
         return """
         你是一名电脑专家，你首先需要明确当前电脑界面包含了什么内容，明确每一个可见控件的被框选的内容以及id。
         接着，你需要明确用户当前的指令是什么，明确用户的意图，然后判断用户的意图在当前界面是否已经完成，如果已经完成，那么你需要给出一个finish操作，否则你需要给出一个操作来完成用户的指令。
-        然后，你需要根据当前界面和用户的指令，给出一个基于当前界面的单步操作，你必须明确指出要操作的具体元素的id，以及对应的操作内容，参考动作封装要求，你每次只能给出一个操作。
+        然后，你需要根据当前界面和用户的指令，给出一个基于当前界面的单步操作，你必须明确指出要操作的具体元素的id，以及对应的操作内容，参考动作封装要求，你每次只能给出一个操作（composite视为一个操作）。
         每一次操作，你需要优先考虑使用快捷键操作（如能用hotkey完成不用click）。
         利用hotkey等快捷键进行系统级快捷键（如Win+D、Alt+Tab）或应用级快捷键如Ctrl+S、F12）应优先使用。若无法用快捷键完成，则依次选择open、input、click等操作。 
-        可使用的五种操作有：
+        可使用的六种操作有：
             hotkey：直接执行（如"hotkey Ctrl+C"）
             open：定位图标→双击（如"open 浏览器(id 25)"）
             input：定位→清空→输入→回车（如"input 搜索框(id 11) 输入'hello'"）
             click：指定ID和点击次数（如"click 发送按钮(id 19) 左键1次"）
+            composite：在当前界面上连续执行多个子操作（如"composite: input 用户名(id 3) 输入'tom'; input 密码(id 5) 输入'123'; click 登录(id 8)"），子操作仅限input/click/hotkey，最多""" + str(MAX_COMPOSITE_ACTIONS) + """个，且必须都作用于当前界面已有的元素；会导致界面跳转或弹窗的子操作只能放在最后
             finish：当你认为目标达成时使用
         click/open/input必须使用当前界面存在的有效ID（>0），禁止操作未被框选或超出屏幕的元素，禁止操作含'单步执行''执行''停止'等字样的底部控制台
         当出现以下情况立即尝试使用其他途径：用户指令需要操作不存在于当前界面的控件，要求的操作类型与目标元素不匹配（如对文本框执行open操作），检测到循环操作超过3次未达成目标。
         避免使用任务管理器，如果能够通过快捷键完成，优先使用快捷键，比如命令行指令。
         你必须给出你的推理过程，保证推理过程清晰可见，最后给出操作指令。
-        """
+        """ + STEP_REQUIREMENT
 
     @property
     def execute_prompt(self) -> str:
@@ -75,15 +525,17 @@ class ModelParser:
         你是一个电脑操作专家，你的任务是根据用户指令和当前界面元素数据，以及分析者给出的建议，生成一个符合要求的json格式的操作指令，例如：{"action":"input","id":23,"target":"搜索框","params":{"text_content":"hello"}}
         JSON Schema定义：
         {
-            "action": "open|click|scroll|input|hotkey|finish",
-            "id": int（open/click/input操作需有效ID，hotkey/finish设为-1）,
+            "action": "open|click|scroll|input|hotkey|composite|finish",
+            "id": int（open/click/input操作需有效ID，hotkey/composite/finish设为-1）,
             "target": "元素描述",
             "params": {
                 "text_content": "输入文本（input必填）",
                 "key_sequence": ["组合键列表（hotkey必填）"],
                 "button_type": "left/right"（click可选，默认left）,
                 "direction": "up/down"（scroll必填）,
-                "clicks": 1（如需双击设为2）
+                "clicks": 1（如需双击设为2）,
+                "press_enter": true（input可选：单独的input默认回车提交；composite中的input默认不回车，仅提交表单的最后一个输入需要回车时设为true）,
+                "actions": [子操作列表（composite必填），每项格式同上，action仅限input/click/hotkey]
             }
         }
 
@@ -96,6 +548,7 @@ class ModelParser:
         - "open Chrome" → action=open, target=Chrome图标, id=12
         - "hotkey Ctrl+S" → action=hotkey, params.key_sequence=["ctrl","s"]
         - "input 搜索框 输入'hello'" → action=input, params.text_content="hello"
+        - "composite: input 用户名(id 3) 输入'tom'; click 登录(id 8)" → action=composite, id=-1, params.actions=[{"action":"input","id":3,"target":"用户名","params":{"text_content":"tom"}},{"action":"click","id":8,"target":"登录","params":{}}]
         2. 禁止行为：
         - 输出自然语言指令而非JSON
         - 忽略必填字段（如id或target）
@@ -105,7 +558,7 @@ class ModelParser:
         兼容性说明：
         - open操作自动包含：定位图标→双击打开（默认clicks=2）
         - input操作自动包含：定位输入框→清空→输入→回车
-        """
+        """ + STEP_REQUIREMENT
 
     def parse_instruction_omni(self, instruction: str, data: Dict[str, Any], pre_actions: List[str]) -> str:
         """多模态解析方法
@@ -123,15 +576,32 @@ class ModelParser:
         """
         logger.info(f"开始多模态解析: 指令={instruction}, 已执行操作数={len(pre_actions)}")
         try:
+            # 分析结果为流式输出，同一界面两次分析的文本几乎不会逐字相同；按截图内容、界面元素与历史缓存分析结果，
+            # 相同输入复用同一分析，以分析为输入的文本解析缓存才能命中。元素表相同而像素不同（如选中状态、
+            # 对话框文字未被识别）的界面不能共用分析，因此键中包含截图的内容哈希
+            cache_key = ResponseCache.make_key(OMNI_MODEL, instruction, compact_elements(data, token_budget=None),
+                                               render_history(pre_actions), self._labeled_image_digest(),
+                                               pre_actions)
+            self._last_analysis_key = cache_key
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"多模态解析命中缓存: {self.response_cache.stats}")
+                return cached
+
             messages = self._build_omni_messages(instruction, data, pre_actions)
-            
-            completion = self.client_qwen.chat.completions.create(
-                model="qwen2.5-vl-72b-instruct",
-                messages=messages,
-                stream=True,
-                stream_options={"include_usage": True}
+            self._log_prompt_tokens(messages)
+            valid_ids = _element_ids(data)
+
+            start_time = time.time()
+            result = self.router.run(
+                "omni", OMNI_MODEL_TIERS,
+                lambda model: self._call_model(
+                    "omni", model, messages,
+                    lambda content: bool(content and content.strip())
+                ),
+                lambda content: validate_analysis(content, valid_ids)
             )
-            result = self._handle_streaming_response(completion)
+            self.response_cache.put(cache_key, result, time.time() - start_time)
             logger.info("多模态解析完成")
             return result
         except Exception as e:
@@ -157,34 +627,148 @@ class ModelParser:
         """
         logger.info(f"开始文本解析: 指令={instruction}, 已执行操作数={len(pre_actions)}")
         try:
-            messages = [
-                {"role": "system", "content": self.execute_prompt},
-                {"role": "user", "content": self._build_user_prompt(instruction, data, pre_actions, analysis)}
-            ]
-            
-            response = self.client_qwen.chat.completions.create(
-                model="qwen-max",
-                messages=messages,
-                response_format={"type": "json_object"},
-                max_tokens=8192,
-                temperature=0,
-                presence_penalty=1.1,
-                top_p=0.95
+            elements = compact_elements(data, query=f"{instruction}\n{analysis}")
+            history = render_history(pre_actions)
+            messages = self.element_session.build(
+                self.execute_prompt, instruction, data,
+                self._build_user_prompt(instruction, elements, history, analysis), history, analysis
             )
-            
-            content = response.choices[0].message.content
-            if content is None:
-                error_msg = "响应内容为空"
-                logger.error(error_msg)
-                raise ValueError(error_msg)
 
+            # temperature=0时输出是确定的，相同输入直接复用缓存的响应
+            cache_key = ResponseCache.make_key(TEXT_MODEL, instruction, elements, history, analysis, pre_actions)
+            self._last_response_key = cache_key
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"文本解析命中缓存: {self.response_cache.stats}")
+                self.element_session.commit(cached)
+                return cached
+            self._log_prompt_tokens(messages)
+
+            valid_ids = _element_ids(data)
+            start_time = time.time()
+            content = self.router.run(
+                "text", TEXT_MODEL_TIERS,
+                lambda model: self._call_model(
+                    "text", model, messages,
+                    lambda result: validate_action_json(result, valid_ids, allow_finish=True)[0]
+                ),
+                lambda result: validate_action_json(result, valid_ids)
+            )
+
+            self.response_cache.put(cache_key, content, time.time() - start_time)
+            self.element_session.commit(content)
             logger.info("文本解析完成")
             return content
         except Exception as e:
+            self.element_session.reset()
             error_msg = f"文本解析失败: {e}"
             logger.error(error_msg)
             raise Exception(error_msg) from e
 
+    def discard_last_response(self) -> None:
+        """作废最近一次文本解析及其所用分析结果的缓存响应
+
+        上一步执行失败或未使界面变化时，重试的输入与上次相同，
+        不作废则会再次命中同一个无效操作。
+        """
+        for key in (self._last_response_key, self._last_analysis_key):
+            if key is not None:
+                self.response_cache.invalidate(key)
+        self._last_response_key = None
+        self._last_analysis_key = None
+
+    def _call_model(self, kind: str, model: str, messages: List[Dict[str, Any]],
+                    is_valid: Callable[[str], bool]) -> str:
+        """调用模型，对主模型的请求按配置进行对冲
+        
+        Args:
+            kind: 调用类型（text/omni）
+            model: 模型名称
+            messages: 消息列表
+            is_valid: 对冲时判断结果是否可用的函数
+            
+        Returns:
+            响应内容
+        """
+        request = self._request_omni if kind == "omni" else self._request_text
+        primary_model = OMNI_MODEL if kind == "omni" else TEXT_MODEL
+        backup = HEDGE_BACKUPS.get(kind)
+        if not HEDGE_ENABLED or backup is None or model != primary_model:
+            return request(self.client_qwen, model, messages)
+
+        backup_client, backup_model = self._clients[backup[0]], backup[1]
+        return self.hedger.run(
+            kind,
+            lambda cancel: request(self.client_qwen, model, messages, cancel),
+            lambda cancel: request(backup_client, backup_model, messages, cancel, echo=False),
+            is_valid
+        )
+
+    def _request_omni(self, client: OpenAI, model: str, messages: List[Dict[str, Any]],
+                      cancel_event: Optional[threading.Event] = None, echo: bool = True) -> str:
+        """以流式方式调用多模态模型
+        
+        Args:
+            client: 模型客户端
+            model: 模型名称
+            messages: 消息列表
+            cancel_event: 取消事件，置位后关闭连接；传入时请求带超时
+            echo: 是否实时打印输出
+            
+        Returns:
+            完整响应内容
+        """
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._request_options(cancel_event)
+        )
+        return self._handle_streaming_response(completion, cancel_event, echo)
+
+    def _request_text(self, client: OpenAI, model: str, messages: List[Dict[str, Any]],
+                      cancel_event: Optional[threading.Event] = None, echo: bool = False) -> str:
+        """调用文本模型并返回JSON字符串，以流式读取以便对冲时中途取消
+        
+        Args:
+            client: 模型客户端
+            model: 模型名称
+            messages: 消息列表
+            cancel_event: 取消事件，置位后关闭连接；传入时请求带超时
+            echo: 是否实时打印输出
+            
+        Returns:
+            响应内容
+            
+        Raises:
+            ValueError: 当响应内容为空时
+        """
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"},
+            max_tokens=8192,
+            temperature=0,
+            presence_penalty=1.1,
+            top_p=0.95,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._request_options(cancel_event)
+        )
+        
+        content = self._handle_streaming_response(completion, cancel_event, echo)
+        if not content:
+            error_msg = "响应内容为空"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        return content
+
+    @staticmethod
+    def _request_options(cancel_event: Optional[threading.Event]) -> Dict[str, Any]:
+        """对冲的请求设置超时，避免被取消的一路长时间阻塞在等待响应上"""
+        return {"timeout": HEDGE_REQUEST_TIMEOUT} if cancel_event is not None else {}
+
     def _build_omni_messages(self, instruction: str, data: Dict[str, Any], pre_actions: List[str]) -> List[Dict[str, Any]]:
         """构建多模态消息结构
         
@@ -196,8 +780,10 @@ class ModelParser:
         Returns:
             消息列表
         """
-        user_prompt = f"已经执行过的指令有:{pre_actions},用户指令: {instruction}。请只给出基于当前界面单步操作。"
-        print(user_prompt)
+        # 指令在整个任务中不变，放在最前；操作历史只追加，其次；每帧都变的截图放在最后
+        instruction_prompt = f"用户指令: {instruction}"
+        history_prompt = f"已经执行过的指令有:\n{render_history(pre_actions)}"
+        logger.debug(f"{instruction_prompt}\n{history_prompt}")
 
         return [
             {
@@ -210,12 +796,21 @@ class ModelParser:
             {
                 "role": "user",
                 "content": [
-                    self._build_image_content(),
-                    {"type": "text", "text": user_prompt}
+                    {"type": "text", "text": instruction_prompt},
+                    {"type": "text", "text": history_prompt},
+                    self._build_image_content()
                 ]
             }
         ]
 
+    def _labeled_image_digest(self) -> str:
+        """当前标注截图的内容哈希"""
+        try:
+            with open(LABELED_IMAGE_PATH, "rb") as image_file:
+                return hashlib.sha1(image_file.read()).hexdigest()
+        except FileNotFoundError as e:
+            raise ValueError(f"图像文件未找到: {LABELED_IMAGE_PATH}") from e
+
     def _build_image_content(self) -> Dict[str, Any]:
         """构建图像内容结构
         
@@ -223,54 +818,111 @@ class ModelParser:
             图像内容字典
         """
         try:
+            encoded = self.image_encoder.encode_file(LABELED_IMAGE_PATH)
+            logger.info(
+                f"图像编码: 尺寸={encoded.size}, 大小={encoded.num_bytes}B, "
+                f"估算视觉token数={estimate_vision_tokens(*encoded.size)}, 缓存={self.image_encoder.stats}"
+            )
             return {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/png;base64,{self.encode_image(LABELED_IMAGE_PATH)}"
+                    "url": encoded.data_url
                 }
             }
         except Exception as e:
             logger.error(f"构建图像内容失败: {e}")
             raise
 
-    def _handle_streaming_response(self, completion) -> str:
+    def _handle_streaming_response(self, completion, cancel_event: Optional[threading.Event] = None,
+                                   echo: bool = True) -> str:
         """处理流式响应
         
         Args:
             completion: 流式响应对象
+            cancel_event: 取消事件，置位后关闭连接并返回已读取的内容
+            echo: 是否实时打印输出
             
         Returns:
             完整响应内容
         """
         result = []
+        if isinstance(cancel_event, CancelToken):
+            # 取消时立即关闭连接，阻塞在读取下一个数据块上的请求随之中断
+            cancel_event.on_cancel(completion.close)
         try:
             for chunk in completion:
+                if cancel_event is not None and cancel_event.is_set():
+                    completion.close()
+                    logger.info("流式响应已取消")
+                    break
                 if chunk.choices and chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
                     result.append(content)
-                    print(content, end='', flush=True)
+                    if echo:
+                        print(content, end='', flush=True)
                 elif hasattr(chunk, 'usage') and chunk.usage:
                     self._log_usage(chunk.usage)
             
-            print(result)
+            if echo:
+                print(result)
             return ''.join(result)
         except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("流式响应已取消")
+                return ''.join(result)
             logger.error(f"处理流式响应失败: {e}")
             raise
 
-    def _build_user_prompt(self, instruction: str, data: Dict[str, Any], pre_actions: List[str], analysis: str) -> str:
+    def _build_user_prompt(self, instruction: str, elements: str, history: str, analysis: str) -> str:
         """构建用户提示模板
         
+        按变化频率从低到高排列：指令、操作历史、界面元素、分析建议，
+        使相邻两次调用共享尽可能长的前缀，便于服务端前缀缓存命中。
+        
         Args:
             instruction: 用户指令
-            data: 当前界面元素数据
-            pre_actions: 已执行的操作列表
+            elements: 序列化后的界面元素表
+            history: 渲染后的操作历史
             analysis: 分析结果
             
         Returns:
             用户提示字符串
         """
-        return f"当前界面元素内容如:{data},已经执行过的指令有:{pre_actions},用户指令: {instruction},分析者给出的建议为:{analysis}。请只给出基于当前界面单步操作。"
+        return f"用户指令: {instruction}\n已经执行过的指令有:\n{history}\n当前界面元素内容如:\n{elements}\n分析者给出的建议为:{analysis}"
+
+    def estimate_prompt_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        """估算消息的文本token数，用于发送前的预算检查
+        
+        Args:
+            messages: 消息列表
+            
+        Returns:
+            估算的token数（不含图像）
+        """
+        return estimate_messages_tokens(messages)
+
+    def _log_prompt_tokens(self, messages: List[Dict[str, Any]]) -> None:
+        """发送前记录提示词的估算token数
+        
+        Args:
+            messages: 消息列表
+        """
+        logger.info(f"提示词估算token数: {self.estimate_prompt_tokens(messages)}")
+
+    @property
+    def cache_stats(self) -> Dict[str, Any]:
+        """响应缓存的命中率与节省的延迟"""
+        return self.response_cache.stats
+
+    @property
+    def routing_stats(self) -> Dict[str, Any]:
+        """级联路由的升级率与各层延迟"""
+        return self.router.stats
+
+    @property
+    def hedge_stats(self) -> Dict[str, Any]:
+        """对冲请求的对冲率与延迟收益"""
+        return self.hedger.stats
 
     def _log_usage(self, usage: Optional[Dict[str, Any]]) -> None:
         """记录API使用情况
@@ -279,11 +931,65 @@ class ModelParser:
             usage: API使用情况
         """
         if usage:
+            self.total_tokens += getattr(usage, "total_tokens", 0) or 0
             usage_info = f"API Usage: {usage}"
             logger.info(usage_info)
             print(f"\n{usage_info}")
 
 
+class IncrementalJsonParser:
+    """增量JSON对象解析器
+
+    逐段输入流式文本，跟踪花括号深度与字符串状态，
+    每当一个顶层JSON对象闭合时立即解析并产出，无需等待整个数组生成完毕。
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """输入一段文本，返回其中新闭合的对象
+        
+        Args:
+            text: 流式文本片段
+            
+        Returns:
+            新解析出的对象列表
+        """
+        completed = []
+        for char in text:
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    fragment = ''.join(self._buffer)
+                    try:
+                        completed.append(json.loads(fragment))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"工作流步骤解析失败: {e} - {fragment[:50]}...")
+        return completed
+
+
 class WorkFlowGenerator:
     """工作流生成器，负责生成完整的操作流程"""
     
@@ -306,6 +1012,38 @@ class WorkFlowGenerator:
             工作流JSON字符串
         """
         logger.info(f"开始生成工作流: 指令={instruction}")
+        answer_content = "".join(self._stream_answer(instruction))
+        logger.info("工作流生成完成")
+        return answer_content
+
+    def stream_workflow(self, instruction: str) -> Iterator[Dict[str, Any]]:
+        """流式生成工作流，每个步骤的JSON对象一完整即产出
+        
+        Args:
+            instruction: 用户指令
+            
+        Yields:
+            工作流步骤
+        """
+        logger.info(f"开始流式生成工作流: 指令={instruction}")
+        parser = IncrementalJsonParser()
+        step_count = 0
+        for delta in self._stream_answer(instruction):
+            for step in parser.feed(delta):
+                step_count += 1
+                logger.info(f"工作流步骤{step_count}已生成: {step}")
+                yield step
+        logger.info(f"工作流流式生成完成，共{step_count}个步骤")
+
+    def _build_messages(self, instruction: str) -> List[Dict[str, Any]]:
+        """构建工作流生成的消息
+        
+        Args:
+            instruction: 用户指令
+            
+        Returns:
+            消息列表
+        """
         print(f"可用icons: {config.ICONS}")
         
         # 系统提示词
@@ -367,18 +1105,28 @@ class WorkFlowGenerator:
         请确保每个JSON对象都包含完整的必要字段，特别是params字段，即使它是空对象也必须包含。
         """
 
+        return [
+            {"role": "system", "content": enhanced_system},
+            {"role": "user", "content": "用户指令为：" + instruction}
+        ]
+
+    def _stream_answer(self, instruction: str) -> Iterator[str]:
+        """调用推理模型，打印思考过程并逐段产出回复内容
+        
+        Args:
+            instruction: 用户指令
+            
+        Yields:
+            回复内容片段
+        """
         reasoning_content = ""  # 定义完整思考过程
-        answer_content = ""  # 定义完整回复
         is_answering = False  # 判断是否结束思考过程并开始回复
 
         try:
             print(instruction)
             response = self.client.chat.completions.create(
                 model="qwq-plus",
-                messages=[
-                    {"role": "system", "content": enhanced_system},
-                    {"role": "user", "content": "用户指令为：" + instruction}
-                ],
+                messages=self._build_messages(instruction),
                 stream=True
             )
             
@@ -402,11 +1150,8 @@ class WorkFlowGenerator:
                             print("---------------------------------")
                         # 打印回复过程
                         if delta.content:
-                            answer_content += delta.content
                             print(delta.content, end='', flush=True)
-            
-            logger.info("工作流生成完成")
-            return answer_content
+                            yield delta.content
         except Exception as e:
             error_msg = f"生成工作流失败: {e}"
             logger.error(error_msg)
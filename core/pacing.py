@@ -0,0 +1,106 @@
+# pacing.py
+# 操作节奏策略：按操作类型设置最小等待时间，取代全局的pyautogui.PAUSE（它会让每个底层调用都等待）；
+# 可选的画面反馈模式在最小等待后继续观察屏幕，画面相对操作前变化并重新稳定即返回，而不是固定等待
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+import cv2
+import numpy as np
+import pyautogui
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 各类操作完成后的最小等待时间（秒）
+PACING_MIN_DELAYS = getattr(config, "PACING_MIN_DELAYS", {
+    "click": 0.15,
+    "open": 0.3,
+    "input": 0.1,
+    "scroll": 0.1,
+    "hotkey": 0.2,
+    "press_enter": 0.2,
+})
+# 同一操作内部相邻底层调用之间的间隔（如点击输入框后再按快捷键，给焦点切换留出时间）
+PACING_STEP_DELAY = getattr(config, "PACING_STEP_DELAY", 0.03)
+# 是否在最小等待后观察画面，直到画面相对操作前发生变化并重新稳定
+PACING_FEEDBACK = getattr(config, "PACING_FEEDBACK", False)
+# 反馈模式下最长额外等待时间（秒），画面始终无变化时等满这么久
+PACING_MAX_WAIT = getattr(config, "PACING_MAX_WAIT", 1.5)
+# 相邻两帧缩略图的平均灰度差低于该值视为画面稳定（光标闪烁等细微变化不计）
+PACING_STABLE_THRESHOLD = getattr(config, "PACING_STABLE_THRESHOLD", 1.0)
+
+_FRAME_SIZE = (64, 36)
+
+
+def frame_signature(image) -> np.ndarray:
+    """屏幕截图的灰度缩略图，用于廉价地比较相邻两帧"""
+    gray = cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2GRAY)
+    return cv2.resize(gray, _FRAME_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def grab_frame() -> np.ndarray:
+    return frame_signature(pyautogui.screenshot())
+
+
+def frame_difference(frame_a: np.ndarray, frame_b: np.ndarray) -> float:
+    return float(np.abs(frame_a - frame_b).mean())
+
+
+class PacingPolicy:
+    """按操作类型的节奏策略
+
+    begin()在一次操作开始前调用，反馈模式下记录画面基线；settle(action_type)在操作完成后调用：
+    先等待该类型的最小时间，开启画面反馈时再等画面相对基线变化并重新稳定，最多max_wait秒。
+    step()用于同一操作内部底层调用之间的短间隔。
+    """
+
+    def __init__(self, min_delays: Optional[Dict[str, float]] = None, default_delay: float = 0.1,
+                 feedback: bool = PACING_FEEDBACK, max_wait: float = PACING_MAX_WAIT,
+                 probe: Callable[[], np.ndarray] = grab_frame,
+                 sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        self.min_delays = dict(PACING_MIN_DELAYS if min_delays is None else min_delays)
+        self.default_delay = default_delay
+        self.feedback = feedback
+        self.max_wait = max_wait
+        self._probe = probe
+        self._sleep = sleep
+        self._clock = clock
+        self._watch = None
+
+    def delay_for(self, action_type: str) -> float:
+        return self.min_delays.get(action_type, self.default_delay)
+
+    def step(self) -> None:
+        self._sleep(PACING_STEP_DELAY)
+
+    def begin(self) -> None:
+        """操作开始前调用：反馈模式下截取画面基线（界面尚未响应时画面不变，只比较相邻两帧会立即判定为稳定）"""
+        self._watch = None
+        if not self.feedback:
+            return
+        from core.waits import ActionWatch, FrameProbe
+        try:
+            self._watch = ActionWatch(FrameProbe(self._probe, clock=self._clock), windows=False,
+                                      sleep=self._sleep, clock=self._clock)
+        except Exception as e:
+            logger.warning(f"画面基线截取失败，按最小间隔处理: {str(e)}")
+
+    def settle(self, action_type: str) -> float:
+        """操作完成后等待，返回实际等待的秒数"""
+        start = self._clock()
+        self._sleep(self.delay_for(action_type))
+        watch, self._watch = self._watch, None
+        if watch is not None:
+            self._wait_response(watch)
+        return self._clock() - start
+
+    def _wait_response(self, watch) -> bool:
+        """等待画面相对基线变化并重新稳定，两个阶段合计不超过max_wait；满足时返回True"""
+        try:
+            return watch.wait(timeout=self.max_wait, stable_timeout=self.max_wait, max_total=self.max_wait).satisfied
+        except Exception as e:
+            logger.warning(f"画面反馈等待失败，按最小间隔处理: {str(e)}")
+        return False
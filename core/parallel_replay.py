@@ -0,0 +1,324 @@
+# parallel_replay.py
+# 并行回放：启动N个Xvfb虚拟显示器，每个工作进程绑定其中一个DISPLAY（pyautogui、截图、窗口注册表都连接该显示器），
+# 从共享任务队列领取录制文件或指令回放，汇总每个工作进程的吞吐量与延迟
+# 用法: python -m core.parallel_replay recordings/ --workers 4 [--instructions 指令.txt] [--speed 2] [--summary out.json]
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import select
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+from core.replay import (EXIT_BAD_INPUT, EXIT_FAILED, EXIT_INTERRUPTED, EXIT_OK, REPLAY_SPEED, RecordingResult,
+                         collect_recordings, print_step, summarize)
+
+logger = logging.getLogger(__name__)
+
+PARALLEL_WORKERS = getattr(config, "PARALLEL_WORKERS", 2)
+# 虚拟显示器的分辨率与色深，应与录制时的屏幕一致，否则录制的坐标会错位
+XVFB_SCREEN = getattr(config, "XVFB_SCREEN", "1920x1080x24")
+XVFB_BINARY = getattr(config, "XVFB_BINARY", "Xvfb")
+XVFB_START_TIMEOUT = getattr(config, "XVFB_START_TIMEOUT", 10.0)
+# 在每个虚拟显示器上启动的窗口管理器命令（如"openbox"），None表示不启动；
+# 没有窗口管理器时不存在_NET_CLIENT_LIST，窗口注册表检测不到新窗口，也无法最大化
+XVFB_WINDOW_MANAGER = getattr(config, "XVFB_WINDOW_MANAGER", None)
+
+# 任务: (类型, 内容)，类型为"recording"（操作文件路径）或"instruction"（指令文本）
+Task = Tuple[str, str]
+
+
+class XvfbDisplay:
+    """一个Xvfb虚拟显示器
+
+    显示编号由Xvfb通过-displayfd自行选择空闲编号并在可以连接时写回，多个回放任务同时启动也不会冲突。
+    """
+
+    def __init__(self, screen: str = XVFB_SCREEN, binary: str = XVFB_BINARY,
+                 window_manager: Optional[str] = XVFB_WINDOW_MANAGER, start_timeout: float = XVFB_START_TIMEOUT):
+        self.screen = screen
+        self.binary = binary
+        self.window_manager = window_manager
+        self.start_timeout = start_timeout
+        self.name: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._wm_process: Optional[subprocess.Popen] = None
+
+    def start(self) -> "XvfbDisplay":
+        executable = shutil.which(self.binary)
+        if executable is None:
+            raise RuntimeError(f"未找到{self.binary}，请先安装Xvfb（如apt install xvfb）")
+        read_fd, write_fd = os.pipe()
+        try:
+            self._process = subprocess.Popen(
+                [executable, "-displayfd", str(write_fd), "-screen", "0", self.screen, "-nolisten", "tcp"],
+                pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            os.close(write_fd)
+            write_fd = None
+            self.name = f":{self._read_display_number(read_fd)}"
+        finally:
+            os.close(read_fd)
+            if write_fd is not None:
+                os.close(write_fd)
+
+        if self.window_manager:
+            self._wm_process = subprocess.Popen(
+                shlex.split(self.window_manager), env=dict(os.environ, DISPLAY=self.name),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        logger.info(f"虚拟显示器{self.name}已启动: {self.screen}")
+        return self
+
+    def _read_display_number(self, fd: int) -> int:
+        deadline = time.monotonic() + self.start_timeout
+        data = b""
+        while not data.endswith(b"\n"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._process.poll() is not None:
+                self.stop()
+                raise RuntimeError(f"Xvfb启动失败或超时（{self.start_timeout}s）")
+            ready, _, _ = select.select([fd], [], [], min(remaining, 0.1))
+            if ready:
+                chunk = os.read(fd, 16)
+                if not chunk:
+                    break
+                data += chunk
+        try:
+            return int(data)
+        except ValueError:
+            self.stop()
+            raise RuntimeError(f"无法读取Xvfb的显示编号: {data!r}")
+
+    def stop(self) -> None:
+        for process in (self._wm_process, self._process):
+            if process is None or process.poll() is not None:
+                continue
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._wm_process = self._process = None
+
+    def __enter__(self) -> "XvfbDisplay":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+
+@contextlib.contextmanager
+def _display_env(display: str):
+    """临时设置DISPLAY；spawn方式启动的子进程继承启动时的环境变量"""
+    previous = os.environ.get("DISPLAY")
+    os.environ["DISPLAY"] = display
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("DISPLAY", None)
+        else:
+            os.environ["DISPLAY"] = previous
+
+
+def _worker_main(worker_id: int, display: str, tasks, results, speed: float, quiet: bool) -> None:
+    """工作进程入口
+
+    DISPLAY由主进程在启动本进程前设置：pyautogui在导入时即连接该显示器并保存为模块级全局状态，
+    截图（PIL ImageGrab）、显示几何与窗口注册表也都读取DISPLAY，因此每个进程各自绑定一个显示器。
+    """
+    start_time = time.perf_counter()
+    error = None
+    try:
+        from core.replay import ReplayRunner
+        with contextlib.redirect_stdout(sys.stderr):
+            runner = ReplayRunner(speed=speed, on_step=None if quiet else print_step)
+            while True:
+                task = tasks.get()
+                if task is None:
+                    break
+                index, kind, payload = task
+                result = runner.run_instruction(payload) if kind == "instruction" else runner.run_file(payload)
+                results.put(("result", worker_id, (index, result)))
+    except Exception as e:
+        error = str(e)
+        logger.error(f"工作进程{worker_id}({display})异常: {error}")
+    results.put(("done", worker_id, (time.perf_counter() - start_time, error)))
+
+
+def _collect(processes: Sequence, results, start_time: float) -> Dict[int, dict]:
+    """收集各工作进程的结果，直到全部报告完成或异常退出"""
+    reports = {worker_id: {"results": [], "elapsed": 0.0, "error": None} for worker_id in range(len(processes))}
+    pending = set(reports)
+    while pending:
+        try:
+            kind, worker_id, payload = results.get(timeout=1)
+        except queue.Empty:
+            for worker_id in [w for w in pending if not processes[w].is_alive()]:
+                pending.discard(worker_id)
+                reports[worker_id]["elapsed"] = time.perf_counter() - start_time
+                reports[worker_id]["error"] = f"工作进程异常退出，退出码{processes[worker_id].exitcode}"
+            continue
+        if kind == "result":
+            reports[worker_id]["results"].append(payload)
+        else:
+            reports[worker_id]["elapsed"], reports[worker_id]["error"] = payload
+            pending.discard(worker_id)
+    return reports
+
+
+def _terminate(process) -> None:
+    if process.is_alive():
+        process.terminate()
+    process.join(timeout=5)
+
+
+def _percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "max": round(max(values), 3)}
+
+
+def worker_stats(results: List[RecordingResult], elapsed: float) -> dict:
+    """吞吐量（每分钟回放数、每秒步骤数）与延迟分布（单步执行加等待、单个回放）"""
+    steps = [step for result in results for step in result.steps if step.status != "skipped"]
+    return {
+        "elapsed": round(elapsed, 3),
+        "recordings": len(results),
+        "passed": sum(result.passed for result in results),
+        "steps": len(steps),
+        "throughput": {
+            "recordings_per_min": round(len(results) * 60 / elapsed, 2) if elapsed > 0 else 0.0,
+            "steps_per_sec": round(len(steps) / elapsed, 2) if elapsed > 0 else 0.0,
+        },
+        "latency": {
+            "step": _percentiles([step.duration + step.wait for step in steps]),
+            "recording": _percentiles([result.duration for result in results]),
+        },
+    }
+
+
+def aggregate(tasks: Sequence[Task], reports: Dict[int, dict], displays: Sequence[str],
+              speed: float, wall: float) -> dict:
+    """在replay.summarize的汇总上增加每个工作进程与整体的吞吐量、延迟，以及未执行的任务"""
+    ordered = sorted((item for report in reports.values() for item in report["results"]), key=lambda item: item[0])
+    results = [result for _, result in ordered]
+    summary = summarize(results, speed, wall)
+
+    finished = {index for index, _ in ordered}
+    unprocessed = [payload for index, (_, payload) in enumerate(tasks) if index not in finished]
+    exit_code = summary["exit_code"] if results else EXIT_OK
+    if unprocessed:
+        exit_code = max(exit_code, EXIT_FAILED)
+    summary["exit_code"] = exit_code
+    summary["unprocessed"] = unprocessed
+
+    overall = worker_stats(results, wall)
+    summary["throughput"] = overall["throughput"]
+    summary["latency"] = overall["latency"]
+    summary["workers"] = [
+        dict(worker_stats([result for _, result in report["results"]], report["elapsed"]),
+             worker=worker_id, display=displays[worker_id], error=report["error"])
+        for worker_id, report in sorted(reports.items())
+    ]
+    return summary
+
+
+def run_parallel(tasks: Sequence[Task], workers: int = PARALLEL_WORKERS, speed: float = REPLAY_SPEED,
+                 screen: str = XVFB_SCREEN, quiet: bool = False) -> dict:
+    """启动虚拟显示器与工作进程，任务按队列动态分配（先完成的进程继续领取），返回汇总"""
+    workers = max(1, min(workers, len(tasks)))
+    # 必须使用spawn：fork会继承主进程中已导入模块的全局状态，pyautogui不会重新连接新的DISPLAY
+    context = multiprocessing.get_context("spawn")
+    task_queue, result_queue = context.Queue(), context.Queue()
+    for index, (kind, payload) in enumerate(tasks):
+        task_queue.put((index, kind, payload))
+    for _ in range(workers):
+        task_queue.put(None)
+
+    start_time = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        displays = [stack.enter_context(XvfbDisplay(screen)) for _ in range(workers)]
+        processes = []
+        for worker_id, display in enumerate(displays):
+            process = context.Process(
+                target=_worker_main, args=(worker_id, display.name, task_queue, result_queue, speed, quiet),
+                name=f"replay-worker-{worker_id}", daemon=True
+            )
+            with _display_env(display.name):
+                process.start()
+            stack.callback(_terminate, process)
+            processes.append(process)
+        reports = _collect(processes, result_queue, start_time)
+    return aggregate(tasks, reports, [display.name for display in displays], speed, time.perf_counter() - start_time)
+
+
+def load_instructions(path: str) -> List[str]:
+    """指令文件每行一条，忽略空行与#开头的注释"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description="在多个Xvfb虚拟显示器上并行回放操作文件或指令")
+    arg_parser.add_argument("paths", nargs="*", help="操作文件、目录或通配符；未指定且没有指令时为预存操作目录")
+    arg_parser.add_argument("--instructions", help="指令文件，每行一条，按工作流模式执行")
+    arg_parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS, help="工作进程（虚拟显示器）数量")
+    arg_parser.add_argument("--speed", type=float, default=REPLAY_SPEED, help="时间压缩倍数，大于1时回放更快")
+    arg_parser.add_argument("--screen", default=XVFB_SCREEN, help="虚拟显示器分辨率与色深，如1920x1080x24")
+    arg_parser.add_argument("--summary", help="JSON汇总写入的文件，默认输出到标准输出")
+    arg_parser.add_argument("--quiet", action="store_true", help="不输出逐步计时")
+    return arg_parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.speed <= 0 or args.workers <= 0:
+        print("回放倍数与工作进程数都必须大于0", file=sys.stderr)
+        return EXIT_BAD_INPUT
+
+    paths = args.paths or ([] if args.instructions else [config.PRE_ACTIONS_PATH])
+    tasks: List[Task] = [("recording", path) for path in collect_recordings(paths)]
+    try:
+        if args.instructions:
+            tasks += [("instruction", instruction) for instruction in load_instructions(args.instructions)]
+    except OSError as e:
+        print(f"读取指令文件失败: {str(e)}", file=sys.stderr)
+        return EXIT_BAD_INPUT
+    if not tasks:
+        print("没有可回放的任务", file=sys.stderr)
+        return EXIT_BAD_INPUT
+
+    try:
+        summary = run_parallel(tasks, args.workers, args.speed, args.screen, args.quiet)
+    except RuntimeError as e:
+        # 虚拟显示器无法启动，属于运行环境问题
+        print(str(e), file=sys.stderr)
+        return EXIT_BAD_INPUT
+    except KeyboardInterrupt:
+        print("\n用户中断回放", file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+    report = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+    return summary["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
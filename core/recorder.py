@@ -1,11 +1,20 @@
 import time
 import json
+import logging
 import os
 import threading
 import pyautogui
 import keyboard
 from pynput import mouse, keyboard as kb
 import config
+from core.fingerprint import FINGERPRINT_MAX_DISTANCE, hamming_distance, perceptual_hash
+from core.geometry import get_geometry
+from core.spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+# 录制期间采样屏幕的间隔（秒），用于判断元素表是否仍对应当前界面
+RECORDER_FRAME_INTERVAL = getattr(config, "RECORDER_FRAME_INTERVAL", 0.5)
 
 class ActionRecorder:
     """操作录制器，用于记录用户的鼠标和键盘操作"""
@@ -21,13 +30,33 @@ class ActionRecorder:
         self._pending_click_timer = None
         self._last_click_info = None
         self._pending_click = None
+        self.spatial_index = None
+        # 元素表对应界面的感知哈希，以及最近一次采样的界面感知哈希
+        self._index_hash = None
+        self._frame_hash = None
+        self._capture = None
+        self._parse_screen = None
+        self._parse_thread = None
+        self._reparse_requested = False
+        self._frame_lock = threading.Lock()
         
-    def start_recording(self):
-        """开始录制操作"""
+    def start_recording(self, parse_screen=None, capture=None):
+        """开始录制操作
+
+        Args:
+            parse_screen: 截图并解析界面的函数，返回(截图, 元素列表)；在后台线程中调用，
+                提供时点击会映射到对应的元素id，界面变化后重新解析
+            capture: 截取当前界面的函数，用于判断元素表是否仍对应当前界面
+        """
         if self.recording:
             return False
             
         self.recording = True
+        self.spatial_index = None
+        self._index_hash = None
+        self._frame_hash = None
+        self._parse_screen = parse_screen if capture is not None else None
+        self._capture = capture
         self.actions = []
         self.start_time = time.time()
         self.last_action_time = self.start_time
@@ -53,6 +82,8 @@ class ActionRecorder:
         self.mouse_listener.start()
         self.keyboard_listener.start()
         self.record_thread.start()
+        # 解析耗时较长，放在后台线程中，不阻塞调用方（界面线程）
+        self._request_parse()
         
         return True
         
@@ -125,10 +156,18 @@ class ActionRecorder:
         return True
         
     def _record_loop(self):
-        """录制循环，记录鼠标位置变化"""
+        """录制循环，记录鼠标位置变化，并定期采样界面"""
         last_pos = pyautogui.position()
+        last_sample = 0.0
         while self.recording:
             time.sleep(0.1)  # 降低CPU使用率
+
+            if self._capture is not None and time.time() - last_sample >= RECORDER_FRAME_INTERVAL:
+                last_sample = time.time()
+                try:
+                    self._observe_frame(self._capture())
+                except Exception as e:
+                    logger.warning(f"录制时采样界面失败: {e}")
             
             # 记录鼠标移动（仅当移动超过一定距离时）
             current_pos = pyautogui.position()
@@ -173,22 +212,24 @@ class ActionRecorder:
                         self._pending_click = None
                     
                     # 记录为open操作
-                    self._add_action("open", {
+                    self._add_action("open", self._with_element({
                         "x": x,
                         "y": y,
                         "button_type": button_type
-                    })
+                    }, self._current_index()))
                     
                     # 重置点击信息
                     self._last_click_info = None
                     return
             
             # 记录点击信息，但延迟处理
+            # 点击处理会延迟到双击判定之后，此时界面可能已经变化，因此在按下时确定元素表
             self._pending_click = {
                 "time": current_time,
                 "x": x,
                 "y": y,
-                "button_type": button_type
+                "button_type": button_type,
+                "spatial_index": self._current_index()
             }
             
             # 更新最后点击信息
@@ -203,16 +244,75 @@ class ActionRecorder:
         """处理待定的点击操作"""
         if self._pending_click and self.recording:
             # 记录为单击操作
-            self._add_action("click", {
+            self._add_action("click", self._with_element({
                 "x": self._pending_click["x"],
                 "y": self._pending_click["y"],
                 "button_type": self._pending_click["button_type"],
                 "clicks": 1
-            })
+            }, self._pending_click["spatial_index"]))
             
             # 清除待处理状态
             self._pending_click = None
 
+    def _observe_frame(self, image):
+        """记录采样的界面；界面变化并稳定下来后重新解析，使后续点击映射到新界面的元素"""
+        frame_hash = perceptual_hash(image)
+        with self._frame_lock:
+            previous, self._frame_hash = self._frame_hash, frame_hash
+            index_hash = self._index_hash
+        stable = previous is not None and hamming_distance(previous, frame_hash) <= FINGERPRINT_MAX_DISTANCE
+        if stable and index_hash is not None and hamming_distance(index_hash, frame_hash) > FINGERPRINT_MAX_DISTANCE:
+            self._request_parse()
+
+    def _current_index(self):
+        """当前界面对应的元素空间索引；元素表解析自其他界面（已过期）或尚未解析完成时返回None"""
+        with self._frame_lock:
+            if self.spatial_index is None or self._index_hash is None or self._frame_hash is None:
+                return None
+            if hamming_distance(self._index_hash, self._frame_hash) > FINGERPRINT_MAX_DISTANCE:
+                return None
+            return self.spatial_index
+
+    def _request_parse(self):
+        """在后台线程中解析当前界面；解析进行中时只标记，完成后再解析一次"""
+        if self._parse_screen is None:
+            return
+        with self._frame_lock:
+            if self._parse_thread is not None and self._parse_thread.is_alive():
+                self._reparse_requested = True
+                return
+            self._reparse_requested = False
+            self._parse_thread = threading.Thread(target=self._parse_loop, daemon=True)
+            self._parse_thread.start()
+
+    def _parse_loop(self):
+        while self.recording:
+            try:
+                image, elements = self._parse_screen()
+                index_hash = perceptual_hash(image)
+            except Exception as e:
+                logger.error(f"录制时解析界面失败: {e}")
+                return
+            with self._frame_lock:
+                self.spatial_index = SpatialIndex.from_objs(elements) if elements else None
+                self._index_hash = index_hash
+                if self._frame_hash is None:
+                    self._frame_hash = index_hash
+                if not self._reparse_requested:
+                    return
+                self._reparse_requested = False
+
+    def _with_element(self, params, spatial_index):
+        """在点击时界面对应的元素中命中点击位置，附加元素id与内容"""
+        if spatial_index is None:
+            return params
+        index = spatial_index.hit(*get_geometry().screen_to_normalized(params["x"], params["y"]))
+        if index is not None:
+            element = spatial_index.element(index)
+            params["element_id"] = element["id"]
+            params["element_content"] = element.get("content", "")
+        return params
+
     def _on_scroll(self, x, y, dx, dy):
         """鼠标滚动事件处理"""
         if not self.recording:
@@ -284,8 +384,12 @@ class ActionRecorder:
     def _get_target_name(self, action_type, params):
         """根据操作类型和参数生成目标名称"""
         if action_type == "click":
+            if params.get("element_content"):
+                return f"点击{params['element_content']}({params.get('x', 0)}, {params.get('y', 0)})"
             return f"点击位置({params.get('x', 0)}, {params.get('y', 0)})"
         elif action_type == "open":
+            if params.get("element_content"):
+                return f"打开{params['element_content']}({params.get('x', 0)}, {params.get('y', 0)})"
             return f"打开位置({params.get('x', 0)}, {params.get('y', 0)})"
         elif action_type == "move":
             return f"移动到({params.get('x', 0)}, {params.get('y', 0)})"
@@ -0,0 +1,328 @@
+# replay.py
+# 无界面批量回放：按录制/预存的操作文件（.jsonl）逐步调用utils.execute_action回放，
+# 支持时间压缩与逐步计时输出，以退出码和JSON汇总报告结果，供夜间回归任务调用
+# 用法: python -m core.replay recordings/ pre_actions/打开记事本.jsonl [--speed 2] [--summary out.json]
+import argparse
+import contextlib
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 回放的时间压缩倍数：录制的延迟与等待界面响应的超时都除以该值
+REPLAY_SPEED = getattr(config, "REPLAY_SPEED", 1.0)
+
+# 退出码
+EXIT_OK = 0            # 全部回放成功
+EXIT_FAILED = 1        # 有步骤执行失败
+EXIT_BAD_INPUT = 2     # 没有可回放的文件或文件内容无效（与argparse参数错误一致）
+EXIT_INTERRUPTED = 130
+
+# 执行后不等待界面响应的操作：延迟本身就是等待，鼠标移动与完成不会使界面变化
+NO_RESPONSE_ACTIONS = ("delay", "move", "finish")
+
+
+class StepResult(NamedTuple):
+    index: int
+    action: str
+    target: str
+    status: str  # success / failed / skipped
+    duration: float  # 执行操作本身的耗时（秒）
+    wait: float  # 操作后等待界面响应与稳定的耗时（秒）
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "action": self.action,
+            "target": self.target,
+            "status": self.status,
+            "duration": round(self.duration, 3),
+            "wait": round(self.wait, 3),
+            "error": self.error,
+        }
+
+
+class RecordingResult(NamedTuple):
+    path: str
+    status: str  # passed / failed / invalid
+    steps: List[StepResult]
+    duration: float
+    error: Optional[str] = None
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "passed"
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "status": self.status,
+            "duration": round(self.duration, 3),
+            "steps_total": len(self.steps),
+            "steps_failed": sum(step.status == "failed" for step in self.steps),
+            "error": self.error,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+
+def collect_recordings(paths: Iterable[str]) -> List[str]:
+    """展开命令行给出的文件、目录与通配符，目录取其中的.jsonl文件；保持给定顺序并去重"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, "*.jsonl")))
+        else:
+            matches = sorted(glob.glob(path)) or [path]
+        for match in matches:
+            if match not in files:
+                files.append(match)
+    return files
+
+
+def scale_action(action: dict, speed: float) -> dict:
+    """按时间压缩倍数缩短录制的延迟，其余操作原样返回"""
+    if action.get("action") != "delay" or speed == 1:
+        return action
+    scaled = dict(action)
+    params = dict(action.get("params") or {})
+    params["seconds"] = round(params.get("seconds", 1) / speed, 3)
+    scaled["params"] = params
+    return scaled
+
+
+def load_recording(path: str) -> Tuple[List[dict], Optional[str]]:
+    """读取并逐行校验回放文件
+
+    utils.load_action_history遇到第一行不符合JSON_SCHEMA的内容就停止并返回已读取的部分，
+    截断或损坏的文件会被当作较短的录制回放并报告成功；这里每一行都必须有效，否则整个文件无效。
+
+    Returns:
+        (操作列表, 错误信息)，文件有效时错误信息为None
+    """
+    from jsonschema import ValidationError, validate
+    from core.action_schema import JSON_SCHEMA
+
+    try:
+        with open(path, 'r', encoding='utf-8', errors='strict') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return [], "文件不存在"
+    except (OSError, UnicodeDecodeError) as e:
+        return [], f"文件读取失败: {str(e)}"
+
+    actions = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            action = json.loads(line)
+            validate(action, JSON_SCHEMA)
+        except (json.JSONDecodeError, ValidationError) as e:
+            return [], f"第{line_number}行无效: {str(e).splitlines()[0][:80]}"
+        actions.append(action)
+    if not actions:
+        return [], "没有有效的操作"
+    return actions, None
+
+
+class ReplayRunner:
+    """无界面回放器，不依赖Qt；utils、pyautogui等在创建回放器时才导入，
+    本模块可以在没有显示器的主进程中导入
+
+    每个文件的步骤依次执行；某一步失败后该文件剩余的步骤标记为skipped（后续步骤依赖前面的界面状态），
+    继续回放下一个文件。
+
+    Args:
+        controller: 屏幕控制器，默认创建PyAutoGUIWrapper
+        speed: 时间压缩倍数，大于1时回放更快
+        on_step: 每步完成后的回调(path, StepResult, total)，用于逐步输出
+        watch_factory: 操作前创建等待器，默认为core.waits.ActionWatch
+    """
+
+    def __init__(self, controller=None, speed: float = REPLAY_SPEED,
+                 on_step: Optional[Callable[[str, StepResult, int], None]] = None,
+                 watch_factory: Optional[Callable[[], Any]] = None):
+        if speed <= 0:
+            raise ValueError(f"回放倍数必须大于0: {speed}")
+        if controller is None:
+            from core.screen_controller import PyAutoGUIWrapper
+            controller = PyAutoGUIWrapper()
+        self.controller = controller
+        self.speed = speed
+        self.on_step = on_step
+        if watch_factory is None:
+            from core.waits import ActionWatch
+            watch_factory = ActionWatch
+        self.watch_factory = watch_factory
+
+    def run(self, paths: Iterable[str]) -> List[RecordingResult]:
+        return [self.run_file(path) for path in paths]
+
+    def run_file(self, path: str) -> RecordingResult:
+        start_time = time.perf_counter()
+        actions, error = load_recording(path)
+        if error is not None:
+            return RecordingResult(path, "invalid", [], time.perf_counter() - start_time, error)
+        return self._run_actions(path, actions, start_time)
+
+    def run_instruction(self, instruction: str) -> RecordingResult:
+        """按指令生成（或从缓存取出）工作流并以工作流模式回放，步骤按图标模板定位
+
+        回放无人确认，只复用精确命中的缓存；回放失败时使该指令的缓存失效，下次重新生成。
+        """
+        import utils
+        start_time = time.perf_counter()
+        try:
+            workflow, _ = utils.generate_workflow(instruction, fuzzy=False)
+        except Exception as e:
+            return RecordingResult(instruction, "invalid", [], time.perf_counter() - start_time, f"工作流生成失败: {str(e)}")
+        if not isinstance(workflow, list) or not workflow:
+            utils.get_workflow_cache().invalidate(instruction)
+            return RecordingResult(instruction, "invalid", [], time.perf_counter() - start_time, "工作流为空")
+        result = self._run_actions(instruction, workflow, start_time, workflow_mode=True)
+        if result.status != "passed":
+            utils.get_workflow_cache().invalidate(instruction)
+        return result
+
+    def _run_actions(self, name: str, actions: List[dict], start_time: float,
+                     workflow_mode: bool = False) -> RecordingResult:
+        steps = []
+        failed = False
+        for index, action in enumerate(actions):
+            if failed:
+                step = StepResult(index, action.get("action", "unknown"), str(action.get("target", "")), "skipped", 0.0, 0.0)
+            else:
+                step = self._run_step(index, action, workflow_mode)
+                failed = step.status == "failed"
+            steps.append(step)
+            if self.on_step is not None:
+                self.on_step(name, step, len(actions))
+            if action.get("action") == "finish" and not failed:
+                break
+        return RecordingResult(name, "failed" if failed else "passed", steps, time.perf_counter() - start_time)
+
+    def _run_step(self, index: int, action: dict, workflow_mode: bool = False) -> StepResult:
+        import utils
+        from core.waits import WAIT_RESPONSE_TIMEOUT, WAIT_STABLE_TIMEOUT
+        action_type = action.get("action", "unknown")
+        target = str(action.get("target", ""))
+        waits = action_type not in NO_RESPONSE_ACTIONS
+        start_time = time.perf_counter()
+        try:
+            watch = self.watch_factory() if waits else None
+            result = utils.execute_action(self.controller, scale_action(action, self.speed), None, workflow_mode)
+        except Exception as e:
+            return StepResult(index, action_type, target, "failed", time.perf_counter() - start_time, 0.0, str(e))
+        duration = time.perf_counter() - start_time
+        # 组合操作中途停止时返回partial，剩余子操作未执行，不能算作成功
+        if result is not None and result[4] != "success":
+            return StepResult(index, action_type, target, "failed", duration, 0.0, f"操作未完全执行: {result[4]}")
+
+        wait = 0.0
+        if waits:
+            # 与界面中回放预存操作一致：等待界面响应并稳定，超时按倍数压缩
+            wait = watch.wait(timeout=WAIT_RESPONSE_TIMEOUT / self.speed,
+                              stable_timeout=WAIT_STABLE_TIMEOUT / self.speed).elapsed
+            self._maximize_new_window(watch.since)
+        return StepResult(index, action_type, target, "success", duration, wait)
+
+    def _maximize_new_window(self, since: float) -> None:
+        """最大化操作后新打开的窗口，使后续步骤的录制坐标与录制时一致"""
+        from core.window_registry import get_window_registry
+        new_windows = get_window_registry().new_since(since)
+        if not new_windows:
+            return
+        try:
+            self.controller.maximize_window(new_windows[0].handle)
+        except Exception as e:
+            logger.warning(f"窗口最大化失败: {str(e)}")
+
+
+def summarize(results: List[RecordingResult], speed: float, duration: float) -> dict:
+    """汇总回放结果，exit_code与进程退出码一致"""
+    steps = [step for result in results for step in result.steps]
+    executed = [step for step in steps if step.status != "skipped"]
+    if not results or any(result.status == "invalid" for result in results):
+        exit_code = EXIT_BAD_INPUT
+    elif all(result.passed for result in results):
+        exit_code = EXIT_OK
+    else:
+        exit_code = EXIT_FAILED
+    return {
+        "exit_code": exit_code,
+        "speed": speed,
+        "duration": round(duration, 3),
+        "recordings": {
+            "total": len(results),
+            "passed": sum(result.passed for result in results),
+            "failed": sum(result.status == "failed" for result in results),
+            "invalid": sum(result.status == "invalid" for result in results),
+        },
+        "steps": {
+            "total": len(steps),
+            "succeeded": sum(step.status == "success" for step in steps),
+            "failed": sum(step.status == "failed" for step in steps),
+            "skipped": sum(step.status == "skipped" for step in steps),
+            "action_time": round(sum(step.duration for step in executed), 3),
+            "wait_time": round(sum(step.wait for step in executed), 3),
+        },
+        "results": [result.to_dict() for result in results],
+    }
+
+
+def print_step(path: str, step: StepResult, total: int) -> None:
+    line = (f"[{os.path.basename(path)}] {step.index + 1}/{total} {step.action:<11} {step.status:<7} "
+            f"执行{step.duration * 1000:7.1f}ms 等待{step.wait * 1000:7.1f}ms  {step.target}")
+    if step.error:
+        line += f"  错误: {step.error}"
+    print(line, flush=True)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description="无界面批量回放操作文件")
+    arg_parser.add_argument("paths", nargs="*", help="操作文件、目录或通配符，默认为预存操作目录")
+    arg_parser.add_argument("--speed", type=float, default=REPLAY_SPEED, help="时间压缩倍数，大于1时回放更快")
+    arg_parser.add_argument("--summary", help="JSON汇总写入的文件，默认输出到标准输出")
+    arg_parser.add_argument("--quiet", action="store_true", help="不输出逐步计时")
+    return arg_parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.speed <= 0:
+        print(f"回放倍数必须大于0: {args.speed}", file=sys.stderr)
+        return EXIT_BAD_INPUT
+
+    files = collect_recordings(args.paths or [config.PRE_ACTIONS_PATH])
+    start_time = time.perf_counter()
+    results = []
+    try:
+        # 逐步输出与回放过程中的打印都写到标准错误，标准输出只保留JSON汇总
+        with contextlib.redirect_stdout(sys.stderr):
+            runner = ReplayRunner(speed=args.speed, on_step=None if args.quiet else print_step)
+            for path in files:
+                results.append(runner.run_file(path))
+    except KeyboardInterrupt:
+        print("\n用户中断回放", file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+    summary = summarize(results, args.speed, time.perf_counter() - start_time)
+    report = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+    return summary["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
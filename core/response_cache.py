@@ -0,0 +1,109 @@
+# response_cache.py
+# 模型响应备忘缓存：对temperature=0的确定性调用，相同输入直接复用上次的响应
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 缓存条目的存活时间（秒）
+RESPONSE_CACHE_TTL = getattr(config, "RESPONSE_CACHE_TTL", 600)
+# 最大缓存条目数
+RESPONSE_CACHE_MAX_ENTRIES = getattr(config, "RESPONSE_CACHE_MAX_ENTRIES", 256)
+
+
+def digest(text: Any) -> str:
+    """计算文本的短摘要"""
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """带TTL与LRU淘汰的响应缓存，并统计命中率与节省的延迟"""
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._latency_saved = 0.0
+
+    @staticmethod
+    def make_key(model: str, instruction: str, elements: str, history: str, extra: str = "",
+                 actions: Optional[Iterable[Any]] = None) -> str:
+        """由模型、指令、元素集、历史等输入生成缓存键
+
+        Args:
+            model: 模型名称
+            instruction: 用户指令
+            elements: 序列化后的元素表
+            history: 渲染后的操作历史
+            extra: 其他影响输出的输入（如分析者建议）
+            actions: 原始的操作列表；渲染后的历史会合并重复操作、摘要早期操作，
+                不同的历史可能渲染为相同文本，因此同时以原始列表区分
+
+        Returns:
+            缓存键
+        """
+        raw_actions = json.dumps(list(actions or []), ensure_ascii=False, sort_keys=True, default=str)
+        return "|".join([model, digest(instruction), digest(elements), digest(history), digest(extra),
+                         digest(raw_actions)])
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，过期条目视为未命中"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, latency, created = entry
+                if time.time() - created <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    self._latency_saved += latency
+                    return value
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def put(self, key: str, value: str, latency: float) -> None:
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            value: 模型响应
+            latency: 产生该响应的调用耗时（秒），命中时计入节省的延迟
+        """
+        with self._lock:
+            self._entries[key] = (value, latency, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        """删除指定条目，如执行后未达到预期效果的响应"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：命中数、未命中数、命中率和累计节省的延迟"""
+        total = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            "latency_saved": round(self._latency_saved, 2),
+            "entries": len(self._entries),
+        }
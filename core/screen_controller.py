@@ -1,24 +1,47 @@
+import os
 import time
 import pyperclip
 import pyautogui
+from PIL import ImageGrab
 from typing import Optional, Any
 
-import win32gui
-import win32con
 from typing import Iterable, List
 import contextlib
 
+try:
+    import win32gui
+    import win32con
+    import win32process
+except ImportError:
+    # 非Windows平台：窗口查找由窗口注册表提供，其余窗口操作不可用
+    win32gui = win32con = win32process = None
+
+import config
+from core.geometry import get_geometry
+from core.pacing import PacingPolicy
+from core.window_registry import get_window_registry
+
+# 截图范围: screen-整个主屏; window-只截取目标窗口; windows-目标窗口与本次任务中出现过的目标窗口的外接矩形；
+# window/windows依赖win32gui获取前台窗口与窗口矩形，目前只支持Windows，其他平台始终截取整个主屏
+CAPTURE_SCOPE = getattr(config, "CAPTURE_SCOPE", "screen")
+# 窗口区域小于该尺寸（如最小化、托盘弹出）时退回整屏截图
+MIN_CAPTURE_SIZE = getattr(config, "MIN_CAPTURE_SIZE", 200)
+
 
 class PyAutoGUIWrapper:
-    def __init__(self, pause: float = 0.5) -> None:
+    def __init__(self, pause: float = 0.1, pacing: Optional[PacingPolicy] = None) -> None:
         """
         初始化 PyAutoGUIWrapper 类
 
         Args:
-            pause: 每次操作后的延迟时间（秒），默认为0.5秒
+            pause: 未在节奏策略中单独配置的操作类型完成后的等待时间（秒），默认为0.1秒
+            pacing: 操作节奏策略，默认按PACING_MIN_DELAYS配置创建
         """
+        self.pacing = pacing or PacingPolicy()
         self._set_pause(pause)
         self._current_hwnd = None 
+        self._capture_windows = set()
+        self._cached_region = None
 
     def move_to(self, x, y):
         """移动鼠标到指定位置"""
@@ -26,19 +49,80 @@ class PyAutoGUIWrapper:
         return True
 
     def _set_pause(self, pause: float) -> None:
-        """设置操作间隔时间"""
-        pyautogui.PAUSE = max(0.1, pause)  # 确保最小间隔0.1秒
+        """设置默认操作间隔；等待由节奏策略按操作类型负责，关闭全局的pyautogui.PAUSE
+        （它会在每个底层调用后等待，一次输入中的点击、全选、删除、粘贴会各等一遍）"""
+        pyautogui.PAUSE = 0
+        self.pacing.default_delay = max(0.0, pause)
 
-    def screen_shot(self) -> Any:
-        """截取当前屏幕截图（带缓存机制）"""
-        if not hasattr(self, '_cached_screenshot') or time.time()-self._last_shot > 1:
-            self._cached_screenshot = pyautogui.screenshot()
+    def screen_shot(self, use_cache: bool = True, region: Optional[tuple] = None) -> Any:
+        """截取当前屏幕截图（带缓存机制）
+
+        Args:
+            use_cache: 是否允许返回1秒内的缓存截图，校验操作效果时需设为False
+            region: 截取的屏幕区域(left, top, width, height)，None表示整个主屏
+        """
+        if (not use_cache or not hasattr(self, '_cached_screenshot')
+                or time.time()-self._last_shot > 1 or region != self._cached_region):
+            if region is None:
+                self._cached_screenshot = pyautogui.screenshot()
+            else:
+                # 区域可能位于副屏（坐标为负或超出主屏），需在全部显示器范围内截取
+                left, top, width, height = region
+                self._cached_screenshot = ImageGrab.grab(
+                    bbox=(left, top, left + width, top + height), all_screens=True
+                )
+            self._cached_region = region
             self._last_shot = time.time()
         return self._cached_screenshot
 
+    def capture_region(self, scope: str = CAPTURE_SCOPE) -> Optional[tuple]:
+        """按截图范围返回需要截取的屏幕区域(left, top, width, height)，None表示整个主屏
+
+        找不到合适的目标窗口（桌面、本程序自身的窗口、最小化窗口）时退回整屏。
+        目前只支持Windows：没有win32gui时（如X11）无法确定目标窗口，同样退回整屏。
+        """
+        if scope == "screen" or win32gui is None:
+            return None
+        target = self._target_window()
+        if target is None:
+            return None
+        hwnds = {target}
+        if scope == "windows":
+            self._capture_windows.add(target)
+            hwnds = {hwnd for hwnd in self._capture_windows if win32gui.IsWindow(hwnd)
+                     and win32gui.IsWindowVisible(hwnd) and not win32gui.IsIconic(hwnd)}
+
+        rects = [win32gui.GetWindowRect(hwnd) for hwnd in hwnds]
+        bounds_left, bounds_top, bounds_width, bounds_height = get_geometry().virtual_bounds
+        left = max(min(rect[0] for rect in rects), bounds_left)
+        top = max(min(rect[1] for rect in rects), bounds_top)
+        right = min(max(rect[2] for rect in rects), bounds_left + bounds_width)
+        bottom = min(max(rect[3] for rect in rects), bounds_top + bounds_height)
+        if right - left < MIN_CAPTURE_SIZE or bottom - top < MIN_CAPTURE_SIZE:
+            return None
+        return left, top, right - left, bottom - top
+
+    def reset_capture_windows(self) -> None:
+        """清空本次任务中记录的目标窗口（新任务开始时调用）"""
+        self._capture_windows.clear()
+
+    def _target_window(self) -> Optional[int]:
+        """当前的目标窗口：优先使用已定位的窗口，否则为前台窗口（排除本程序自身的窗口与桌面）；仅Windows可用"""
+        for hwnd in (self._current_hwnd, win32gui.GetForegroundWindow()):
+            if not hwnd or not win32gui.IsWindow(hwnd) or not win32gui.IsWindowVisible(hwnd):
+                continue
+            if win32gui.IsIconic(hwnd) or win32process.GetWindowThreadProcessId(hwnd)[1] == os.getpid():
+                continue
+            if win32gui.GetClassName(hwnd) in ("Progman", "WorkerW", "Shell_TrayWnd"):
+                continue
+            return hwnd
+        return None
+
     def press_enter(self) -> None:
         """模拟按下回车键"""
+        self.pacing.begin()
         pyautogui.press('enter')
+        self.pacing.settle('press_enter')
 
     def click(self, x: Optional[int] = None, y: Optional[int] = None,
               button: str = 'left', clicks: int = 1, interval: float = 0.05) -> None:
@@ -56,7 +140,9 @@ class PyAutoGUIWrapper:
         self._validate_coordinates(x, y)
         print(f"执行点击操作, x={x}, y={y}, 按钮={button}, 点击次数={clicks}")
         self._move_to_position(x, y)
+        self.pacing.begin()
         pyautogui.click(button=button, clicks=clicks, interval=interval)
+        self.pacing.settle('click')
 
     def open(self, x: Optional[int] = None, y: Optional[int] = None,
                      button: str = 'left', interval: float = 0.0) -> None:
@@ -72,7 +158,9 @@ class PyAutoGUIWrapper:
         self._validate_coordinates(x, y)
         print(f"执行双击操作, x={x}, y={y}")
         self._move_to_position(x, y)
+        self.pacing.begin()
         pyautogui.doubleClick(button=button, interval=interval)
+        self.pacing.settle('open')
 
     def scroll(self, clicks: int, x: Optional[int] = None, y: Optional[int] = None) -> None:
         """
@@ -86,9 +174,11 @@ class PyAutoGUIWrapper:
         self._validate_coordinates(x, y)
         print(f"执行滚动操作: {clicks}")
         self._move_to_position(x, y)
+        self.pacing.begin()
         pyautogui.scroll(clicks)
+        self.pacing.settle('scroll')
 
-    def input(self, text: str, x: int, y: int, interval: float = 0.1) -> None:
+    def input(self, text: str, x: int, y: int, interval: float = 0.1, press_enter: bool = True) -> None:
         """
         模拟文本输入操作
 
@@ -97,14 +187,17 @@ class PyAutoGUIWrapper:
             x: 输入框的x坐标
             y: 输入框的y坐标
             interval: 操作间隔时间（秒）
+            press_enter: 输入后是否按回车提交；表单中间的字段应设为False，避免提前提交
 
         Raises:
             ValueError: 如果坐标值为空
         """
         self._validate_coordinates(x, y, required=True)
         print(f"执行输入操作: {text}")
+        self.pacing.begin()
         self._clear_input(x, y, interval)
-        self._safe_paste(text, interval)
+        self._safe_paste(text, interval, press_enter)
+        self.pacing.settle('input')
 
     def hot_key(self, *keys: str, interval: float = 0.1) -> None:
         """
@@ -129,6 +222,7 @@ class PyAutoGUIWrapper:
         
         normalized_keys = self._normalize_keys(keys)
         print(f"准备执行组合键: {normalized_keys} (间隔: {interval}s)")
+        self.pacing.begin()
         try:
             with self._hotkey_error_handler():
                 # 对于特殊的全局热键，不需要窗口焦点
@@ -138,6 +232,7 @@ class PyAutoGUIWrapper:
                 pyautogui.hotkey(*normalized_keys, interval=interval)
         except pyautogui.FailSafeException as e:
             raise RuntimeError(f"安全模式触发: {str(e)}") from e
+        self.pacing.settle('hotkey')
 
     def _activate_target_window(self) -> None:
         """激活目标窗口"""
@@ -190,31 +285,32 @@ class PyAutoGUIWrapper:
     def _clear_input(self, x: int, y: int, interval: float) -> None:
         """清空输入框"""
         pyautogui.click(x, y)
+        self.pacing.step()
         pyautogui.hotkey('ctrl', 'a', interval=interval)
+        # 全局PAUSE已关闭：相邻按键之间留出间隔，避免响应慢的程序在全选生效前就收到删除或粘贴
+        self.pacing.step()
         pyautogui.press('backspace')
+        self.pacing.step()
     
 
-    def _safe_paste(self, text: str, interval: float) -> None:
-        """安全粘贴文本"""
+    def _safe_paste(self, text: str, interval: float, press_enter: bool = True) -> None:
+        """安全粘贴文本，press_enter为True时粘贴后按回车"""
         try:
             pyperclip.copy(text)
         except pyperclip.PyperclipException as e:
             raise RuntimeError("剪贴板操作失败") from e
         pyautogui.hotkey('ctrl', 'v', interval=interval)
-        pyautogui.press('enter')
+        if press_enter:
+            self.pacing.step()
+            pyautogui.press('enter')
 
     def find_window_by_title(self, title: str, timeout: int = 5) -> int:
-        """查找指定标题的窗口句柄"""
-        def _find_win(hwnd, _):
-            if win32gui.IsWindowVisible(hwnd) and title in win32gui.GetWindowText(hwnd):
-                self._current_hwnd = hwnd
-        start = time.time()
-        while time.time() - start < timeout:
-            win32gui.EnumWindows(_find_win, None)
-            if self._current_hwnd:
-                return self._current_hwnd
-            time.sleep(0.5)
-        raise RuntimeError(f"未找到包含'{title}'的窗口")
+        """查找指定标题的窗口句柄（查窗口注册表的缓存，窗口尚未出现时等待变化通知）"""
+        hwnd = get_window_registry().wait_for(title, timeout)
+        if hwnd is None:
+            raise RuntimeError(f"未找到包含'{title}'的窗口")
+        self._current_hwnd = hwnd
+        return hwnd
 
     def set_foreground_window(self, hwnd: Optional[int] = None) -> None:
         """将指定窗口置于前台"""
@@ -267,12 +363,7 @@ class PyAutoGUIWrapper:
     
     def get_all_windows_titles(self) -> list:
         """获取所有窗口标题"""
-        def _get_windows(hwnd, _):
-            if win32gui.IsWindowVisible(hwnd):
-                self._windows.append(win32gui.GetWindowText(hwnd))
-        self._windows = []
-        win32gui.EnumWindows(_get_windows, None)
-        return self._windows
+        return get_window_registry().titles()
 
 
     def get_active_window_title(self) -> str:
@@ -284,5 +375,6 @@ class PyAutoGUIWrapper:
         """在屏幕上查找指定图标"""
         location = pyautogui.locateCenterOnScreen(image_path, confidence=threshold)
         if location:
-            return location.x, location.y
+            # 匹配结果为截图像素坐标，高分屏下需换算为屏幕坐标
+            return get_geometry().image_to_screen(location.x, location.y)
         return ()
@@ -0,0 +1,125 @@
+# spatial_index.py
+# 界面元素空间索引：均匀网格划分归一化屏幕坐标，支持点命中、矩形范围与最近邻查询
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import config
+
+# 网格单元边长（归一化坐标），默认将屏幕划分为40×40个单元
+SPATIAL_INDEX_CELL_SIZE = getattr(config, "SPATIAL_INDEX_CELL_SIZE", 0.025)
+# 覆盖单元数超过该值的大元素（面板、窗口背景）不放入网格，查询时单独线性检查
+_MAX_CELLS_PER_ELEMENT = 64
+
+
+class SpatialIndex:
+    """基于均匀网格的元素空间索引
+
+    每次解析后由bbox数组构建一次；坐标均为归一化的[0, 1]屏幕坐标，
+    与parse_data输出的bbox一致。查询返回元素在列表中的下标，
+    element()取回原始元素。
+    """
+
+    def __init__(self, bboxes: np.ndarray, elements: Optional[Sequence[Dict[str, Any]]] = None,
+                 cell_size: float = SPATIAL_INDEX_CELL_SIZE):
+        self.bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        self.elements = elements
+        self.cell_size = cell_size
+        self.areas = (self.bboxes[:, 2] - self.bboxes[:, 0]) * (self.bboxes[:, 3] - self.bboxes[:, 1])
+        self._cells: Dict[tuple, List[int]] = defaultdict(list)
+        self._oversized: List[int] = []
+        self._build()
+
+    @classmethod
+    def from_objs(cls, objs: Sequence[Dict[str, Any]], cell_size: float = SPATIAL_INDEX_CELL_SIZE) -> "SpatialIndex":
+        """由parse_data输出的元素表（或字典列表）构建索引"""
+        bboxes = getattr(objs, "bboxes", None)
+        if bboxes is None:
+            bboxes = np.array([obj["bbox"] for obj in objs], dtype=np.float32).reshape(-1, 4)
+        return cls(bboxes, objs, cell_size)
+
+    def __len__(self) -> int:
+        return len(self.bboxes)
+
+    def element(self, index: int) -> Dict[str, Any]:
+        return self.elements[index]
+
+    def _build(self) -> None:
+        if not len(self.bboxes):
+            return
+        cells = np.floor(self.bboxes / self.cell_size).astype(int)
+        spans = (cells[:, 2] - cells[:, 0] + 1) * (cells[:, 3] - cells[:, 1] + 1)
+        for index, (cx1, cy1, cx2, cy2) in enumerate(cells):
+            if spans[index] > _MAX_CELLS_PER_ELEMENT:
+                self._oversized.append(index)
+                continue
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    self._cells[(cx, cy)].append(index)
+
+    def _cell(self, x: float, y: float) -> tuple:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def point(self, x: float, y: float) -> List[int]:
+        """包含该点的所有元素，按面积从小到大排序（最内层元素在前）"""
+        candidates = self._cells.get(self._cell(x, y), []) + self._oversized
+        hits = [
+            i for i in candidates
+            if self.bboxes[i, 0] <= x <= self.bboxes[i, 2] and self.bboxes[i, 1] <= y <= self.bboxes[i, 3]
+        ]
+        return sorted(set(hits), key=lambda i: self.areas[i])
+
+    def hit(self, x: float, y: float) -> Optional[int]:
+        """命中测试：返回包含该点的最内层元素，无命中时返回None"""
+        hits = self.point(x, y)
+        return hits[0] if hits else None
+
+    def rect(self, x1: float, y1: float, x2: float, y2: float) -> List[int]:
+        """与矩形相交的所有元素"""
+        cx1, cy1 = self._cell(x1, y1)
+        cx2, cy2 = self._cell(x2, y2)
+        candidates = set(self._oversized)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                candidates.update(self._cells.get((cx, cy), ()))
+        if not candidates:
+            return []
+        indices = np.fromiter(candidates, dtype=int)
+        boxes = self.bboxes[indices]
+        mask = (boxes[:, 0] <= x2) & (boxes[:, 2] >= x1) & (boxes[:, 1] <= y2) & (boxes[:, 3] >= y1)
+        return sorted(indices[mask].tolist())
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List[int]:
+        """距离该点最近的k个元素（点到框的距离，点在框内时为0）
+
+        以点所在单元为中心逐圈扩大搜索范围，直到已找到k个元素且第k个的距离
+        不超过下一圈能达到的最小距离。
+        """
+        if not len(self.bboxes):
+            return []
+        k = min(k, len(self.bboxes))
+        center = self._cell(x, y)
+        max_ring = int(math.ceil(1 / self.cell_size)) + 1
+        seen = set(self._oversized)
+        for ring in range(max_ring + 1):
+            for cx in range(center[0] - ring, center[0] + ring + 1):
+                for cy in range(center[1] - ring, center[1] + ring + 1):
+                    if max(abs(cx - center[0]), abs(cy - center[1])) == ring:
+                        seen.update(self._cells.get((cx, cy), ()))
+            if len(seen) >= k:
+                indices = np.fromiter(seen, dtype=int)
+                distances = self._distances(indices, x, y)
+                order = np.argsort(distances, kind="stable")[:k]
+                # 下一圈之外的元素距离至少为ring个单元边长
+                if distances[order[-1]] <= ring * self.cell_size:
+                    return indices[order].tolist()
+        indices = np.arange(len(self.bboxes))
+        return indices[np.argsort(self._distances(indices, x, y), kind="stable")[:k]].tolist()
+
+    def _distances(self, indices: np.ndarray, x: float, y: float) -> np.ndarray:
+        boxes = self.bboxes[indices]
+        dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0)
+        dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0)
+        return np.hypot(dx, dy)
@@ -0,0 +1,215 @@
+# state_graph.py
+# 界面状态转移图：节点为屏幕指纹，边为执行过的操作及观测到的延迟，用于跳过已知路径上的模型调用
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from core.fingerprint import ScreenFingerprint
+from core.workflow_cache import normalize_instruction
+
+logger = logging.getLogger(__name__)
+
+# 状态图文件路径，默认与预存操作目录放在同一数据目录下，不随启动时的工作目录变化
+STATE_GRAPH_PATH = getattr(config, "STATE_GRAPH_PATH", os.path.join(
+    os.path.dirname(os.path.normpath(config.PRE_ACTIONS_PATH)), "state_graph.json"))
+# 延迟的指数滑动平均系数
+LATENCY_EMA_ALPHA = 0.3
+# 边的坐标按该网格（像素）归一化，同一目标上的轻微偏移视为同一操作
+STATE_GRAPH_COORD_GRID = getattr(config, "STATE_GRAPH_COORD_GRID", 20)
+
+
+def transition_key(action: Dict[str, Any]) -> str:
+    """边的键：操作类型、目标内容、参数与归一化坐标
+
+    元素id只在单帧内有效，不同帧中的同一id可能是不同元素，因此不参与；
+    坐标按网格取整，点击不同位置的操作不会合并为同一条边。
+    """
+    params = dict(action.get("params") or {})
+    x, y = params.pop("x", None), params.pop("y", None)
+    point = None
+    if x is not None and y is not None:
+        point = [round(x / STATE_GRAPH_COORD_GRID), round(y / STATE_GRAPH_COORD_GRID)]
+    return json.dumps(
+        {"action": action.get("action"), "target": action.get("target"), "params": params, "point": point},
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+
+
+class StateGraph:
+    """持久化的界面状态转移图
+
+    每个成功步骤记录一条(执行前状态, 操作, 执行后状态, 延迟)的边及记录它的指令；
+    每个完成的指令记录其目标状态。planner按延迟加权求最短路径，
+    使任务中已知的前缀无需调用模型即可执行。规划只使用同一指令记录的边，
+    且当前状态须带元素签名，仅凭感知哈希无法区分文字不同的同类界面。
+    """
+
+    def __init__(self, path: str = STATE_GRAPH_PATH):
+        self.path = path
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.edges: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.goals: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def locate(self, screen_fp: ScreenFingerprint) -> Optional[str]:
+        """查找与指纹匹配的节点，精确匹配优先，否则取感知哈希距离最近的匹配节点
+
+        指纹带元素签名时只匹配元素签名相同的节点
+        """
+        if screen_fp.key in self.nodes:
+            return screen_fp.key
+        best_id, best_distance = None, None
+        for node_id, node in self.nodes.items():
+            node_fp = ScreenFingerprint(node["phash"], node.get("elements", ""))
+            if screen_fp.elements and node_fp.elements != screen_fp.elements:
+                continue
+            if not node_fp.matches(screen_fp):
+                continue
+            distance = node_fp.distance(screen_fp)
+            if best_distance is None or distance < best_distance:
+                best_id, best_distance = node_id, distance
+        return best_id
+
+    def record_transition(self, src_fp: ScreenFingerprint, action: Dict[str, Any],
+                          dst_fp: ScreenFingerprint, latency: float, instruction: str = "") -> None:
+        """记录一次成功的状态转移并持久化
+
+        Args:
+            src_fp: 执行前的屏幕指纹
+            action: 执行的操作（含已解析的坐标）
+            dst_fp: 执行后的屏幕指纹
+            latency: 从执行到界面稳定的耗时（秒）
+            instruction: 执行该操作的指令
+        """
+        with self._lock:
+            src_id = self._ensure_node(src_fp)
+            dst_id = self._ensure_node(dst_fp)
+            if src_id == dst_id:
+                return
+            edge_key = transition_key(action)
+            edge = self.edges.setdefault(src_id, {}).get(edge_key)
+            if edge is None or edge["dst"] != dst_id:
+                edge = {"action": action, "dst": dst_id, "latency": latency, "count": 0, "instructions": []}
+                self.edges[src_id][edge_key] = edge
+            else:
+                edge["latency"] = (1 - LATENCY_EMA_ALPHA) * edge["latency"] + LATENCY_EMA_ALPHA * latency
+            edge["count"] += 1
+            key = normalize_instruction(instruction)
+            instructions = edge.setdefault("instructions", [])
+            if key and key not in instructions:
+                instructions.append(key)
+            self._save()
+
+    def record_goal(self, instruction: str, goal_fp: ScreenFingerprint) -> None:
+        """记录指令完成时的目标状态"""
+        key = normalize_instruction(instruction)
+        if not key:
+            return
+        with self._lock:
+            self.goals[key] = self._ensure_node(goal_fp)
+            self._save()
+
+    def has_goal(self, instruction: str) -> bool:
+        """是否记录过该指令的目标状态"""
+        return normalize_instruction(instruction) in self.goals
+
+    def shortest_path(self, src_id: str, dst_id: str,
+                      instruction: Optional[str] = None) -> Optional[List[Tuple[Dict[str, Any], str]]]:
+        """按延迟加权求最短路径
+
+        Args:
+            instruction: 指定时只使用该指令记录的边
+
+        Returns:
+            [(操作, 预期到达的节点id), ...]，不可达时返回None
+        """
+        if src_id == dst_id:
+            return []
+        distances = {src_id: 0.0}
+        previous: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        queue = [(0.0, src_id)]
+        key = normalize_instruction(instruction) if instruction is not None else None
+        while queue:
+            cost, node_id = heapq.heappop(queue)
+            if node_id == dst_id:
+                break
+            if cost > distances.get(node_id, float("inf")):
+                continue
+            for edge in self.edges.get(node_id, {}).values():
+                if key is not None and key not in edge.get("instructions", []):
+                    continue
+                new_cost = cost + max(edge["latency"], 0.01)
+                if new_cost < distances.get(edge["dst"], float("inf")):
+                    distances[edge["dst"]] = new_cost
+                    previous[edge["dst"]] = (node_id, edge["action"])
+                    heapq.heappush(queue, (new_cost, edge["dst"]))
+
+        if dst_id not in previous:
+            return None
+        path = []
+        node_id = dst_id
+        while node_id != src_id:
+            parent, action = previous[node_id]
+            path.append((action, node_id))
+            node_id = parent
+        return list(reversed(path))
+
+    def plan(self, current_fp: ScreenFingerprint, instruction: str) -> List[Tuple[Dict[str, Any], ScreenFingerprint]]:
+        """规划从当前状态到指令目标状态的已知路径，只使用该指令记录的边
+
+        Args:
+            current_fp: 当前屏幕指纹，须带元素签名
+
+        Returns:
+            [(操作, 预期到达的屏幕指纹), ...]，无已知路径或当前指纹缺少元素签名时返回空列表
+        """
+        goal_id = self.goals.get(normalize_instruction(instruction))
+        if goal_id is None or not current_fp.elements:
+            return []
+        src_id = self.locate(current_fp)
+        if src_id is None:
+            return []
+        path = self.shortest_path(src_id, goal_id, instruction) or []
+        return [
+            (action, ScreenFingerprint(self.nodes[node_id]["phash"], self.nodes[node_id].get("elements", "")))
+            for action, node_id in path
+        ]
+
+    def _ensure_node(self, screen_fp: ScreenFingerprint) -> str:
+        node_id = self.locate(screen_fp) or screen_fp.key
+        node = self.nodes.setdefault(node_id, {**screen_fp.to_dict(), "visits": 0})
+        node["visits"] += 1
+        node["last_seen"] = time.time()
+        return node_id
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"状态图文件损坏，已忽略: {e}")
+            return
+        self.nodes = data.get("nodes", {})
+        self.edges = data.get("edges", {})
+        self.goals = data.get("goals", {})
+        logger.info(f"已加载状态图: {len(self.nodes)}个状态, {sum(len(e) for e in self.edges.values())}条转移")
+
+    def _save(self) -> None:
+        """先写临时文件再替换，避免中途退出导致文件损坏"""
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"nodes": self.nodes, "edges": self.edges, "goals": self.goals}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"保存状态图失败: {e}")
@@ -0,0 +1,49 @@
+# streaming.py
+# 在后台线程中消费生成器，调用方线程逐个取出已产出的元素；等待期间回调on_idle，使界面线程保持响应
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def stream_in_background(source: Callable[[], Iterable[T]],
+                         on_idle: Optional[Callable[[], None]] = None,
+                         should_stop: Callable[[], bool] = lambda: False,
+                         poll: float = 0.05) -> Iterator[T]:
+    """在后台线程中迭代source()，逐个产出已生成的元素
+
+    Args:
+        source: 返回可迭代对象的函数（如流式生成工作流），在后台线程中调用
+        on_idle: 等待下一个元素时每隔poll秒调用一次（如QApplication.processEvents）
+        should_stop: 返回True时停止产出；后台线程继续运行至source结束，结果被丢弃
+        poll: 等待间隔（秒）
+
+    Raises:
+        source迭代过程中抛出的异常，在已产出的元素之后重新抛出
+    """
+    items: queue.Queue = queue.Queue()
+    finished = object()
+
+    def _produce():
+        try:
+            for item in source():
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(finished)
+
+    threading.Thread(target=_produce, daemon=True).start()
+    while not should_stop():
+        try:
+            item = items.get(timeout=poll)
+        except queue.Empty:
+            if on_idle is not None:
+                on_idle()
+            continue
+        if item is finished:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
@@ -0,0 +1,112 @@
+# verified_steps.py
+# 复用已验证步骤：保存的步骤只有在当前屏幕与保存时一致才按保存的坐标直接执行。
+# 整屏感知哈希（64位）看不出对话框文字、列表行这类局部变化，因此对带坐标的步骤
+# 额外比较目标坐标附近区域的哈希；不需要解析界面，也不调用模型
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import config
+from core.fingerprint import ImageLike, ScreenFingerprint, _to_gray_array, crop_box, fingerprint, hamming_distance, region_hash
+from core.geometry import get_geometry
+
+logger = logging.getLogger(__name__)
+
+# 目标区域：以操作坐标为中心的半宽、半高（屏幕坐标）
+TARGET_REGION = getattr(config, "TARGET_REGION", (80, 30))
+# 目标区域哈希允许的最大汉明距离（共64位）
+TARGET_MAX_DISTANCE = getattr(config, "TARGET_MAX_DISTANCE", 4)
+
+
+def target_hash(image: ImageLike, params: Optional[Dict[str, Any]],
+                region: Optional[Sequence[int]] = None) -> Optional[str]:
+    """操作坐标附近区域的感知哈希
+
+    Args:
+        image: 截图
+        params: 操作参数，包含屏幕坐标x、y
+        region: 截图覆盖的屏幕区域，默认为当前截图区域
+
+    Returns:
+        区域哈希；操作没有坐标或坐标不在截图内时返回None
+    """
+    if not params or params.get("x") is None or params.get("y") is None:
+        return None
+    gray = _to_gray_array(image)
+    height, width = gray.shape[:2]
+    geometry = get_geometry()
+    region = region or geometry.capture_region
+    x, y = geometry.screen_to_image(params["x"], params["y"], (width, height), region)
+    if not (0 <= x < width and 0 <= y < height):
+        return None
+    scale = width / region[2]
+    half_width, half_height = TARGET_REGION
+    return region_hash(gray, crop_box((width, height), x, y, int(half_width * scale), int(half_height * scale)))
+
+
+def saved_fingerprint(screen_fp: ScreenFingerprint, image: ImageLike, params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """随操作记录保存的执行前状态：整屏指纹加目标区域哈希"""
+    saved = screen_fp.to_dict()
+    target = target_hash(image, params)
+    if target is not None:
+        saved["target"] = target
+    return saved
+
+
+def check_step(saved_action: Dict[str, Any], image: ImageLike) -> Tuple[bool, str]:
+    """判断保存的步骤能否在当前屏幕上按保存的坐标执行
+
+    Returns:
+        (是否匹配, 原因)
+    """
+    saved = saved_action.get("fingerprint") or {}
+    saved_fp = ScreenFingerprint.from_dict(saved)
+    if saved_fp is None:
+        return False, "没有保存的屏幕指纹"
+    current_fp = fingerprint(image)
+    if not saved_fp.matches(current_fp):
+        return False, f"屏幕指纹不匹配(距离{saved_fp.distance(current_fp)})"
+
+    params = saved_action.get("params") or {}
+    if params.get("x") is None or params.get("y") is None:
+        # 快捷键等不依赖坐标的操作，只比较整屏指纹
+        return True, "ok"
+    if not saved.get("target"):
+        return False, "缺少目标区域哈希，无法确认目标元素未变化"
+    current_target = target_hash(image, params)
+    if current_target is None:
+        return False, "目标坐标不在当前截图内"
+    distance = hamming_distance(saved["target"], current_target)
+    if distance > TARGET_MAX_DISTANCE:
+        return False, f"目标区域不匹配(距离{distance})"
+    return True, "ok"
+
+
+def replay_verified_steps(saved_actions: Iterable[Dict[str, Any]], capture: Callable[[], ImageLike],
+                          execute: Callable[[Dict[str, Any], Dict[str, str]], bool],
+                          should_stop: Callable[[], bool] = lambda: False) -> List[Dict[str, Any]]:
+    """逐步复用保存的步骤，遇到第一个不匹配或执行后界面未按预期变化的步骤即停止
+
+    Args:
+        saved_actions: 保存的操作记录（含fingerprint）
+        capture: 截取当前屏幕，返回截图
+        execute: 执行一个步骤（不含fingerprint），第二个参数为该步骤保存的执行前指纹；
+            返回是否成功且界面按预期变化。步骤执行后即应计入调用方的历史，即使之后判定未按预期变化
+        should_stop: 返回True时停止
+
+    Returns:
+        已复用的保存记录
+    """
+    replayed = []
+    for saved_action in saved_actions:
+        if should_stop():
+            break
+        ok, reason = check_step(saved_action, capture())
+        if not ok:
+            logger.info(f"步骤{len(replayed) + 1}{reason}，转入完整流程")
+            break
+        step = {k: v for k, v in saved_action.items() if k != "fingerprint"}
+        if not execute(step, saved_action["fingerprint"]):
+            logger.info(f"步骤{len(replayed) + 1}执行后界面未按预期变化，转入完整流程")
+            break
+        replayed.append(saved_action)
+    return replayed
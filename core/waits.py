@@ -0,0 +1,219 @@
+# waits.py
+# 条件等待引擎：wait_until按自适应间隔轮询可组合的条件（画面变化、画面稳定、新窗口出现、模板可见、元素存在），
+# 条件满足或到达截止时间即返回，取代执行路径中固定时长的sleep
+import logging
+import time
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+import numpy as np
+import pyautogui
+
+import config
+from core.pacing import PACING_STABLE_THRESHOLD, frame_difference, grab_frame
+
+logger = logging.getLogger(__name__)
+
+# 轮询间隔从最小值开始按倍数增长，不超过最大值
+WAIT_MIN_INTERVAL = getattr(config, "WAIT_MIN_INTERVAL", 0.05)
+WAIT_MAX_INTERVAL = getattr(config, "WAIT_MAX_INTERVAL", 0.5)
+WAIT_BACKOFF = getattr(config, "WAIT_BACKOFF", 1.5)
+# 操作后等待界面响应（画面变化或新窗口出现）的最长时间
+WAIT_RESPONSE_TIMEOUT = getattr(config, "WAIT_RESPONSE_TIMEOUT", 2.0)
+# 界面响应后等待画面稳定的最长时间，以及画面保持不变多久视为稳定
+WAIT_STABLE_TIMEOUT = getattr(config, "WAIT_STABLE_TIMEOUT", 3.0)
+WAIT_STABLE_QUIET = getattr(config, "WAIT_STABLE_QUIET", 0.3)
+# 缩略图中平均灰度差超过该值视为画面变化
+WAIT_CHANGE_THRESHOLD = getattr(config, "WAIT_CHANGE_THRESHOLD", 2.0)
+
+
+class WaitResult(NamedTuple):
+    satisfied: bool
+    elapsed: float
+    polls: int
+    value: Any = None  # 满足时条件给出的结果（如新窗口、模板位置）
+
+
+class Condition:
+    """可组合的等待条件：check()返回真值表示满足，满足时的返回值记入value
+
+    用 & 和 | 组合，等价于all_of与any_of。
+    """
+
+    def __init__(self, check: Callable[[], Any], name: str = "condition"):
+        self._check = check
+        self.name = name
+        self.value: Any = None
+
+    def __call__(self) -> bool:
+        result = self._check()
+        if result:
+            self.value = result
+        return bool(result)
+
+    def __and__(self, other: "Condition") -> "Condition":
+        return all_of(self, other)
+
+    def __or__(self, other: "Condition") -> "Condition":
+        return any_of(self, other)
+
+    def __repr__(self) -> str:
+        return f"Condition({self.name})"
+
+
+def all_of(*conditions: Condition) -> Condition:
+    """全部满足；每轮都检查所有条件，使有状态的条件（如画面稳定）持续更新"""
+    def check():
+        results = [condition() for condition in conditions]
+        return all(results) and [condition.value for condition in conditions]
+    return Condition(check, " & ".join(c.name for c in conditions))
+
+
+def any_of(*conditions: Condition) -> Condition:
+    """任一满足，返回第一个满足的条件的结果"""
+    def check():
+        for condition in conditions:
+            if condition():
+                return condition.value
+        return None
+    return Condition(check, " | ".join(c.name for c in conditions))
+
+
+def wait_until(condition: Condition, timeout: float,
+               min_interval: float = WAIT_MIN_INTERVAL, max_interval: float = WAIT_MAX_INTERVAL,
+               backoff: float = WAIT_BACKOFF, should_stop: Optional[Callable[[], bool]] = None,
+               sleep: Callable[[float], None] = time.sleep,
+               clock: Callable[[], float] = time.monotonic) -> WaitResult:
+    """轮询等待条件满足
+
+    刚开始按最小间隔密集检查，之后间隔逐步增大；最后一次等待不会越过截止时间。
+
+    Args:
+        condition: 等待的条件
+        timeout: 最长等待时间（秒）
+        should_stop: 返回True时提前结束（如用户点击停止）
+    """
+    start = clock()
+    deadline = start + timeout
+    interval = min_interval
+    polls = 0
+    while True:
+        polls += 1
+        try:
+            if condition():
+                return WaitResult(True, clock() - start, polls, condition.value)
+        except Exception as e:
+            logger.warning(f"等待条件{condition.name}检查失败: {str(e)}")
+        remaining = deadline - clock()
+        if remaining <= 0 or (should_stop is not None and should_stop()):
+            return WaitResult(False, clock() - start, polls)
+        sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+class FrameProbe:
+    """画面缩略图来源；同一轮轮询中多个画面条件共享一次截图"""
+
+    def __init__(self, grab: Callable[[], np.ndarray] = grab_frame, max_age: float = 0.03,
+                 clock: Callable[[], float] = time.monotonic):
+        self._grab = grab
+        self._clock = clock
+        self.max_age = max_age
+        self._frame: Optional[np.ndarray] = None
+        self._taken_at = float("-inf")
+
+    def frame(self) -> np.ndarray:
+        now = self._clock()
+        if self._frame is None or now - self._taken_at > self.max_age:
+            self._frame = self._grab()
+            self._taken_at = now
+        return self._frame
+
+
+def frame_changed(probe: FrameProbe, threshold: float = WAIT_CHANGE_THRESHOLD) -> Condition:
+    """画面相对创建条件时（应在执行操作前创建）发生变化"""
+    baseline = probe.frame()
+    return Condition(lambda: frame_difference(baseline, probe.frame()) >= threshold, "frame_changed")
+
+
+def frame_stable(probe: FrameProbe, quiet: float = WAIT_STABLE_QUIET,
+                 threshold: float = PACING_STABLE_THRESHOLD,
+                 clock: Callable[[], float] = time.monotonic) -> Condition:
+    """画面已连续quiet秒没有明显变化"""
+    state = {"frame": None, "since": None}
+
+    def check():
+        current = probe.frame()
+        now = clock()
+        if state["frame"] is None or frame_difference(state["frame"], current) >= threshold:
+            state["frame"], state["since"] = current, now
+        return now - state["since"] >= quiet
+    return Condition(check, "frame_stable")
+
+
+def window_appeared(since: float, title: Optional[str] = None, registry=None) -> Condition:
+    """since之后出现了新窗口（可按标题子串过滤），结果为该窗口的WindowInfo"""
+    if registry is None:
+        from core.window_registry import get_window_registry
+        registry = get_window_registry()
+
+    def check():
+        return next((info for info in registry.new_since(since) if title is None or title in info.title), None)
+    return Condition(check, f"window_appeared({title or '*'})")
+
+
+def template_visible(image_path: str, confidence: float = 0.9, region: Optional[tuple] = None) -> Condition:
+    """屏幕上出现与模板图像匹配的区域，结果为其中心坐标"""
+    def check():
+        try:
+            location = pyautogui.locateCenterOnScreen(image_path, confidence=confidence, region=region)
+        except getattr(pyautogui, "ImageNotFoundException", LookupError):
+            return None
+        return (location.x, location.y) if location else None
+    return Condition(check, f"template_visible({image_path})")
+
+
+def element_present(content: str, elements: Callable[[], Iterable[dict]]) -> Condition:
+    """elements()返回的界面元素中存在内容包含content的元素，结果为该元素"""
+    def check():
+        return next((obj for obj in elements() if content in (obj.get("content") or "")), None)
+    return Condition(check, f"element_present({content})")
+
+
+class ActionWatch:
+    """在执行操作前创建，记录画面基线与窗口基线；操作后调用wait()等待界面响应并稳定
+
+    windows为False时只观察画面，不查询窗口注册表（如每个底层操作后的节奏等待）。
+    """
+
+    def __init__(self, probe: Optional[FrameProbe] = None, registry=None, windows: bool = True,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.monotonic):
+        if windows and registry is None:
+            from core.window_registry import get_window_registry
+            registry = get_window_registry()
+        self.probe = probe or FrameProbe(clock=clock)
+        self.registry = registry if windows else None
+        self._sleep = sleep
+        self._clock = clock
+        self.changed = frame_changed(self.probe)
+        # 操作前同步窗口注册表，之前已出现的窗口不会被当作操作打开的窗口
+        self.since = self.registry.mark() if self.registry is not None else time.time()
+
+    def wait(self, timeout: float = WAIT_RESPONSE_TIMEOUT, stable_timeout: float = WAIT_STABLE_TIMEOUT,
+             should_stop: Optional[Callable[[], bool]] = None, max_total: Optional[float] = None) -> WaitResult:
+        """先等画面变化或新窗口出现（最多timeout秒，界面始终无变化时即等待这么久），再等画面稳定
+
+        Args:
+            max_total: 两个阶段合计的最长等待时间，None表示不限制
+        """
+        responded_on = self.changed
+        if self.registry is not None:
+            responded_on = responded_on | window_appeared(self.since, registry=self.registry)
+        responded = wait_until(responded_on, timeout, should_stop=should_stop, sleep=self._sleep, clock=self._clock)
+        if not responded.satisfied:
+            return responded
+        if max_total is not None:
+            stable_timeout = min(stable_timeout, max_total - responded.elapsed)
+        settled = wait_until(frame_stable(self.probe, clock=self._clock), stable_timeout, should_stop=should_stop,
+                             sleep=self._sleep, clock=self._clock)
+        return WaitResult(settled.satisfied, responded.elapsed + settled.elapsed,
+                          responded.polls + settled.polls, responded.value)
@@ -0,0 +1,319 @@
+# window_registry.py
+# 窗口注册表：缓存顶层窗口的句柄、标题与位置，提供按标题O(1)查找与"某时刻之后新出现的窗口"查询，
+# Linux下由X11的_NET_CLIENT_LIST/_NET_WM_NAME属性变化事件驱动，Windows下沿用win32gui枚举
+import importlib.util
+import logging
+import os
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Windows下缓存的最长有效期（秒），查询时超过该时间才重新枚举一次
+WINDOW_REGISTRY_MAX_AGE = getattr(config, "WINDOW_REGISTRY_MAX_AGE", 0.2)
+
+Rect = Tuple[int, int, int, int]
+
+
+class WindowInfo(NamedTuple):
+    handle: int
+    title: str
+    rect: Rect  # (left, top, right, bottom)，与win32gui.GetWindowRect一致
+    first_seen: float  # 注册表首次发现该窗口的时间，启动时已存在的窗口为0
+
+
+class WindowRegistry:
+    """窗口注册表基类
+
+    子类实现_enumerate()返回当前全部顶层窗口；事件驱动的子类在后台线程中调用
+    _upsert/_remove增量更新，不需要枚举。查询方法都只读缓存。
+    """
+
+    def __init__(self):
+        self._windows: Dict[int, WindowInfo] = {}
+        self._by_title: Dict[str, Set[int]] = defaultdict(set)
+        self._changed = threading.Condition()
+        self._synced = False
+
+    # ---- 由子类实现 ----
+    def _enumerate(self) -> Dict[int, Tuple[str, Rect]]:
+        return {}
+
+    def start(self) -> "WindowRegistry":
+        self.sync()
+        return self
+
+    def stop(self) -> None:
+        pass
+
+    def refresh(self) -> None:
+        """查询前调用，保证缓存足够新；事件驱动的实现无需任何操作"""
+        if not self._synced:
+            self.sync()
+
+    def mark(self) -> float:
+        """执行操作前调用：使缓存与当前窗口一致后返回当前时间，作为new_since的基线
+
+        不在操作前同步时，操作前已出现但尚未枚举到的窗口会在操作后的枚举中才被发现，被误判为新窗口。
+        """
+        self.sync()
+        return time.time()
+
+    # ---- 缓存维护 ----
+    def sync(self) -> None:
+        """完整枚举一次并与缓存对比"""
+        current = self._enumerate()
+        with self._changed:
+            for handle in set(self._windows) - set(current):
+                self._remove(handle)
+            for handle, (title, rect) in current.items():
+                self._upsert(handle, title, rect)
+            self._synced = True
+
+    def _upsert(self, handle: int, title: str, rect: Rect) -> None:
+        with self._changed:
+            old = self._windows.get(handle)
+            if old is not None and old.title == title and old.rect == rect:
+                return
+            if old is not None:
+                self._by_title[old.title].discard(handle)
+            first_seen = old.first_seen if old is not None else (time.time() if self._synced else 0.0)
+            self._windows[handle] = WindowInfo(handle, title, rect, first_seen)
+            self._by_title[title].add(handle)
+            self._changed.notify_all()
+
+    def _remove(self, handle: int) -> None:
+        with self._changed:
+            old = self._windows.pop(handle, None)
+            if old is not None:
+                handles = self._by_title[old.title]
+                handles.discard(handle)
+                if not handles:
+                    del self._by_title[old.title]
+                self._changed.notify_all()
+
+    # ---- 查询 ----
+    def titles(self) -> List[str]:
+        self.refresh()
+        with self._changed:
+            return [info.title for info in self._windows.values()]
+
+    def get(self, handle: int) -> Optional[WindowInfo]:
+        self.refresh()
+        return self._windows.get(handle)
+
+    def find(self, title: str, exact: bool = False) -> Optional[int]:
+        """按标题查找窗口句柄：完整标题为O(1)字典查找，否则在标题中查找子串"""
+        self.refresh()
+        with self._changed:
+            handles = self._by_title.get(title)
+            if handles:
+                return next(iter(handles))
+            if exact:
+                return None
+            return next((info.handle for info in self._windows.values() if title and title in info.title), None)
+
+    def new_since(self, timestamp: float) -> List[WindowInfo]:
+        """timestamp之后新出现的窗口，按出现时间排序"""
+        self.refresh()
+        with self._changed:
+            return sorted(
+                (info for info in self._windows.values() if info.first_seen > timestamp and info.title),
+                key=lambda info: info.first_seen
+            )
+
+    def wait_for(self, title: str, timeout: float = 5.0) -> Optional[int]:
+        """等待标题包含title的窗口出现；事件驱动时由变化通知唤醒，不轮询"""
+        deadline = time.time() + timeout
+        while True:
+            handle = self.find(title)
+            remaining = deadline - time.time()
+            if handle is not None or remaining <= 0:
+                return handle
+            with self._changed:
+                self._changed.wait(min(remaining, self._wait_step()))
+
+    def _wait_step(self) -> float:
+        return WINDOW_REGISTRY_MAX_AGE
+
+
+class Win32WindowRegistry(WindowRegistry):
+    """Windows实现：win32gui枚举可见顶层窗口，缓存超过WINDOW_REGISTRY_MAX_AGE后在下次查询时刷新"""
+
+    def __init__(self, max_age: float = WINDOW_REGISTRY_MAX_AGE):
+        super().__init__()
+        self.max_age = max_age
+        self._synced_at = 0.0
+
+    def _enumerate(self) -> Dict[int, Tuple[str, Rect]]:
+        import win32gui
+        windows = {}
+
+        def _collect(hwnd, _):
+            if win32gui.IsWindowVisible(hwnd):
+                try:
+                    rect = tuple(win32gui.GetWindowRect(hwnd))
+                except Exception:
+                    # 枚举过程中窗口已关闭
+                    rect = (0, 0, 0, 0)
+                windows[hwnd] = (win32gui.GetWindowText(hwnd), rect)
+        win32gui.EnumWindows(_collect, None)
+        return windows
+
+    def sync(self) -> None:
+        super().sync()
+        self._synced_at = time.time()
+
+    def refresh(self) -> None:
+        if time.time() - self._synced_at > self.max_age:
+            self.sync()
+
+    def _wait_step(self) -> float:
+        return self.max_age
+
+
+class X11WindowRegistry(WindowRegistry):
+    """X11实现：监听根窗口_NET_CLIENT_LIST与各客户窗口的标题/位置变化事件，后台线程增量更新缓存"""
+
+    def __init__(self, display_name: Optional[str] = None):
+        super().__init__()
+        from Xlib import X, display
+        self._X = X
+        self._display = display.Display(display_name)
+        self._root = self._display.screen().root
+        self._atoms = {
+            name: self._display.intern_atom(name)
+            for name in ("_NET_CLIENT_LIST", "_NET_WM_NAME", "WM_NAME", "UTF8_STRING")
+        }
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "X11WindowRegistry":
+        if self._thread is not None:
+            return self
+        self._root.change_attributes(event_mask=self._X.PropertyChangeMask)
+        self._sync_client_list()
+        self._synced = True
+        self._thread = threading.Thread(target=self._event_loop, name="x11-window-registry", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self._display.close()
+
+    def refresh(self) -> None:
+        pass
+
+    def mark(self) -> float:
+        # 事件线程持续更新缓存，无需枚举
+        return time.time()
+
+    def _wait_step(self) -> float:
+        # 事件驱动：变化时会被通知唤醒，这里的超时只是兜底
+        return 1.0
+
+    def _client_list(self) -> List[int]:
+        prop = self._root.get_full_property(self._atoms["_NET_CLIENT_LIST"], self._X.AnyPropertyType)
+        return list(prop.value) if prop is not None else []
+
+    def _read_window(self, handle: int) -> Optional[Tuple[str, Rect]]:
+        from Xlib import error
+        window = self._display.create_resource_object("window", handle)
+        try:
+            prop = window.get_full_property(self._atoms["_NET_WM_NAME"], self._atoms["UTF8_STRING"])
+            if prop is None:
+                prop = window.get_full_property(self._atoms["WM_NAME"], self._X.AnyPropertyType)
+            title = prop.value if prop is not None else b""
+            if isinstance(title, bytes):
+                title = title.decode("utf-8", errors="replace")
+            geometry = window.get_geometry()
+            origin = self._root.translate_coords(window, 0, 0)
+        except (error.BadWindow, error.BadDrawable):
+            return None
+        return title, (origin.x, origin.y, origin.x + geometry.width, origin.y + geometry.height)
+
+    def _track(self, handle: int) -> None:
+        from Xlib import error
+        window = self._display.create_resource_object("window", handle)
+        try:
+            window.change_attributes(event_mask=self._X.PropertyChangeMask | self._X.StructureNotifyMask)
+        except error.BadWindow:
+            return
+        info = self._read_window(handle)
+        if info is not None:
+            self._upsert(handle, *info)
+
+    def _sync_client_list(self) -> None:
+        clients = set(self._client_list())
+        for handle in set(self._windows) - clients:
+            self._remove(handle)
+        for handle in clients - set(self._windows):
+            self._track(handle)
+
+    def _enumerate(self) -> Dict[int, Tuple[str, Rect]]:
+        windows = {}
+        for handle in self._client_list():
+            info = self._read_window(handle)
+            if info is not None:
+                windows[handle] = info
+        return windows
+
+    def _event_loop(self) -> None:
+        X = self._X
+        title_atoms = (self._atoms["_NET_WM_NAME"], self._atoms["WM_NAME"])
+        while not self._stopping.is_set():
+            if not self._display.pending_events():
+                # 等待X连接上有数据，超时后检查停止标志
+                select.select([self._display.fileno()], [], [], 0.5)
+                if not self._display.pending_events():
+                    continue
+            event = self._display.next_event()
+            try:
+                if event.type == X.PropertyNotify:
+                    if event.window.id == self._root.id:
+                        if event.atom == self._atoms["_NET_CLIENT_LIST"]:
+                            self._sync_client_list()
+                    elif event.atom in title_atoms and event.window.id in self._windows:
+                        info = self._read_window(event.window.id)
+                        if info is not None:
+                            self._upsert(event.window.id, *info)
+                elif event.type == X.ConfigureNotify and event.window.id in self._windows:
+                    info = self._read_window(event.window.id)
+                    if info is not None:
+                        self._upsert(event.window.id, *info)
+                elif event.type == X.DestroyNotify:
+                    self._remove(event.window.id)
+            except Exception as e:
+                logger.warning(f"处理X11窗口事件失败: {str(e)}")
+
+
+def create_window_registry() -> WindowRegistry:
+    """按平台创建窗口注册表：有win32gui时使用Windows实现，有X11显示时使用事件驱动实现，都不可用时返回空注册表"""
+    try:
+        if importlib.util.find_spec("win32gui") is not None:
+            return Win32WindowRegistry().start()
+        if os.environ.get("DISPLAY"):
+            return X11WindowRegistry().start()
+    except Exception as e:
+        logger.warning(f"窗口注册表初始化失败，窗口检测不可用: {str(e)}")
+    return WindowRegistry().start()
+
+
+_window_registry = None
+
+
+def get_window_registry() -> WindowRegistry:
+    """获取共享的窗口注册表"""
+    global _window_registry
+    if _window_registry is None:
+        _window_registry = create_window_registry()
+    return _window_registry
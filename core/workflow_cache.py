@@ -0,0 +1,268 @@
+# workflow_cache.py
+# 工作流缓存：按规范化指令精确查找，未命中时用字符n-gram TF-IDF做本地相似度检索
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from core.file_lock import file_lock
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件路径，默认与预存操作目录放在同一数据目录下，不随启动时的工作目录变化
+WORKFLOW_CACHE_PATH = getattr(config, "WORKFLOW_CACHE_PATH", os.path.join(
+    os.path.dirname(os.path.normpath(config.PRE_ACTIONS_PATH)), "workflow_cache.json"))
+# 相似度命中阈值（余弦相似度）
+WORKFLOW_SIMILARITY_THRESHOLD = getattr(config, "WORKFLOW_SIMILARITY_THRESHOLD", 0.85)
+
+NGRAM_SIZES = (2, 3)
+
+# 指令中的字面参数：引号内的文本、文件名、数字；相似指令只有这些完全一致时才能复用工作流
+_LITERAL_PATTERN = re.compile(
+    r'["\'“”‘’「」『』《》](.+?)["\'“”‘’「」『』《》]'
+    r'|([a-z0-9_\-.]+\.[a-z0-9]{1,8})\b'
+    r'|(\d+(?:\.\d+)?)'
+)
+# 否定词：相似度对一两个字的差异不敏感，"我不回家吃饭"与"我回家吃饭"含义相反
+_NEGATION_PATTERN = re.compile(r"不|没|别|勿|未|非|无|\b(?:not|no|never|don't|dont)\b")
+
+
+def normalize_instruction(instruction: str) -> str:
+    """规范化指令：全半角统一、转小写、去除空白与标点"""
+    text = unicodedata.normalize("NFKC", instruction or "").lower()
+    return "".join(
+        char for char in text
+        if not char.isspace() and not unicodedata.category(char).startswith(("P", "S"))
+    )
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = NGRAM_SIZES) -> Counter:
+    """提取字符n-gram词频，过短的文本整体作为一个特征"""
+    grams = Counter()
+    for size in sizes:
+        grams.update(text[i:i + size] for i in range(len(text) - size + 1))
+    if not grams and text:
+        grams[text] = 1
+    return grams
+
+
+def literal_tokens(instruction: str) -> List[str]:
+    """提取指令中必须精确一致的部分：字面参数与否定词"""
+    text = unicodedata.normalize("NFKC", instruction or "").lower()
+    tokens = ["".join(groups) for groups in _LITERAL_PATTERN.findall(text)]
+    tokens.extend(f"neg:{word}" for word in _NEGATION_PATTERN.findall(text))
+    return sorted(tokens)
+
+
+class WorkflowCache:
+    """持久化的工作流缓存
+
+    精确命中按规范化指令查找；否则在倒排索引上对候选条目计算TF-IDF余弦相似度，
+    超过阈值且字面参数（数字、引号内文本、文件名）与否定词完全一致时返回最相似条目的工作流。
+    相似命中的工作流是为另一条指令生成的，只能在用户确认后执行；自动执行的场景应使用fuzzy=False。
+    """
+
+    def __init__(self, path: str = WORKFLOW_CACHE_PATH,
+                 threshold: float = WORKFLOW_SIMILARITY_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._grams: Dict[str, Counter] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        # 失效版本：每次invalidate加一，并记录该指令最近一次失效时的版本
+        self.version = 0
+        self._invalidated: Dict[str, int] = {}
+        # 每条指令最近一次命中的条目键（相似命中时为另一条指令的键），执行失败时据此移除实际提供工作流的条目
+        self._served: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, instruction: str, fuzzy: bool = True) -> Optional[List[Dict[str, Any]]]:
+        """查找指令对应的工作流
+
+        Args:
+            instruction: 用户指令
+            fuzzy: 是否允许相似指令命中；未经确认直接执行时应为False
+
+        Returns:
+            缓存的工作流，未命中时返回None
+        """
+        with self._lock:
+            key, score = self._match(instruction) if fuzzy else self._exact(instruction)
+            if key is None:
+                return None
+            self._served[normalize_instruction(instruction)] = key
+            entry = self._entries[key]
+            entry["hits"] = entry.get("hits", 0) + 1
+            logger.info(f"工作流缓存命中: '{instruction}' -> '{entry['instruction']}' (相似度{score:.2f})")
+            return entry["workflow"]
+
+    def put(self, instruction: str, workflow: List[Dict[str, Any]], since_version: Optional[int] = None) -> None:
+        """写入工作流并持久化
+
+        Args:
+            since_version: 开始生成工作流时的version；该指令在此之后被失效过（生成期间已有步骤执行失败）时不写入
+        """
+        key = normalize_instruction(instruction)
+        if not key or not workflow:
+            return
+        with self._lock:
+            if since_version is not None and self._invalidated.get(key, 0) > since_version:
+                logger.info(f"工作流在生成期间已失效，不写入缓存: {instruction}")
+                return
+            self._remove(key)
+            self._entries[key] = {
+                "instruction": instruction,
+                "workflow": workflow,
+                "created": time.time(),
+                "hits": 0,
+            }
+            self._index(key)
+            self._save(key, self._entries[key])
+
+    def invalidate(self, instruction: str) -> bool:
+        """使该指令的缓存条目失效，用于工作流执行失败时
+
+        移除该指令（规范化后精确一致）的条目，以及该指令最近一次get()实际命中的条目：
+        相似命中的工作流存放在另一条指令的键下，不移除则之后的相似指令会再次命中同一个失败的工作流。
+        不另外按相似度查找，避免移除其他无关指令的条目。
+
+        Returns:
+            是否有条目被移除
+        """
+        with self._lock:
+            normalized = normalize_instruction(instruction)
+            if not normalized:
+                return False
+            self.version += 1
+            removed = False
+            for key in dict.fromkeys((normalized, self._served.pop(normalized, normalized))):
+                self._invalidated[key] = self.version
+                if key in self._entries:
+                    logger.info(f"工作流缓存失效: {self._entries[key]['instruction']}")
+                    self._remove(key)
+                    removed = True
+                # 其他进程可能已写入该条目，同样需要从文件中移除
+                removed = self._save(key, None) or removed
+            return removed
+
+    def _exact(self, instruction: str) -> Tuple[Optional[str], float]:
+        key = normalize_instruction(instruction)
+        return (key, 1.0) if key and key in self._entries else (None, 0.0)
+
+    def _match(self, instruction: str) -> Tuple[Optional[str], float]:
+        """返回最匹配的条目键及相似度"""
+        key = normalize_instruction(instruction)
+        if not key:
+            return None, 0.0
+        if key in self._entries:
+            return key, 1.0
+
+        query = char_ngrams(key)
+        candidates = set().union(*(self._postings.get(gram, set()) for gram in query)) if query else set()
+        if not candidates:
+            return None, 0.0
+
+        query_vector = self._weigh(query)
+        query_norm = math.sqrt(sum(w * w for w in query_vector.values()))
+        best_key, best_score = None, 0.0
+        for candidate in candidates:
+            vector = self._weigh(self._grams[candidate])
+            norm = math.sqrt(sum(w * w for w in vector.values()))
+            if not norm or not query_norm:
+                continue
+            dot = sum(weight * vector.get(gram, 0.0) for gram, weight in query_vector.items())
+            score = dot / (norm * query_norm)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        if best_score < self.threshold:
+            return None, best_score
+        if literal_tokens(instruction) != literal_tokens(self._entries[best_key]["instruction"]):
+            logger.info(f"相似指令的参数不一致，不复用缓存: '{instruction}' / '{self._entries[best_key]['instruction']}'")
+            return None, best_score
+        return best_key, best_score
+
+    def _weigh(self, grams: Counter) -> Dict[str, float]:
+        """计算TF-IDF权重"""
+        total = len(self._entries)
+        return {
+            gram: count * (math.log((1 + total) / (1 + len(self._postings.get(gram, ())))) + 1)
+            for gram, count in grams.items()
+        }
+
+    def _index(self, key: str) -> None:
+        grams = char_ngrams(key)
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def _remove(self, key: str) -> None:
+        if key not in self._entries:
+            return
+        for gram in self._grams.pop(key, ()):
+            self._postings[gram].discard(key)
+            if not self._postings[gram]:
+                del self._postings[gram]
+        del self._entries[key]
+
+    def _load(self) -> None:
+        self._reindex(self._read())
+        if self._entries:
+            logger.info(f"已加载{len(self._entries)}条工作流缓存")
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"工作流缓存文件损坏，已忽略: {e}")
+            return {}
+
+    def _reindex(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        self._entries = entries
+        self._grams.clear()
+        self._postings.clear()
+        for key in self._entries:
+            self._index(key)
+
+    def _save(self, key: str, entry: Optional[Dict[str, Any]]) -> bool:
+        """把单个条目的变更合并到缓存文件，entry为None表示删除
+
+        多个进程（如并行回放的工作进程）共用同一缓存文件：持有文件锁时重新读取文件，
+        只应用本次变更后写入，避免覆盖其他进程的更新；合并结果同时作为内存中的缓存。
+        临时文件名包含进程与线程id，先写临时文件再替换，避免中途退出导致缓存损坏。
+
+        Returns:
+            文件中原先是否存在该条目
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with file_lock(self.path + ".lock"):
+                entries = self._read()
+                existed = key in entries
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            self._reindex(entries)
+            return existed
+        except OSError as e:
+            logger.error(f"保存工作流缓存失败: {e}")
+            return False
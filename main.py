@@ -5,8 +5,8 @@ from ui import main_window
 def main():
     client = APIClient()
     
-    # 初始化屏幕控制器
-    screen_ctrl = PyAutoGUIWrapper(pause=1.0)
+    # 初始化屏幕控制器（操作间隔由节奏策略按操作类型决定）
+    screen_ctrl = PyAutoGUIWrapper()
     main_window.FloatingWindow(screen_ctrl).show()
 
     # 执行截图和处理
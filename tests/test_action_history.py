@@ -0,0 +1,46 @@
+import unittest
+from core.action_history import ActionHistory, render_history
+
+class TestActionHistory(unittest.TestCase):
+    def _click(self, target):
+        return {"action": "click", "id": 3, "target": target, "params": {"clicks": 1}}
+
+    def test_empty_history(self):
+        """测试空历史"""
+        self.assertEqual(ActionHistory().render(), "无")
+
+    def test_keeps_last_k_verbatim(self):
+        """测试最近K步保留原文，早期操作进入摘要"""
+        history = ActionHistory(keep_last=2)
+        for i in range(5):
+            history.append(self._click(f"按钮{i}"))
+        rendered = history.render()
+        self.assertIn("早期操作摘要(3步)", rendered)
+        self.assertIn('"target":"按钮4"', rendered)
+        self.assertNotIn('"target":"按钮0"', rendered)
+        self.assertEqual(len(history), 5)
+
+    def test_collapse_repeats(self):
+        """测试连续重复操作被合并"""
+        history = ActionHistory(keep_last=2)
+        for _ in range(4):
+            history.append(self._click("确定"))
+        rendered = history.render()
+        self.assertIn("重复4次", rendered)
+        self.assertEqual(rendered.count('"target":"确定"'), 1)
+
+    def test_token_savings_metric(self):
+        """测试token节省统计"""
+        history = ActionHistory(keep_last=1)
+        for i in range(20):
+            history.append({"action": "input", "id": i, "target": "搜索框",
+                            "params": {"text_content": "hello world " * 3, "x": 100, "y": 200}})
+        history.render()
+        self.assertGreater(history.metrics["saved_tokens"], 0)
+
+    def test_render_plain_list(self):
+        """测试兼容普通列表"""
+        self.assertIn("最近操作", render_history([self._click("确定")]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import unittest
+from core.model_parser import CascadeRouter, analysis_action, validate_action_json, validate_analysis
+
+VALID_IDS = {3, 11, 19}
+
+def click(element_id, **params):
+    return json.dumps({"action": "click", "id": element_id, "target": "按钮", "params": params})
+
+class TestValidators(unittest.TestCase):
+    def test_validate_action_json(self):
+        """测试动作JSON的格式、元素id、必填参数与finish确认"""
+        self.assertEqual(validate_action_json(click(19), VALID_IDS), (True, "ok"))
+        self.assertFalse(validate_action_json("不是JSON", VALID_IDS)[0])
+        self.assertFalse(validate_action_json(json.dumps({"action": "click", "id": 19}), VALID_IDS)[0])
+        self.assertIn("不在当前界面", validate_action_json(click(99), VALID_IDS)[1])
+        no_text = json.dumps({"action": "input", "id": 11, "target": "搜索框", "params": {}})
+        self.assertIn("text_content", validate_action_json(no_text, VALID_IDS)[1])
+        no_keys = json.dumps({"action": "hotkey", "id": -1, "target": "", "params": {}})
+        self.assertIn("key_sequence", validate_action_json(no_keys, VALID_IDS)[1])
+        unknown = json.dumps({"action": "drag", "id": 3, "target": "窗口"})
+        self.assertIn("未知动作类型", validate_action_json(unknown, VALID_IDS)[1])
+
+        finish = json.dumps({"action": "finish", "id": -1, "target": ""})
+        self.assertFalse(validate_action_json(finish, VALID_IDS)[0])
+        self.assertTrue(validate_action_json(finish, VALID_IDS, allow_finish=True)[0])
+
+    def test_analysis_action_whole_tokens(self):
+        """测试操作类型按整词识别，其他单词中的子串不算，推理中提到的操作以最后给出的为准"""
+        self.assertIsNone(analysis_action("The inputs were refined, nothing is finished yet"))
+        self.assertEqual(analysis_action("界面还没有finish，需要click 发送按钮(id 19)"), "click")
+        self.assertEqual(analysis_action("已经点击过发送按钮，目标达成，给出finish"), "finish")
+        self.assertEqual(analysis_action('最终操作：{"action": "input", "id": 11}，之后才能finish'), "input")
+
+    def test_analysis_action_chinese(self):
+        """测试中文分析中的操作表述，"输入框"等名词不算input"""
+        self.assertEqual(analysis_action("我将点击发送按钮(id 19)"), "click")
+        self.assertEqual(analysis_action("在搜索框(id 11)中输入'hello'"), "input")
+        self.assertEqual(analysis_action("双击浏览器图标(id 3)"), "open")
+        self.assertIsNone(analysis_action("当前界面有一个输入框(id 11)"))
+
+    def test_validate_analysis(self):
+        """测试分析者输出的空输出、缺少操作、finish确认与元素id校验"""
+        self.assertEqual(validate_analysis("点击发送按钮(id 19)", VALID_IDS), (True, "ok"))
+        self.assertEqual(validate_analysis("hotkey Ctrl+C", VALID_IDS), (True, "ok"))
+        self.assertEqual(validate_analysis("  ", VALID_IDS), (False, "输出为空"))
+        self.assertEqual(validate_analysis("当前界面是桌面", VALID_IDS), (False, "未给出操作类型"))
+        self.assertEqual(validate_analysis("目标已达成，finish", VALID_IDS), (False, "finish需要确认"))
+        self.assertIn("不存在的元素id", validate_analysis("click 按钮(id 42)", VALID_IDS)[1])
+
+    def test_id_reference_word_boundary(self):
+        """测试只有独立的id算元素引用，pid、valid、grid等单词中的不算"""
+        self.assertEqual(validate_analysis("点击结束进程按钮(id 19)，进程pid 1234", VALID_IDS), (True, "ok"))
+        self.assertEqual(validate_analysis("click valid2 选项(id:19)，位于grid 3", VALID_IDS), (True, "ok"))
+        self.assertIn("[42]", validate_analysis("点击确定按钮id：42", VALID_IDS)[1])
+        self.assertIn("[42]", validate_analysis("click ID=42", VALID_IDS)[1])
+
+class TestCascadeRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = CascadeRouter()
+        self.calls = []
+
+    def run_tiers(self, outputs, validate=lambda content: validate_analysis(content, VALID_IDS)):
+        def call(model):
+            self.calls.append(model)
+            output = outputs[model]
+            if isinstance(output, Exception):
+                raise output
+            return output
+        return self.router.run("omni", ["small", "large"], call, validate)
+
+    def test_accepts_small_model(self):
+        """测试小模型输出通过校验时不升级"""
+        self.assertEqual(self.run_tiers({"small": "点击发送按钮(id 19)", "large": "-"}), "点击发送按钮(id 19)")
+        self.assertEqual(self.calls, ["small"])
+        self.assertEqual(self.router.stats["escalations"], 0)
+
+    def test_escalates_invalid_or_failed_output(self):
+        """测试小模型输出无效、给出finish或调用失败时升级，最后一层的输出不再校验"""
+        self.assertEqual(self.run_tiers({"small": "click 按钮(id 42)", "large": "click 按钮(id 3)"}), "click 按钮(id 3)")
+        self.assertEqual(self.run_tiers({"small": "finish", "large": "finish"}), "finish")
+        self.assertEqual(self.run_tiers({"small": RuntimeError("超时"), "large": "click 按钮(id 3)"}), "click 按钮(id 3)")
+        self.assertEqual(self.calls, ["small", "large"] * 3)
+
+        stats = self.router.stats
+        self.assertEqual((stats["requests"], stats["escalations"], stats["escalation_rate"]), (3, 3, 1.0))
+        self.assertEqual([d["accepted"] for d in self.router.decisions], [False, True] * 3)
+        self.assertIn("调用失败", self.router.decisions[4]["reason"])
+
+    def test_last_tier_failure_raises(self):
+        """测试最后一层调用失败时抛出异常"""
+        with self.assertRaises(RuntimeError):
+            self.run_tiers({"small": "当前界面是桌面", "large": RuntimeError("超时")})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+from PIL import Image
+import utils
+from core.action_schema import MAX_COMPOSITE_ACTIONS
+from core.geometry import Monitor, get_geometry
+from core.model_parser import validate_action_json
+from core.pacing import PacingPolicy
+from core.screen_controller import PyAutoGUIWrapper
+
+def make_screen(seed=0):
+    """400x300的界面：随机明暗的色块布局"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(40, 220, (6, 8), dtype=np.uint8)
+    return np.kron(blocks, np.ones((50, 50), dtype=np.uint8))
+
+def typed(screen, x, y):
+    """在(x, y)附近画出输入的文字"""
+    screen = screen.copy()
+    screen[y - 5:y + 5, x - 30:x + 30] = 0
+    return screen
+
+def composite(*sub_actions):
+    return {"action": "composite", "id": -1, "target": "登录表单", "params": {"actions": list(sub_actions)}}
+
+USERNAME = {"action": "input", "id": 3, "target": "用户名", "params": {"text_content": "tom", "x": 100, "y": 100}}
+PASSWORD = {"action": "input", "id": 5, "target": "密码", "params": {"text_content": "123", "x": 100, "y": 150}}
+LOGIN = {"action": "click", "id": 8, "target": "登录", "params": {"x": 200, "y": 250}}
+
+class TestCompositeAction(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('core.geometry.DisplayGeometry.primary', Monitor(0, 0, 400, 300, 1.0, True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.executor = MagicMock()
+
+    def run_composite(self, action, screens):
+        self.executor.screen_shot.side_effect = [Image.fromarray(screen) for screen in screens]
+        return utils.execute_action(self.executor, action, None)
+
+    def test_parse_and_validate(self):
+        """测试从模型输出中解析组合操作，并校验子操作的元素id与数量上限"""
+        content = "```json\n" + json.dumps(composite(USERNAME, PASSWORD, LOGIN), ensure_ascii=False) + "\n```"
+        action = utils.robust_json_extract(content)
+        self.assertEqual([sub["action"] for sub in action["params"]["actions"]], ["input", "input", "click"])
+        self.assertEqual(validate_action_json(json.dumps(action), {3, 5, 8}), (True, "ok"))
+        ok, reason = validate_action_json(json.dumps(action), {3, 5})
+        self.assertFalse(ok)
+        self.assertIn("第3个子操作", reason)
+
+        too_many = composite(*[LOGIN] * (MAX_COMPOSITE_ACTIONS + 1))
+        self.assertFalse(validate_action_json(json.dumps(too_many), {8})[0])
+        with self.assertRaises(ValueError):
+            utils.execute_action(self.executor, too_many, None)
+        with self.assertRaises(ValueError):
+            utils.execute_action(self.executor, composite({"action": "open", "id": 8, "params": {"x": 1, "y": 1}}), None)
+
+    def test_inputs_do_not_submit(self):
+        """测试组合操作中的input默认不回车，显式要求时才回车"""
+        submit = {**PASSWORD, "params": {**PASSWORD["params"], "press_enter": True}}
+        screen = make_screen()
+        after_first = typed(screen, 100, 100)
+        result = self.run_composite(composite(USERNAME, submit), [screen, after_first, typed(after_first, 100, 150)])
+        self.assertEqual(result[4], "success")
+        calls = self.executor.input.call_args_list
+        self.assertEqual(calls[0].kwargs["press_enter"], False)
+        self.assertEqual(calls[1].kwargs["press_enter"], True)
+
+    def test_stops_when_screen_changes(self):
+        """测试子操作后界面整体变化时停止，只保留已执行的子操作"""
+        screen = make_screen()
+        after_first = typed(screen, 100, 100)
+        result = self.run_composite(composite(USERNAME, LOGIN, PASSWORD),
+                                    [screen, after_first, 255 - after_first])
+        self.assertEqual(result[4], "partial")
+        self.assertEqual([sub["target"] for sub in result[2]["actions"]], ["用户名", "登录"])
+        self.executor.input.assert_called_once()
+
+    def test_stops_when_input_has_no_effect(self):
+        """测试input后输入框区域没有变化（输入未生效）时停止"""
+        screen = make_screen()
+        result = self.run_composite(composite(USERNAME, PASSWORD, LOGIN), [screen, screen.copy()])
+        self.assertEqual(result[4], "partial")
+        self.assertEqual(len(result[2]["actions"]), 1)
+        self.executor.click.assert_not_called()
+
+    def test_input_checked_within_capture_region(self):
+        """测试只截取目标窗口区域时，按该区域的位置与宽度换算输入框所在的截图区域"""
+        geometry = get_geometry()
+        geometry.set_capture_region((100, 50, 200, 150))
+        self.addCleanup(geometry.set_capture_region, None)
+        username = {**USERNAME, "params": {**USERNAME["params"], "x": 150, "y": 100}}
+        # 区域截图为400x300，即每个屏幕坐标对应2个像素，输入框位于截图中的(100, 100)
+        screen = make_screen()
+        result = self.run_composite(composite(username, LOGIN), [screen, typed(screen, 100, 100)])
+        self.assertEqual(result[4], "success")
+        self.assertEqual(self.executor.screen_shot.call_args.kwargs["region"], (100, 50, 200, 150))
+
+    @patch('core.screen_controller.pyperclip')
+    @patch('core.screen_controller.pyautogui')
+    def test_wrapper_input_without_enter(self, mock_pyautogui, _):
+        """测试press_enter=False时只粘贴不回车"""
+        wrapper = PyAutoGUIWrapper(pacing=PacingPolicy(sleep=lambda seconds: None))
+        wrapper.input("tom", 100, 100, press_enter=False)
+        mock_pyautogui.hotkey.assert_any_call('ctrl', 'v', interval=0.1)
+        mock_pyautogui.press.assert_called_once_with('backspace')
+        wrapper.input("tom", 100, 100)
+        mock_pyautogui.press.assert_called_with('enter')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from core.content_parser import parse_content, to_json_text
+from utils import parse_data
+
+class TestContentParser(unittest.TestCase):
+    def setUp(self):
+        self.elements = [
+            {"type": "text", "bbox": [0.1, 0.1, 0.2, 0.15], "interactivity": False, "content": "文件"},
+            {"type": "icon", "bbox": [0.3, 0.1, 0.35, 0.15], "interactivity": True, "content": "it's {ok}"},
+            {"type": "icon", "bbox": [0.5, 0.5, 0.6, 0.6], "interactivity": True, "content": None},
+        ]
+
+    def assert_elements(self, report):
+        self.assertEqual(report.elements.contents(), ["文件", "it's {ok}", ""])
+        self.assertEqual(report.elements.types(), ["text", "icon", "icon"])
+
+    def test_native_payload(self):
+        """测试直接接受原生列表与包装字典"""
+        self.assert_elements(parse_content(self.elements))
+        self.assert_elements(parse_content({"parsed_content": self.elements}))
+        self.assertEqual(len(parse_content(self.elements[0]).elements), 1)
+
+    def test_string_formats(self):
+        """测试Python字面量、JSON以及两者混排的字符串"""
+        python_text = "\n".join(f"icon {i}: {e!r}" for i, e in enumerate(self.elements))
+        self.assert_elements(parse_content(python_text))
+        json_text = to_json_text(python_text)
+        self.assert_elements(parse_content(json_text))
+        mixed = "\n".join([json_text.splitlines()[0]] + python_text.splitlines()[1:])
+        report = parse_content(mixed)
+        self.assert_elements(report)
+        self.assertEqual(report.errors, [])
+
+    def test_malformed_fragments_reported(self):
+        """测试格式错误的片段被记录并跳过，不影响其余元素"""
+        text = (
+            "icon 0: {'type': 'text', 'bbox': [0, 0, 1, 1], 'content': 'a'}\n"
+            "icon 1: {'type': 'text', 'bbox': [0, 0, 1 1], 'content': 'b'}\n"
+            "icon 2: {'type': 'text', 'content': 'c'}\n"
+            "icon 3: {'type': 'icon', 'bbox': (0, 0, 1, 1), 'content': 'd'}"
+        )
+        report = parse_content(text)
+        self.assertEqual(report.elements.contents(), ["a", "d"])
+        self.assertEqual(len(report.errors), 2)
+
+    def test_parse_data_compatibility(self):
+        """测试parse_data接口保持不变"""
+        objs, duration = parse_data("\n".join(f"icon {i}: {e!r}" for i, e in enumerate(self.elements)))
+        self.assertEqual([obj["id"] for obj in objs], [0, 1, 2])
+        self.assertEqual(len(parse_data("")[0]), 0)
+        self.assertEqual(len(parse_data(self.elements)[0]), 3)
+
+if __name__ == '__main__':
+    unittest.main()
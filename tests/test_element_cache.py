@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from core.element_cache import ElementCache
+
+class TestElementCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "element_cache.json")
+        self.frame = np.full((400, 600, 3), 240, np.uint8)
+        cv2.putText(self.frame, "Save", (50, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        cv2.putText(self.frame, "Open", (300, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        self.save_bbox = [40 / 600, 50 / 400, 130 / 600, 90 / 400]
+        self.open_bbox = [290 / 600, 50 / 400, 380 / 600, 90 / 400]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _remote_objs(self):
+        return [
+            {"id": 0, "type": "text", "content": "Save", "bbox": list(self.save_bbox)},
+            {"id": 1, "type": "text", "content": "Open", "bbox": list(self.open_bbox)},
+        ]
+
+    def test_label_and_keep_fresh_content(self):
+        """测试未变化区域补全空内容；解析出的非空内容不被缓存覆盖，并更新缓存"""
+        cache = ElementCache(self.path)
+        cache.annotate(self.frame, self._remote_objs())
+
+        local = [{"id": 0, "type": "icon", "content": "", "bbox": list(self.open_bbox)}]
+        cache.annotate(self.frame, local)
+        self.assertEqual((local[0]["type"], local[0]["content"]), ("text", "Open"))
+
+        changed = [{"id": 0, "type": "text", "content": "Saved", "bbox": list(self.save_bbox)}]
+        cache.annotate(self.frame, changed)
+        self.assertEqual(changed[0]["content"], "Saved")
+        self.assertEqual(cache.stats["labeled"], 1)
+        self.assertEqual(cache.stats["updated"], 1)
+
+        local = [{"id": 0, "type": "icon", "content": "", "bbox": list(self.save_bbox)}]
+        cache.annotate(self.frame, local)
+        self.assertEqual(local[0]["content"], "Saved")
+
+    def test_lru_and_warm_start(self):
+        """测试LRU淘汰与磁盘预热"""
+        cache = ElementCache(self.path, max_entries=1)
+        cache.annotate(self.frame, self._remote_objs())
+        self.assertEqual(len(cache), 1)
+        cache.save()
+
+        warm = ElementCache(self.path)
+        objs = [{"id": 0, "type": "icon", "content": "", "bbox": list(self.open_bbox)},
+                {"id": 1, "type": "icon", "content": "", "bbox": list(self.save_bbox)}]
+        warm.annotate(self.frame, objs)
+        self.assertEqual([o["content"] for o in objs], ["Open", ""])
+
+if __name__ == '__main__':
+    unittest.main()
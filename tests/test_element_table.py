@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+from core.element_table import ElementTable
+from core.prompt_compactor import compact_elements
+
+class TestElementTable(unittest.TestCase):
+    def setUp(self):
+        self.dicts = [
+            {"id": 0, "type": "text", "content": "文件", "bbox": [0.0, 0.0, 0.1, 0.05]},
+            {"id": 1, "type": "icon", "content": "No object detected.", "bbox": [0.2, 0.0, 0.25, 0.05]},
+            {"id": 2, "type": "text", "content": "保存", "bbox": [0.5, 0.5, 0.7, 0.6]},
+        ]
+        self.table = ElementTable.from_dicts(self.dicts)
+
+    def test_dict_compatibility(self):
+        """测试元素视图与原字典格式一致，并可写回"""
+        self.assertEqual(self.table.to_dicts(), [
+            {**obj, "bbox": np.float32(obj["bbox"]).tolist()} for obj in self.dicts
+        ])
+        self.table[2]["content"] = "另存为"
+        self.table[2]["id"] = 7
+        self.assertEqual((self.table[2]["id"], self.table[2].get("content")), (7, "另存为"))
+        self.assertEqual(self.table.index_of(7), 2)
+
+    def test_take_and_prompt_rows(self):
+        """测试子表保留id，且提示词序列化结果与字典列表一致"""
+        subset = self.table.take([c != "No object detected." for c in self.table.contents()])
+        self.assertEqual([obj["id"] for obj in subset], [0, 2])
+        self.assertEqual(compact_elements(subset), compact_elements([self.dicts[0], self.dicts[2]]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from core.element_tracker import ElementTracker, iou_matrix
+
+class TestElementTracker(unittest.TestCase):
+    def _frame(self, elements):
+        return [{"id": i, "type": t, "content": c, "bbox": list(b)} for i, (t, c, b) in enumerate(elements)]
+
+    def test_iou_matrix(self):
+        """测试向量化IoU"""
+        a = np.array([[0, 0, 1, 1]], dtype=np.float32)
+        b = np.array([[0, 0, 1, 1], [0.5, 0, 1.5, 1], [2, 2, 3, 3]], dtype=np.float32)
+        np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 1 / 3, 0.0]], rtol=1e-5)
+
+    def test_persistent_ids_and_diff(self):
+        """测试元素顺序变化时id保持不变，并给出新增、移除、移动"""
+        tracker = ElementTracker()
+        first = self._frame([
+            ("text", "文件", (0.0, 0.0, 0.1, 0.05)),
+            ("icon", "保存", (0.2, 0.0, 0.25, 0.05)),
+            ("text", "标题", (0.4, 0.4, 0.6, 0.45)),
+        ])
+        tracker.update(first)
+
+        # 新元素插入在最前，"标题"被移除，"保存"移动到别处
+        second = self._frame([
+            ("text", "确定", (0.5, 0.8, 0.6, 0.85)),
+            ("text", "文件", (0.0, 0.0, 0.1, 0.05)),
+            ("icon", "保存", (0.7, 0.0, 0.75, 0.05)),
+        ])
+        diff = tracker.update(second)
+        self.assertEqual([obj["id"] for obj in second], [3, 0, 1])
+        self.assertEqual([obj["content"] for obj in diff.added], ["确定"])
+        self.assertEqual([obj["content"] for obj in diff.removed], ["标题"])
+        self.assertEqual([obj["content"] for obj in diff.moved], ["保存"])
+        self.assertEqual(diff.unchanged, 1)
+
+    def test_content_change_keeps_id(self):
+        """测试同一位置内容变化（如输入框文字）时保持id"""
+        tracker = ElementTracker()
+        tracker.update(self._frame([("text", "请输入", (0.1, 0.1, 0.5, 0.15))]))
+        second = self._frame([
+            ("icon", "", (0.8, 0.8, 0.85, 0.85)),
+            ("text", "hello", (0.1, 0.1, 0.5, 0.15)),
+        ])
+        diff = tracker.update(second)
+        self.assertEqual(second[1]["id"], 0)
+        self.assertTrue(not diff.removed and len(diff.added) == 1)
+
+if __name__ == '__main__':
+    unittest.main()
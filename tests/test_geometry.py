@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core import geometry
+from core.geometry import DisplayGeometry, Monitor
+
+MONITORS = [Monitor(0, 0, 1920, 1080, 1.0, True), Monitor(1920, -200, 2560, 1440, 1.5)]
+
+class TestDisplayGeometry(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(geometry, 'query_monitors', return_value=list(MONITORS))
+        self.query = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.geometry = DisplayGeometry(refresh_interval=60)
+
+    def test_layout_cached_until_invalidated(self):
+        """测试布局只在失效后重新查询"""
+        self.assertEqual(self.geometry.screen_size, (1920, 1080))
+        self.assertEqual(self.geometry.virtual_bounds, (0, -200, 4480, 1440))
+        self.assertEqual(self.geometry.monitor_at(2000, 0), MONITORS[1])
+        self.assertEqual(self.query.call_count, 1)
+        self.geometry.invalidate()
+        self.assertEqual(self.geometry.screen_size, (1920, 1080))
+        self.assertEqual(self.query.call_count, 2)
+
+    def test_bbox_to_screen_with_capture_region(self):
+        """测试批量转换考虑截图区域偏移，并与逆变换一致"""
+        bboxes = np.array([[0.0, 0.0, 0.1, 0.1], [0.5, 0.5, 0.5, 0.5], [0.9, 0.9, 1.2, 1.2]])
+        np.testing.assert_allclose(self.geometry.bbox_to_screen(bboxes)[:2], [[96, 54], [960, 540]])
+        self.geometry.set_capture_region((1920, -200, 1280, 720))
+        points = self.geometry.bbox_to_screen(bboxes)
+        np.testing.assert_allclose(points, [[1984, -164], [2560, 160], [3200, 520]])
+        np.testing.assert_allclose(self.geometry.screen_to_normalized(*points[1]), (0.5, 0.5))
+
+    def test_image_to_screen_scale(self):
+        """测试截图像素多于屏幕坐标时（未感知DPI的高分屏）按实测缩放换算"""
+        version = self.geometry.version
+        self.geometry.set_capture_region(None, image_size=(3840, 2160))
+        self.assertGreater(self.geometry.version, version)
+        self.assertEqual(self.geometry.image_to_screen(200, 100), (100, 50))
+        self.assertEqual(self.geometry.image_to_screen(200, 100, region=(1920, -200, 1280, 720)), (2020, -150))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from core.image_encoder import ImageEncoder, estimate_vision_tokens
+
+def make_frame(width=400, height=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8))
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def decode(encoded):
+    return Image.open(io.BytesIO(base64.b64decode(encoded.data)))
+
+class TestImageEncoder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def save(self, image, name="screen.png"):
+        path = os.path.join(self.dir, name)
+        image.save(path)
+        return path
+
+    def test_round_trip_without_resize(self):
+        """测试未超出尺寸限制的PNG直接使用原始字节，解码后像素不变"""
+        frame = make_frame()
+        raw = png_bytes(frame)
+        encoded = ImageEncoder(max_long_side=1920).encode_bytes(raw)
+        self.assertEqual(base64.b64decode(encoded.data), raw)
+        self.assertEqual((encoded.size, encoded.num_bytes, encoded.mime), ((400, 300), len(raw), "image/png"))
+        self.assertTrue(encoded.data_url.startswith("data:image/png;base64,"))
+        np.testing.assert_array_equal(np.asarray(decode(encoded)), np.asarray(frame))
+
+    def test_resize_and_format(self):
+        """测试按最长边等比缩放并转换格式，估算的视觉token随尺寸减少"""
+        raw = png_bytes(make_frame(1000, 500).convert("RGBA"))
+        encoded = ImageEncoder(max_long_side=200, image_format="jpeg", quality=70).encode_bytes(raw)
+        image = decode(encoded)
+        self.assertEqual((encoded.size, image.size, image.format), ((200, 100), (200, 100), "JPEG"))
+        self.assertEqual(encoded.mime, "image/jpeg")
+        self.assertEqual(estimate_vision_tokens(*encoded.size), 8 * 4)
+        self.assertLess(estimate_vision_tokens(*encoded.size), estimate_vision_tokens(1000, 500))
+
+    def test_reuses_unchanged_frames(self):
+        """测试界面未变化时重新截取的同一画面复用编码结果，画面变化后重新编码"""
+        encoder = ImageEncoder(max_long_side=200)
+        path = self.save(make_frame())
+        first = encoder.encode_file(path)
+        self.save(make_frame())
+        self.assertIs(encoder.encode_file(path), first)
+        self.assertEqual((encoder.stats["hits"], encoder.stats["misses"]), (1, 1))
+
+        self.save(make_frame(seed=1))
+        self.assertNotEqual(encoder.encode_file(path).data, first.data)
+        self.assertEqual(encoder.stats["misses"], 2)
+
+        # 编码参数不同时不复用
+        other = ImageEncoder(max_long_side=100)
+        self.assertEqual(other.encode_file(path).size, (100, 75))
+
+    def test_cache_eviction_and_errors(self):
+        """测试缓存超出容量时淘汰最久未用的条目，文件缺失或无法解码时抛出ValueError"""
+        encoder = ImageEncoder(max_entries=2)
+        frames = [png_bytes(make_frame(40, 30, seed)) for seed in range(3)]
+        for raw in frames:
+            encoder.encode_bytes(raw)
+        encoder.encode_bytes(frames[0])
+        self.assertEqual(encoder.stats["misses"], 4)
+        encoder.encode_bytes(frames[2])
+        self.assertEqual(encoder.stats["hits"], 1)
+
+        with self.assertRaises(ValueError):
+            encoder.encode_file(os.path.join(self.dir, "missing.png"))
+        with self.assertRaises(ValueError):
+            encoder.encode_bytes(b"not an image")
+        with self.assertRaises(ValueError):
+            ImageEncoder(image_format="BMP")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import cv2
+import numpy as np
+from core.local_detector import detect, draw_labels, non_max_suppression
+
+class TestLocalDetector(unittest.TestCase):
+    def setUp(self):
+        # 模拟一个简单对话框：一行提示文字和两个按钮
+        self.dialog = np.full((600, 800, 3), 240, np.uint8)
+        cv2.rectangle(self.dialog, (100, 100), (700, 500), (200, 200, 200), -1)
+        cv2.putText(self.dialog, "Do you want to save changes?", (150, 200), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+        cv2.rectangle(self.dialog, (380, 420), (480, 460), (80, 80, 80), 2)
+        cv2.rectangle(self.dialog, (500, 420), (600, 460), (80, 80, 80), 2)
+
+    def test_simple_dialog(self):
+        """测试简单对话框可被本地检测并通过置信度门限"""
+        detection = detect(self.dialog)
+        self.assertTrue(detection.confident)
+        for element in detection.elements:
+            xmin, ymin, xmax, ymax = element["bbox"]
+            self.assertTrue(0 <= xmin < xmax <= 1 and 0 <= ymin < ymax <= 1)
+
+        # 两个按钮都被检测为可交互元素，中心点与绘制位置一致
+        centers = [((e["bbox"][0] + e["bbox"][2]) / 2 * 800, (e["bbox"][1] + e["bbox"][3]) / 2 * 600)
+                   for e in detection.elements if e["type"] == "icon"]
+        for expected in [(430, 440), (550, 440)]:
+            self.assertTrue(any(abs(x - expected[0]) < 5 and abs(y - expected[1]) < 5 for x, y in centers))
+        self.assertTrue(any(e["type"] == "text" for e in detection.elements))
+
+    def test_cluttered_screen_falls_back(self):
+        """测试杂乱界面置信度不足"""
+        noise = (np.random.default_rng(0).random((600, 800, 3)) * 255).astype(np.uint8)
+        self.assertFalse(detect(noise).confident)
+
+    def test_non_max_suppression(self):
+        """测试重叠框只保留得分最高者"""
+        boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+        keep = non_max_suppression(boxes, np.array([0.5, 0.9, 0.7], dtype=np.float32))
+        self.assertEqual(sorted(keep.tolist()), [1, 2])
+
+    def test_draw_labels(self):
+        """测试标注图尺寸与原图一致"""
+        detection = detect(self.dialog)
+        self.assertEqual(draw_labels(self.dialog, detection.elements).size, (800, 600))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from core.fingerprint import ScreenFingerprint
+from core.loop_guard import LoopDetector
+
+class TestLoopDetector(unittest.TestCase):
+    def setUp(self):
+        self.screen = ScreenFingerprint("895d9454b17bdc07")
+        self.other_screen = ScreenFingerprint("76a26bab4e8423f8")
+        self.click = {"action": "click", "id": 3, "target": "确定", "params": {"x": 10, "y": 20}}
+
+    def test_repeated_action_hint_then_abort(self):
+        """测试同一界面重复操作先提示后中止"""
+        detector = LoopDetector(repeat_threshold=3)
+        statuses = [detector.observe(self.screen, self.click, changed=True).status for _ in range(4)]
+        self.assertEqual(statuses, [LoopDetector.OK, LoopDetector.OK, LoopDetector.HINT, LoopDetector.ABORT])
+
+    def test_hint_resets_after_progress(self):
+        """测试提示后取得进展，之后出现的新循环重新从提示开始"""
+        detector = LoopDetector(repeat_threshold=2)
+        detector.observe(self.screen, self.click, changed=True)
+        self.assertEqual(detector.observe(self.screen, self.click, changed=True).status, LoopDetector.HINT)
+        # 换到其他界面后在新界面上再次重复
+        self.assertEqual(detector.observe(self.other_screen, self.click, changed=True).status, LoopDetector.OK)
+        self.assertEqual(detector.observe(self.other_screen, self.click, changed=True).status, LoopDetector.HINT)
+        # 同一界面上换了操作，之后该操作又重复
+        hotkey = {"action": "hotkey", "id": -1, "params": {"key_sequence": ["enter"]}}
+        self.assertEqual(detector.observe(self.other_screen, hotkey, changed=True).status, LoopDetector.OK)
+        self.assertEqual(detector.observe(self.other_screen, hotkey, changed=True).status, LoopDetector.HINT)
+        self.assertEqual(detector.observe(self.other_screen, hotkey, changed=True).status, LoopDetector.ABORT)
+
+    def test_noop_streak(self):
+        """测试连续无效操作被识别"""
+        detector = LoopDetector(repeat_threshold=2)
+        detector.observe(self.screen, self.click, changed=False)
+        verdict = detector.observe(self.other_screen, {"action": "hotkey", "id": -1}, changed=False)
+        self.assertEqual(verdict.status, LoopDetector.HINT)
+
+    def test_progress_is_not_a_loop(self):
+        """测试界面变化时相同操作不视为循环"""
+        detector = LoopDetector(repeat_threshold=2)
+        self.assertEqual(detector.observe(self.screen, self.click, changed=True).status, LoopDetector.OK)
+        self.assertEqual(detector.observe(self.other_screen, self.click, changed=True).status, LoopDetector.OK)
+
+    def test_budgets(self):
+        """测试迭代与token预算"""
+        detector = LoopDetector(max_iterations=1, max_tokens=100)
+        self.assertEqual(detector.check_budgets(tokens_used=100).status, LoopDetector.ABORT)
+        detector.observe(self.screen, self.click, changed=True)
+        self.assertEqual(detector.check_budgets().status, LoopDetector.ABORT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core.pacing import PacingPolicy
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def __call__(self):
+        return self.now
+
+class TestPacingPolicy(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def make_policy(self, frames=None, **kwargs):
+        return PacingPolicy({"click": 0.15, "input": 0.1}, default_delay=0.05,
+                            probe=frames, sleep=self.clock.sleep, clock=self.clock, **kwargs)
+
+    def frames(self, values):
+        """按时间返回画面：values为[(开始时间, 灰度值)]"""
+        def grab():
+            value = [v for t, v in values if t <= self.clock.now][-1]
+            return np.full((36, 64), value, dtype=np.int16)
+        return grab
+
+    def test_per_action_min_delay(self):
+        """测试按操作类型等待最小时间，未配置的类型使用默认间隔"""
+        policy = self.make_policy()
+        self.assertAlmostEqual(policy.settle("click"), 0.15)
+        self.assertAlmostEqual(policy.settle("hotkey"), 0.05)
+
+    def test_feedback_waits_for_change_then_stable(self):
+        """测试画面反馈模式：界面响应前画面未变不算稳定，等画面相对操作前变化后再等其稳定"""
+        policy = self.make_policy(self.frames([(0, 0), (0.4, 80)]), feedback=True, max_wait=1.5)
+        policy.begin()
+        waited = policy.settle("input")
+        self.assertGreater(waited, 0.4 + 0.3)
+        self.assertLess(waited, 0.1 + 1.5)
+
+    def test_feedback_gives_up_at_deadline(self):
+        """测试画面始终不变或持续变化时，最小等待后最多再等max_wait"""
+        policy = self.make_policy(self.frames([(0, 0)]), feedback=True, max_wait=0.3)
+        policy.begin()
+        self.assertAlmostEqual(policy.settle("click"), 0.15 + 0.3)
+
+        flicker = [(t / 100, t % 2 * 50) for t in range(0, 200, 5)]
+        policy = self.make_policy(self.frames(flicker), feedback=True, max_wait=0.3)
+        self.clock.now = 0.0
+        policy.begin()
+        self.assertLessEqual(policy.settle("click"), 0.15 + 0.3 + 1e-9)
+        # 没有基线时只等待最小时间
+        self.assertAlmostEqual(policy.settle("click"), 0.15)
+
+    def test_wrapper_disables_global_pause(self):
+        """测试控制器不再依赖全局的pyautogui.PAUSE，输入操作只在内部步骤间短暂等待"""
+        import pyautogui
+        from core.screen_controller import PyAutoGUIWrapper
+        wrapper = PyAutoGUIWrapper(pause=1.0, pacing=self.make_policy())
+        self.assertEqual(pyautogui.PAUSE, 0)
+        with patch('pyautogui.click'), patch('pyautogui.hotkey'), patch('pyautogui.press'), \
+             patch('pyautogui.moveTo'), patch('pyperclip.copy'):
+            wrapper.input("你好", 100, 200)
+        self.assertLess(sum(self.clock.sleeps), 0.5)
+
+    def test_input_sub_steps_are_spaced(self):
+        """测试输入操作的点击、全选、删除、粘贴、回车之间都有间隔，不会连续发送"""
+        from core.screen_controller import PyAutoGUIWrapper
+        events = []
+        policy = self.make_policy()
+        policy._sleep = lambda seconds: events.append("sleep")
+        wrapper = PyAutoGUIWrapper(pacing=policy)
+        record = lambda name: (lambda *args, **kwargs: events.append(name))
+        with patch('pyautogui.click', record("click")), patch('pyautogui.hotkey', record("hotkey")), \
+             patch('pyautogui.press', record("press")), patch('pyautogui.moveTo'), patch('pyperclip.copy'):
+            wrapper.input("你好", 100, 200)
+        keys = [event for event in events if event != "sleep"]
+        self.assertEqual(keys, ["click", "hotkey", "press", "hotkey", "press"])
+        self.assertNotIn(("hotkey", "press"), zip(events, events[1:]))
+        self.assertNotIn(("press", "hotkey"), zip(events, events[1:]))
+        self.assertNotIn(("click", "hotkey"), zip(events, events[1:]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import queue
+import unittest
+from unittest.mock import MagicMock, patch
+from core.parallel_replay import XvfbDisplay, _collect, _display_env, _worker_main, aggregate
+from core.replay import EXIT_FAILED, EXIT_OK, RecordingResult, StepResult
+
+def make_result(path, durations, status="passed"):
+    steps = [StepResult(i, "click", "按钮", "success", d, 0.1) for i, d in enumerate(durations)]
+    return RecordingResult(path, status, steps, sum(durations) + 0.1 * len(durations))
+
+class TestParallelReplay(unittest.TestCase):
+    def test_aggregate_per_worker_throughput_and_latency(self):
+        """测试按任务顺序汇总结果，并统计每个工作进程与整体的吞吐量、延迟"""
+        tasks = [("recording", "a.jsonl"), ("recording", "b.jsonl"), ("instruction", "打开记事本")]
+        reports = {
+            0: {"results": [(2, make_result("打开记事本", [0.4])), (0, make_result("a.jsonl", [0.2, 0.4]))],
+                "elapsed": 4.0, "error": None},
+            1: {"results": [(1, make_result("b.jsonl", [0.9], "failed"))], "elapsed": 2.0, "error": None},
+        }
+        summary = aggregate(tasks, reports, [":1", ":2"], 1.0, 5.0)
+        self.assertEqual([r["path"] for r in summary["results"]], ["a.jsonl", "b.jsonl", "打开记事本"])
+        self.assertEqual(summary["exit_code"], EXIT_FAILED)
+        self.assertEqual(summary["unprocessed"], [])
+
+        first, second = summary["workers"]
+        self.assertEqual((first["worker"], first["display"], first["recordings"], first["steps"]), (0, ":1", 2, 3))
+        self.assertEqual(first["throughput"], {"recordings_per_min": 30.0, "steps_per_sec": 0.75})
+        self.assertEqual(first["latency"]["step"]["p50"], 0.5)
+        self.assertEqual(second["passed"], 0)
+        self.assertEqual(summary["throughput"]["steps_per_sec"], 0.8)
+        self.assertEqual(summary["latency"]["step"]["max"], 1.0)
+
+    def test_unprocessed_tasks_fail_the_run(self):
+        """测试工作进程崩溃导致任务未执行时，汇总列出这些任务且退出码为失败"""
+        tasks = [("recording", "a.jsonl"), ("recording", "b.jsonl")]
+        reports = {0: {"results": [(0, make_result("a.jsonl", [0.1]))], "elapsed": 1.0, "error": None},
+                   1: {"results": [], "elapsed": 1.0, "error": "工作进程异常退出，退出码-9"}}
+        summary = aggregate(tasks, reports, [":1", ":2"], 1.0, 1.0)
+        self.assertEqual(summary["unprocessed"], ["b.jsonl"])
+        self.assertEqual(summary["exit_code"], EXIT_FAILED)
+        self.assertEqual(summary["workers"][1]["latency"]["step"]["p50"], None)
+
+        reports[1]["results"].append((1, make_result("b.jsonl", [0.1])))
+        self.assertEqual(aggregate(tasks, reports, [":1", ":2"], 1.0, 1.0)["exit_code"], EXIT_OK)
+
+    def test_worker_drains_queue(self):
+        """测试工作进程按队列领取任务，录制与指令分别回放，结束时报告完成"""
+        tasks, results = queue.Queue(), queue.Queue()
+        for task in [(0, "recording", "a.jsonl"), (1, "instruction", "打开记事本"), None]:
+            tasks.put(task)
+        with patch("core.replay.ReplayRunner") as runner_class:
+            runner = runner_class.return_value
+            runner.run_file.return_value = "file-result"
+            runner.run_instruction.return_value = "instruction-result"
+            _worker_main(3, ":7", tasks, results, 2.0, True)
+        runner_class.assert_called_once_with(speed=2.0, on_step=None)
+        messages = [results.get_nowait() for _ in range(3)]
+        self.assertEqual(messages[0], ("result", 3, (0, "file-result")))
+        self.assertEqual(messages[1], ("result", 3, (1, "instruction-result")))
+        self.assertEqual(messages[2][:2], ("done", 3))
+        self.assertIsNone(messages[2][2][1])
+
+    def test_collect_detects_crashed_worker(self):
+        """测试工作进程未报告完成即退出时，收集不会一直等待"""
+        results = queue.Queue()
+        results.put(("done", 0, (1.5, None)))
+        processes = [MagicMock(), MagicMock(exitcode=-9)]
+        processes[1].is_alive.return_value = False
+        reports = _collect(processes, results, 0.0)
+        self.assertEqual(reports[0]["elapsed"], 1.5)
+        self.assertIn("-9", reports[1]["error"])
+
+    def test_display_env_and_missing_xvfb(self):
+        """测试临时设置DISPLAY后恢复，找不到Xvfb时给出明确错误"""
+        previous = os.environ.get("DISPLAY")
+        with _display_env(":42"):
+            self.assertEqual(os.environ["DISPLAY"], ":42")
+        self.assertEqual(os.environ.get("DISPLAY"), previous)
+        with self.assertRaises(RuntimeError):
+            XvfbDisplay(binary="/nonexistent/Xvfb").start()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from core.prompt_compactor import compact_elements, estimate_tokens, normalize_content
+
+class TestPromptCompactor(unittest.TestCase):
+    def setUp(self):
+        self.objs = [
+            {"id": 0, "type": "text", "content": "确定"},
+            {"id": 1, "type": "icon", "content": "No object detected."},
+            {"id": 2, "type": "text", "content": "确定"},
+            {"id": 3, "type": "icon", "content": "  搜索\n框  "},
+        ]
+
+    def test_columnar_format_and_dedup(self):
+        """测试列式输出与重复元素合并"""
+        text = compact_elements(self.objs, token_budget=None)
+        lines = text.split("\n")
+        self.assertEqual(lines[0], "id|type|content")
+        self.assertIn("0,2|text|确定", lines)
+        self.assertIn("1|icon|", lines)
+        self.assertIn("3|icon|搜索 框", lines)
+
+    def test_content_truncation(self):
+        """测试内容截断与分隔符替换"""
+        self.assertEqual(normalize_content("a|b"), "a/b")
+        self.assertEqual(len(normalize_content("x" * 100, max_length=10)), 10)
+
+    def test_token_budget(self):
+        """测试超出预算的元素被省略"""
+        objs = [{"id": i, "type": "text", "content": f"元素内容{i}"} for i in range(200)]
+        text = compact_elements(objs, token_budget=100)
+        self.assertLessEqual(estimate_tokens(text.rsplit("\n", 1)[0]), 100)
+        self.assertIn("省略", text)
+
+    def test_budget_keeps_relevant_and_interactive(self):
+        """测试超出预算时优先保留与指令相关的元素和可交互图标，保留的行仍按原顺序"""
+        objs = [{"id": i, "type": "text", "content": f"说明文字第{i}段"} for i in range(100)]
+        objs.insert(50, {"id": 500, "type": "icon", "content": "设置"})
+        objs.append({"id": 600, "type": "text", "content": "发送消息"})
+        text = compact_elements(objs, token_budget=40, query="点击发送按钮")
+        lines = text.split("\n")
+        self.assertIn("600|text|发送消息", lines)
+        self.assertIn("500|icon|设置", lines)
+        self.assertLess(lines.index("500|icon|设置"), lines.index("600|text|发送消息"))
+        kept = sum(len(line.split("|")[0].split(",")) for line in lines[1:-1])
+        self.assertEqual(lines[-1], f"...(超出预算，省略{len(objs) - kept}个元素)")
+
+    def test_estimate_tokens(self):
+        """测试token估算"""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("你好"), 2)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import threading
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core.geometry import Monitor
+from core.recorder import ActionRecorder
+
+def make_screen(seed):
+    """400x300的界面：随机明暗的色块布局"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(40, 220, (6, 8), dtype=np.uint8)
+    return np.kron(blocks, np.ones((50, 50), dtype=np.uint8))
+
+LOGIN = [{"id": 0, "type": "icon", "content": "登录", "bbox": [0.4, 0.4, 0.6, 0.6]}]
+SETTINGS = [{"id": 0, "type": "icon", "content": "设置", "bbox": [0.4, 0.4, 0.6, 0.6]}]
+
+class TestActionRecorder(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('core.geometry.DisplayGeometry.primary', Monitor(0, 0, 400, 300, 1.0, True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.screens = {"login": make_screen(0), "settings": make_screen(1)}
+        self.current = "login"
+        self.parses = []
+        self.recorder = ActionRecorder()
+        self.recorder.recording = True
+        self.recorder._capture = lambda: self.screens[self.current]
+        self.recorder._parse_screen = self.parse_screen
+
+    def parse_screen(self):
+        self.parses.append(self.current)
+        return self.screens[self.current], {"login": LOGIN, "settings": SETTINGS}[self.current]
+
+    def parse_now(self):
+        self.recorder._request_parse()
+        self.recorder._parse_thread.join(1.0)
+
+    def click_content(self):
+        params = self.recorder._with_element({"x": 200, "y": 150}, self.recorder._current_index())
+        return params.get("element_content")
+
+    def test_click_maps_to_current_elements(self):
+        """测试点击映射到当前界面的元素"""
+        self.parse_now()
+        self.recorder._observe_frame(self.screens["login"])
+        self.assertEqual(self.click_content(), "登录")
+
+    def test_stale_index_is_dropped_then_rebuilt(self):
+        """测试界面变化后不再使用旧的元素表，界面稳定后重新解析"""
+        self.parse_now()
+        self.current = "settings"
+        self.recorder._observe_frame(self.screens["settings"])
+        self.assertIsNone(self.click_content())
+        self.assertEqual(self.parses, ["login"])
+
+        # 连续两次采样一致视为界面已稳定，触发重新解析
+        self.recorder._observe_frame(self.screens["settings"])
+        self.recorder._parse_thread.join(1.0)
+        self.assertEqual(self.parses, ["login", "settings"])
+        self.assertEqual(self.click_content(), "设置")
+
+    def test_parse_runs_off_caller_thread(self):
+        """测试解析在后台线程中进行，不阻塞调用方；解析完成前的点击不附加元素"""
+        release = threading.Event()
+        threads = []
+
+        def slow_parse():
+            threads.append(threading.current_thread())
+            release.wait(1.0)
+            return self.parse_screen()
+
+        self.recorder._parse_screen = slow_parse
+        self.recorder._request_parse()
+        self.assertIsNone(self.click_content())
+        release.set()
+        self.recorder._parse_thread.join(1.0)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertEqual(self.click_content(), "登录")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from core.replay import EXIT_BAD_INPUT, EXIT_FAILED, EXIT_OK, ReplayRunner, collect_recordings, scale_action, summarize
+from core.waits import WAIT_RESPONSE_TIMEOUT, WAIT_STABLE_TIMEOUT, WaitResult
+from core.window_registry import WindowInfo
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.controller = MagicMock()
+        self.watches = []
+        registry = MagicMock()
+        registry.new_since.return_value = []
+        self.registry = registry
+        patcher = patch("core.window_registry.get_window_registry", return_value=registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, actions):
+        path = os.path.join(self.dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            for action in actions:
+                f.write(json.dumps(action, ensure_ascii=False) + "\n")
+        return path
+
+    def make_watch(self):
+        watch = MagicMock(since=0.0)
+        watch.wait.return_value = WaitResult(True, 0.25, 3)
+        self.watches.append(watch)
+        return watch
+
+    def run_files(self, *paths, speed=1.0):
+        runner = ReplayRunner(self.controller, speed=speed, watch_factory=self.make_watch)
+        with redirect_stdout(StringIO()):
+            return runner.run(paths)
+
+    def test_replays_steps_with_timing(self):
+        """测试按录制坐标回放每一步并记录执行与等待耗时，倍数压缩等待超时"""
+        path = self.write("a.jsonl", [
+            {"id": 0, "action": "click", "target": "按钮", "params": {"x": 10, "y": 20}},
+            {"id": 1, "action": "hotkey", "target": "复制", "params": {"key_sequence": ["ctrl", "c"]}},
+            {"id": 2, "action": "finish", "target": "完成", "params": {}},
+        ])
+        result, = self.run_files(path, speed=2.0)
+        self.assertTrue(result.passed)
+        self.assertEqual([step.status for step in result.steps], ["success"] * 3)
+        self.controller.click.assert_called_once_with(10, 20, "left", 1)
+        self.controller.hot_key.assert_called_once_with("ctrl", "c")
+        self.assertEqual(result.steps[0].wait, 0.25)
+        self.assertEqual(result.steps[2].wait, 0.0)
+        _, kwargs = self.watches[0].wait.call_args
+        self.assertAlmostEqual(kwargs["timeout"], WAIT_RESPONSE_TIMEOUT / 2)
+        self.assertAlmostEqual(kwargs["stable_timeout"], WAIT_STABLE_TIMEOUT / 2)
+
+    def test_move_skips_response_wait(self):
+        """测试鼠标移动与延迟一样不等待界面响应（移动不会改变截图，否则每步都要等满超时）"""
+        path = self.write("a.jsonl", [
+            {"id": 0, "action": "move", "target": "鼠标", "params": {"x": 10, "y": 20}},
+            {"id": 1, "action": "click", "target": "按钮", "params": {"x": 10, "y": 20}},
+        ])
+        result, = self.run_files(path)
+        self.assertTrue(result.passed)
+        self.controller.move_to.assert_called_once_with(10, 20)
+        self.assertEqual([step.wait for step in result.steps], [0.0, 0.25])
+        self.assertEqual(len(self.watches), 1)
+
+    def test_failure_skips_remaining_steps(self):
+        """测试某步失败后该文件剩余步骤跳过，其他文件继续回放"""
+        self.controller.click.side_effect = RuntimeError("点击失败")
+        failing = self.write("a.jsonl", [
+            {"id": 0, "action": "click", "target": "按钮", "params": {"x": 10, "y": 20}},
+            {"id": 1, "action": "press_enter", "target": "回车", "params": {}},
+        ])
+        passing = self.write("b.jsonl", [{"id": 0, "action": "press_enter", "target": "回车", "params": {}}])
+        results = self.run_files(failing, passing)
+        self.assertEqual([step.status for step in results[0].steps], ["failed", "skipped"])
+        self.assertEqual(results[0].steps[0].error, "点击失败")
+        self.assertTrue(results[1].passed)
+
+        summary = summarize(results, 1.0, 1.0)
+        self.assertEqual(summary["exit_code"], EXIT_FAILED)
+        self.assertEqual(summary["steps"], dict(summary["steps"], total=3, succeeded=1, failed=1, skipped=1))
+        json.dumps(summary, ensure_ascii=False)
+
+    def test_exit_codes(self):
+        """测试全部成功、无文件、文件无效时的退出码"""
+        passing = self.write("a.jsonl", [{"id": 0, "action": "press_enter", "target": "回车", "params": {}}])
+        self.assertEqual(summarize(self.run_files(passing), 1.0, 0)["exit_code"], EXIT_OK)
+        self.assertEqual(summarize([], 1.0, 0)["exit_code"], EXIT_BAD_INPUT)
+        missing = self.run_files(os.path.join(self.dir, "missing.jsonl"))
+        self.assertEqual(missing[0].status, "invalid")
+        self.assertEqual(summarize(missing, 1.0, 0)["exit_code"], EXIT_BAD_INPUT)
+
+    def test_scale_and_collect(self):
+        """测试录制延迟按倍数缩短，目录展开为其中的.jsonl文件"""
+        delay = {"id": 0, "action": "delay", "target": "等待", "params": {"seconds": 3}}
+        self.assertEqual(scale_action(delay, 4)["params"]["seconds"], 0.75)
+        self.assertEqual(delay["params"]["seconds"], 3)
+        click = {"id": 1, "action": "click", "target": "按钮", "params": {"x": 1, "y": 1}}
+        self.assertIs(scale_action(click, 4), click)
+
+        b = self.write("b.jsonl", [])
+        a = self.write("a.jsonl", [])
+        self.write("notes.txt", [])
+        self.assertEqual(collect_recordings([self.dir, a]), [a, b])
+
+    def test_any_invalid_line_invalidates_file(self):
+        """测试文件中任一行无效（如被截断）时整个文件无效，不回放任何步骤"""
+        path = self.write("truncated.jsonl", [
+            {"id": 0, "action": "click", "target": "按钮", "params": {"x": 10, "y": 20}},
+            {"id": 1, "action": "press_enter", "target": "回车", "params": {}},
+        ])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"id": 2, "action": "cli\n')
+        result, = self.run_files(path)
+        self.assertEqual(result.status, "invalid")
+        self.assertIn("第3行", result.error)
+        self.controller.click.assert_not_called()
+        self.assertEqual(summarize([result], 1.0, 0)["exit_code"], EXIT_BAD_INPUT)
+
+        schema_error = self.write("schema.jsonl", [
+            {"id": 0, "action": "press_enter", "target": "回车", "params": {}},
+            {"id": "1", "action": "click", "target": "按钮"},
+        ])
+        self.assertIn("第2行", self.run_files(schema_error)[0].error)
+
+    def test_partial_composite_fails_step(self):
+        """测试组合操作中途停止（partial）时该步骤失败"""
+        path = self.write("composite.jsonl", [
+            {"id": -1, "action": "composite", "target": "登录表单", "params": {"actions": [
+                {"id": 0, "action": "click", "target": "用户名", "params": {"x": 10, "y": 20}}]}},
+            {"id": 1, "action": "press_enter", "target": "回车", "params": {}},
+        ])
+        partial = ("composite", "登录表单", {}, 0.1, "partial", {})
+        with patch("utils.execute_action", return_value=partial):
+            result, = self.run_files(path)
+        self.assertEqual(result.status, "failed")
+        self.assertEqual([step.status for step in result.steps], ["failed", "skipped"])
+        self.assertIn("partial", result.steps[0].error)
+
+    def test_maximizes_new_window_by_handle(self):
+        """测试按注册表给出的句柄最大化新窗口，不按标题重新查找（可能命中同名的旧窗口）"""
+        self.registry.new_since.return_value = [WindowInfo(42, "记事本", (0, 0, 100, 100), 1.0)]
+        path = self.write("a.jsonl", [{"id": 0, "action": "click", "target": "按钮", "params": {"x": 10, "y": 20}}])
+        self.assertTrue(self.run_files(path)[0].passed)
+        self.controller.maximize_window.assert_called_once_with(42)
+        self.controller.find_window_by_title.assert_not_called()
+
+    def test_instruction_uses_exact_cache_and_invalidates_on_failure(self):
+        """测试按指令回放只复用精确命中的缓存，回放失败或工作流为空时使缓存失效"""
+        workflow = [{"id": -1, "action": "hotkey", "target": "运行", "params": {"key_sequence": ["win", "r"]}}]
+        runner = ReplayRunner(self.controller, watch_factory=self.make_watch)
+        cache = MagicMock()
+        with patch("utils.generate_workflow", return_value=(workflow, 0.1)) as generate, \
+                patch("utils.get_workflow_cache", return_value=cache):
+            self.assertTrue(runner.run_instruction("打开运行").passed)
+            generate.assert_called_with("打开运行", fuzzy=False)
+            cache.invalidate.assert_not_called()
+
+            with patch("utils.execute_action", side_effect=RuntimeError("找不到图标")):
+                self.assertEqual(runner.run_instruction("打开运行").status, "failed")
+            cache.invalidate.assert_called_once_with("打开运行")
+
+            generate.return_value = ([], 0.1)
+            self.assertEqual(runner.run_instruction("打开运行").status, "invalid")
+            self.assertEqual(cache.invalidate.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from core.model_parser import CancelToken, ModelParser, RequestHedger
+
+def responder(output, delay=0.0, error=None):
+    """模拟请求：等待delay秒（被取消时提前返回）后返回output或抛出error"""
+    def call(cancel: threading.Event):
+        cancel.wait(delay)
+        if error is not None:
+            raise error
+        return output
+    return call
+
+class BlockingStream:
+    """模拟流式响应：产出一个数据块后阻塞在读取上，直到连接被关闭"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="ok"))])
+        self.closed.wait(5.0)
+        raise RuntimeError("连接已关闭")
+
+    def close(self):
+        self.closed.set()
+
+def is_valid(output):
+    return output.startswith("ok")
+
+class TestRequestHedger(unittest.TestCase):
+    def setUp(self):
+        self.hedger = RequestHedger(default_delay=0.05, min_samples=3)
+
+    def run_hedged(self, primary, backup):
+        return self.hedger.run("text", primary, backup, is_valid)
+
+    def test_primary_wins_without_hedging(self):
+        """测试主请求在对冲延迟内返回时不发出备用请求，并记录延迟样本"""
+        backup_calls = []
+        result = self.run_hedged(responder("ok-primary"), lambda cancel: backup_calls.append(1) or "ok-backup")
+        self.assertEqual(result, "ok-primary")
+        self.assertEqual(backup_calls, [])
+        self.assertEqual(self.hedger.stats["hedged"], 0)
+        self.assertEqual(len(self.hedger._latencies["text"]), 1)
+
+    def test_backup_wins_and_slow_primary_is_sampled(self):
+        """测试主请求过慢时备用请求胜出，主请求被取消，其已耗时计入延迟样本"""
+        cancelled = threading.Event()
+
+        def slow_primary(cancel):
+            cancel.wait(2.0)
+            cancelled.set()
+            return "ok-primary"
+
+        start = time.time()
+        result = self.run_hedged(slow_primary, responder("ok-backup"))
+        self.assertEqual(result, "ok-backup")
+        self.assertLess(time.time() - start, 1.0)
+        self.assertTrue(cancelled.wait(1.0))
+        self.assertEqual(self.hedger.stats["backup_wins"], 1)
+        samples = list(self.hedger._latencies["text"])
+        self.assertEqual(len(samples), 1)
+        self.assertGreaterEqual(samples[0], 0.05)
+
+    def test_invalid_or_failed_primary_triggers_backup(self):
+        """测试主请求输出无效或抛出异常时立即对冲"""
+        self.assertEqual(self.run_hedged(responder("bad"), responder("ok-backup")), "ok-backup")
+        self.assertEqual(self.run_hedged(responder("", error=RuntimeError("超时")), responder("ok-backup")), "ok-backup")
+        self.assertEqual(self.hedger.stats["hedged"], 2)
+
+    def test_all_invalid_or_failed(self):
+        """测试都无效时返回主请求的输出，都失败时抛出主请求的异常"""
+        self.assertEqual(self.run_hedged(responder("bad-primary"), responder("bad-backup")), "bad-primary")
+        with self.assertRaises(ValueError):
+            self.run_hedged(responder("", error=ValueError("primary")), responder("", error=RuntimeError("backup")))
+
+    def test_cancel_closes_blocked_stream(self):
+        """测试取消时立即关闭阻塞在读取上的连接，返回已读取的内容"""
+        stream = BlockingStream()
+        cancel = CancelToken()
+        timer = threading.Timer(0.05, cancel.set)
+        timer.start()
+        start = time.time()
+        result = ModelParser.__new__(ModelParser)._handle_streaming_response(stream, cancel, echo=False)
+        timer.join()
+        self.assertEqual(result, "ok")
+        self.assertLess(time.time() - start, 1.0)
+        self.assertTrue(stream.closed.is_set())
+
+        # 已取消时注册的回调立即调用
+        closed = []
+        cancel.on_cancel(lambda: closed.append(1))
+        self.assertEqual(closed, [1])
+
+    def test_hedge_delay_estimate(self):
+        """测试样本不足时使用默认延迟，样本足够后取指定分位数"""
+        self.assertEqual(self.hedger.hedge_delay("text"), 0.05)
+        self.hedger._latencies["text"].extend([0.1, 0.2, 0.3, 0.4, 5.0])
+        self.assertEqual(self.hedger.hedge_delay("text"), 5.0)
+        self.hedger.percentile = 0.5
+        self.assertEqual(self.hedger.hedge_delay("text"), 0.3)
+        self.assertEqual(self.hedger.hedge_delay("omni"), 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
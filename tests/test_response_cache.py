@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from core.action_history import ActionHistory, render_history
+from core.model_parser import ModelParser
+from core.response_cache import ResponseCache
+
+def click(element_id, target="按钮"):
+    return {"action": "click", "id": element_id, "target": target, "params": {}}
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60, max_entries=2)
+
+    def key(self, actions, instruction="打开设置", elements="id|type|content"):
+        history = ActionHistory(actions, keep_last=1)
+        return ResponseCache.make_key("qwen-max", instruction, elements, render_history(history), "点击设置", history)
+
+    def test_hit_and_miss(self):
+        """测试相同输入命中并累计节省的延迟，过期条目视为未命中"""
+        key = self.key([click(1)])
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, '{"action": "finish"}', 1.5)
+        self.assertEqual(self.cache.get(key), '{"action": "finish"}')
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 1, "hit_rate": 0.5, "latency_saved": 1.5, "entries": 1})
+
+        with patch("core.response_cache.time.time", return_value=10 ** 10):
+            self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.stats["entries"], 0)
+
+    def test_key_sensitive_to_inputs_and_raw_history(self):
+        """测试键随指令、元素表与原始操作列表变化；渲染后文本相同的不同历史也得到不同的键"""
+        base = self.key([click(1)])
+        self.assertEqual(base, self.key([click(1)]))
+        self.assertNotEqual(base, self.key([click(1)], instruction="打开文件"))
+        self.assertNotEqual(base, self.key([click(1)], elements="id|type|content\n1|icon|设置"))
+        self.assertNotEqual(base, self.key([click(2)]))
+
+        # 早期操作只保留摘要，中间一步不同的两段历史渲染结果相同
+        first = [click(1, "文件"), click(2, "编辑"), click(3, "确定")]
+        second = [click(1, "文件"), click(5, "编辑"), click(3, "确定")]
+        self.assertEqual(render_history(ActionHistory(first, keep_last=1)),
+                         render_history(ActionHistory(second, keep_last=1)))
+        self.assertNotEqual(self.key(first), self.key(second))
+
+    def test_discard_failed_response(self):
+        """测试上一步执行失败后作废其缓存响应，重试时相同输入不再命中"""
+        parser = ModelParser.__new__(ModelParser)
+        parser.response_cache = self.cache
+        key = self.key([click(1)])
+        parser._last_response_key = key
+        parser._last_analysis_key = "analysis"
+        self.cache.put(key, '{"action": "click", "id": 2}', 1.0)
+        self.cache.put("analysis", "点击设置", 1.0)
+        parser.discard_last_response()
+        self.assertIsNone(self.cache.get(key))
+        self.assertIsNone(self.cache.get("analysis"))
+        # 没有待作废的响应时不做任何事
+        parser.discard_last_response()
+
+    def test_analysis_cached_by_screen_and_history(self):
+        """测试相同截图、界面元素与历史复用分析结果；元素表相同但截图不同时重新分析"""
+        parser = ModelParser.__new__(ModelParser)
+        parser.response_cache = ResponseCache()
+        parser._build_omni_messages = MagicMock(return_value=[])
+        parser._log_prompt_tokens = MagicMock()
+        parser._labeled_image_digest = MagicMock(return_value="screen-a")
+        parser.router = MagicMock()
+        parser.router.run.side_effect = ["点击id为1的设置", "点击id为2的文件", "先关闭对话框"]
+        data = [{"id": 1, "type": "icon", "content": "设置"}]
+        first = parser.parse_instruction_omni("打开设置", data, [])
+        self.assertEqual(parser.parse_instruction_omni("打开设置", data, []), first)
+        self.assertEqual(parser.router.run.call_count, 1)
+        parser._build_omni_messages.assert_called_once()
+        self.assertEqual(parser.parse_instruction_omni("打开设置", data, [click(1)]), "点击id为2的文件")
+        parser._labeled_image_digest.return_value = "screen-b"
+        self.assertEqual(parser.parse_instruction_omni("打开设置", data, []), "先关闭对话框")
+
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        a, b, c = (self.key([click(i)]) for i in range(3))
+        self.cache.put(a, "A", 0.1)
+        self.cache.put(b, "B", 0.1)
+        self.assertEqual(self.cache.get(a), "A")
+        self.cache.put(c, "C", 0.1)
+        self.assertIsNone(self.cache.get(b))
+        self.assertEqual((self.cache.get(a), self.cache.get(c)), ("A", "C"))
+        self.cache.clear()
+        self.assertEqual(self.cache.stats["entries"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
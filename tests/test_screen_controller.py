@@ -39,6 +39,37 @@ class TestPyAutoGUIWrapper(unittest.TestCase):
         dimensions = self.wrapper.get_window_rect()
         self.assertEqual(dimensions, (100, 200, 800, 600))
 
+    def test_capture_region_union_of_windows(self):
+        """测试窗口截图范围：目标窗口区域、多窗口外接矩形，无目标窗口时退回整屏"""
+        # 替换模块中的win32gui/win32process，非Windows平台上同样可以运行
+        rects = {1: (100, 100, 900, 700), 2: (600, 400, 1500, 1000)}
+        win32gui = MagicMock()
+        win32gui.GetWindowRect.side_effect = lambda hwnd: rects[hwnd]
+        win32gui.IsWindow.return_value = True
+        win32gui.IsWindowVisible.return_value = True
+        win32gui.IsIconic.return_value = False
+        win32gui.GetClassName.return_value = "Notepad"
+        win32process = MagicMock()
+        win32process.GetWindowThreadProcessId.return_value = (0, -1)
+        with patch('core.screen_controller.win32gui', win32gui), \
+             patch('core.screen_controller.win32process', win32process), \
+             patch('core.geometry.DisplayGeometry.virtual_bounds', (0, 0, 1920, 1080)):
+            self.assertIsNone(self.wrapper.capture_region("screen"))
+            self.wrapper._current_hwnd = 1
+            self.assertEqual(self.wrapper.capture_region("window"), (100, 100, 800, 600))
+            self.wrapper.capture_region("windows")
+            self.wrapper._current_hwnd = 2
+            self.assertEqual(self.wrapper.capture_region("windows"), (100, 100, 1400, 900))
+            self.wrapper.reset_capture_windows()
+            self.assertEqual(self.wrapper.capture_region("windows"), (600, 400, 900, 600))
+            win32gui.IsIconic.return_value = True
+            self.assertIsNone(self.wrapper.capture_region("window"))
+
+    def test_capture_region_without_win32(self):
+        """测试没有win32gui的平台（如X11）上退回整屏截图"""
+        with patch('core.screen_controller.win32gui', None):
+            self.assertIsNone(self.wrapper.capture_region("windows"))
+
     def test_coordinate_validation(self):
         """测试坐标验证逻辑"""
         # 有效坐标测试
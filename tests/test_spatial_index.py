@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+from core.spatial_index import SpatialIndex
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        self.objs = [
+            {"id": 0, "type": "icon", "content": "窗口", "bbox": [0.0, 0.0, 1.0, 1.0]},
+            {"id": 1, "type": "icon", "content": "确定", "bbox": [0.40, 0.40, 0.50, 0.45]},
+            {"id": 2, "type": "text", "content": "取消", "bbox": [0.60, 0.40, 0.70, 0.45]},
+        ]
+        self.index = SpatialIndex.from_objs(self.objs)
+
+    def test_point_and_hit(self):
+        """测试命中测试返回最内层元素"""
+        self.assertEqual(self.index.point(0.45, 0.42), [1, 0])
+        self.assertEqual(self.index.element(self.index.hit(0.65, 0.42))["content"], "取消")
+        self.assertEqual(self.index.hit(0.9, 0.9), 0)
+        self.assertIsNone(SpatialIndex.from_objs(self.objs[1:]).hit(0.9, 0.9))
+
+    def test_rect_and_nearest(self):
+        """测试矩形范围与最近邻查询"""
+        self.assertEqual(self.index.rect(0.55, 0.3, 0.65, 0.5), [0, 2])
+        index = SpatialIndex.from_objs(self.objs[1:])
+        self.assertEqual(index.nearest(0.52, 0.42, k=2), [0, 1])
+        self.assertEqual(index.nearest(0.9, 0.9), [1])
+
+    def test_matches_brute_force_on_many_elements(self):
+        """测试数千个元素时与暴力计算结果一致"""
+        rng = np.random.default_rng(0)
+        corners = rng.random((5000, 2)) * 0.95
+        sizes = rng.random((5000, 2)) * 0.05
+        bboxes = np.hstack([corners, corners + sizes]).astype(np.float32)
+        index = SpatialIndex(bboxes)
+        for x, y in rng.random((50, 2)):
+            dx = np.maximum(np.maximum(bboxes[:, 0] - x, x - bboxes[:, 2]), 0)
+            dy = np.maximum(np.maximum(bboxes[:, 1] - y, y - bboxes[:, 3]), 0)
+            expected = np.sort(np.hypot(dx, dy))[:5]
+            found = index.nearest(x, y, k=5)
+            np.testing.assert_allclose(np.sort(np.hypot(dx, dy)[found]), expected, rtol=1e-6)
+
+            inside = np.nonzero((bboxes[:, 0] <= x) & (x <= bboxes[:, 2]) & (bboxes[:, 1] <= y) & (y <= bboxes[:, 3]))[0]
+            self.assertEqual(sorted(index.point(x, y)), sorted(inside.tolist()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from core.fingerprint import ScreenFingerprint
+from core.state_graph import StateGraph
+
+class TestStateGraph(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "state_graph.json")
+        self.desktop = ScreenFingerprint("0000000000000000", "aaaa")
+        self.menu = ScreenFingerprint("00000000ffffffff", "bbbb")
+        self.dialog = ScreenFingerprint("ffffffffffffffff", "cccc")
+        self.open_menu = {"action": "click", "id": 1, "target": "开始", "params": {"x": 10, "y": 20}}
+        self.open_dialog = {"action": "click", "id": 5, "target": "设置", "params": {"x": 30, "y": 40}}
+        self.shortcut = {"action": "hotkey", "id": -1, "params": {"key_sequence": ["win", "i"]}}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_plan_prefers_lowest_latency(self):
+        """测试规划选择延迟最低的路径"""
+        graph = StateGraph(self.path)
+        graph.record_transition(self.desktop, self.open_menu, self.menu, 1.0, "打开设置")
+        graph.record_transition(self.menu, self.open_dialog, self.dialog, 1.0, "打开设置")
+        self.assertFalse(graph.has_goal("打开设置"))
+        graph.record_goal("打开设置", self.dialog)
+        self.assertTrue(graph.has_goal("打开设置"))
+        self.assertEqual([a for a, _ in graph.plan(self.desktop, "打开设置")], [self.open_menu, self.open_dialog])
+
+        graph.record_transition(self.desktop, self.shortcut, self.dialog, 0.5, "打开设置")
+        plan = graph.plan(self.desktop, "打开设置")
+        self.assertEqual([a for a, _ in plan], [self.shortcut])
+        self.assertTrue(plan[0][1].matches(self.dialog))
+
+    def test_approximate_match_and_persistence(self):
+        """测试感知哈希略有差异但元素签名相同时定位到已有状态，并可从文件恢复"""
+        graph = StateGraph(self.path)
+        graph.record_transition(self.desktop, self.open_menu, self.menu, 1.0, "打开开始菜单")
+        graph.record_goal("打开开始菜单", self.menu)
+
+        reloaded = StateGraph(self.path)
+        current = ScreenFingerprint("0000000000000003", "aaaa")
+        self.assertEqual([a for a, _ in reloaded.plan(current, "打开开始菜单")], [self.open_menu])
+        self.assertEqual(reloaded.plan(current, "未知指令"), [])
+
+    def test_requires_element_signature(self):
+        """测试当前指纹缺少元素签名或元素签名不同（如对话框文字不同）时不规划"""
+        graph = StateGraph(self.path)
+        graph.record_transition(self.desktop, self.open_menu, self.menu, 1.0, "打开开始菜单")
+        graph.record_goal("打开开始菜单", self.menu)
+        self.assertEqual(graph.plan(ScreenFingerprint("0000000000000000"), "打开开始菜单"), [])
+        self.assertEqual(graph.plan(ScreenFingerprint("0000000000000000", "dddd"), "打开开始菜单"), [])
+
+    def test_only_follows_edges_of_same_instruction(self):
+        """测试其他指令记录的转移不用于规划"""
+        graph = StateGraph(self.path)
+        graph.record_transition(self.desktop, self.open_menu, self.menu, 1.0, "打开开始菜单")
+        graph.record_transition(self.menu, self.open_dialog, self.dialog, 1.0, "打开开始菜单")
+        graph.record_goal("打开设置", self.dialog)
+        self.assertEqual(graph.plan(self.desktop, "打开设置"), [])
+
+        graph.record_transition(self.desktop, self.shortcut, self.dialog, 0.5, "打开设置")
+        self.assertEqual([a for a, _ in graph.plan(self.desktop, "打开设置")], [self.shortcut])
+
+    def test_edges_keyed_by_target_and_position(self):
+        """测试同一元素id点击不同位置或不同目标时记录为不同的边，目标上的轻微偏移合并为同一条边"""
+        graph = StateGraph(self.path)
+        other_click = {**self.open_menu, "target": "搜索", "params": {"x": 300, "y": 20}}
+        graph.record_transition(self.desktop, self.open_menu, self.menu, 1.0, "打开开始菜单")
+        graph.record_transition(self.desktop, other_click, self.dialog, 1.0, "打开搜索")
+        nudged = {**self.open_menu, "params": {"x": 8, "y": 22}}
+        graph.record_transition(self.desktop, nudged, self.menu, 1.0, "打开开始菜单")
+        edges = list(graph.edges[graph.locate(self.desktop)].values())
+        self.assertEqual(len(edges), 2)
+        self.assertEqual(sorted(edge["count"] for edge in edges), [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
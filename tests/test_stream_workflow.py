@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import utils
+from core.streaming import stream_in_background
+from core.workflow_cache import WorkflowCache
+
+STEPS = [
+    {"action": "hotkey", "id": -1, "target": "运行", "params": {"key_sequence": ["win", "r"]}},
+    {"action": "input", "id": -1, "target": "运行框", "params": {"text_content": "notepad"}},
+    {"action": "finish", "id": -1, "target": "None", "params": {}},
+]
+
+class FakeGenerator:
+    """模拟流式生成：每产出一个步骤后等待测试放行，可在指定步骤后抛出异常"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.produced = []
+        self.release = threading.Semaphore(0)
+
+    def stream_workflow(self, instruction):
+        for index, step in enumerate(STEPS):
+            if index == self.fail_after:
+                raise RuntimeError("连接中断")
+            self.produced.append(step)
+            yield step
+            self.release.acquire(timeout=1.0)
+
+class TestStreamWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = WorkflowCache(os.path.join(self.dir, "workflow_cache.json"))
+        patcher = patch("utils.get_workflow_cache", lambda: self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.threads = set(threading.enumerate())
+        self.generators = []
+
+    def tearDown(self):
+        # 停止后生成线程仍会运行至结束，放行并等待，避免其写入已删除的目录
+        for generator in self.generators:
+            for _ in STEPS:
+                generator.release.release()
+        for thread in set(threading.enumerate()) - self.threads:
+            thread.join(2.0)
+        shutil.rmtree(self.dir)
+
+    def stream(self, generator, **kwargs):
+        if generator is not None:
+            self.generators.append(generator)
+        with patch("core.model_parser.WorkFlowGenerator", return_value=generator):
+            yield from stream_in_background(lambda: utils.stream_workflow("打开记事本"), **kwargs)
+
+    def test_steps_delivered_one_by_one(self):
+        """测试每个步骤生成后即可取出执行，不等待整个工作流生成完毕；完成后写入缓存"""
+        generator = FakeGenerator()
+        delivered = []
+        for step in self.stream(generator):
+            # 取出当前步骤时，下一个步骤尚未生成
+            self.assertEqual(generator.produced, STEPS[:len(delivered) + 1])
+            delivered.append(step)
+            generator.release.release()
+        self.assertEqual(delivered, STEPS)
+        self.assertEqual(self.cache.get("打开记事本", fuzzy=False), STEPS)
+
+        # 再次执行时直接产出精确命中的缓存，不调用模型
+        self.assertEqual(list(self.stream(None)), STEPS)
+
+    def test_stop_request(self):
+        """测试请求停止后不再产出后续步骤，等待期间持续回调on_idle"""
+        generator = FakeGenerator()
+        stop = threading.Event()
+        idle_calls = []
+        delivered = []
+        for step in self.stream(generator, on_idle=lambda: idle_calls.append(1), should_stop=stop.is_set):
+            delivered.append(step)
+            stop.set()
+            generator.release.release()
+        self.assertEqual(delivered, STEPS[:1])
+
+        generator = FakeGenerator()
+        steps = self.stream(generator, on_idle=lambda: idle_calls.append(1), should_stop=lambda: len(idle_calls) >= 3)
+        self.assertEqual(next(steps), STEPS[0])
+        # 生成方不再放行，等待中达到停止条件
+        self.assertEqual(list(steps), [])
+        self.assertGreaterEqual(len(idle_calls), 3)
+
+    def test_error_mid_stream(self):
+        """测试生成中途出错时，已生成的步骤照常产出，之后抛出异常，且不写入缓存"""
+        generator = FakeGenerator(fail_after=2)
+        delivered = []
+        with self.assertRaises(RuntimeError):
+            for step in self.stream(generator):
+                delivered.append(step)
+                generator.release.release()
+        self.assertEqual(delivered, STEPS[:2])
+        self.assertIsNone(self.cache.get("打开记事本", fuzzy=False))
+
+if __name__ == '__main__':
+    unittest.main()
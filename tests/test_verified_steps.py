@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from core.fingerprint import fingerprint
+from core.geometry import Monitor
+from core.verified_steps import check_step, replay_verified_steps, saved_fingerprint
+
+def make_screen(seed=0):
+    """400x300的界面：随机明暗的色块布局"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(40, 220, (6, 8), dtype=np.uint8)
+    return np.kron(blocks, np.ones((50, 50), dtype=np.uint8))
+
+def with_text(screen, x, y, pattern):
+    """在(x, y)处画一行文字：按pattern排列的明暗笔画"""
+    screen = screen.copy()
+    for i, on in enumerate(pattern):
+        screen[y - 6:y + 6, x - 40 + i * 10:x - 34 + i * 10] = 0 if on else 255
+    return screen
+
+def saved_step(screen, action, params):
+    return {"action": action, "target": "确定", "params": params,
+            "fingerprint": saved_fingerprint(fingerprint(screen), screen, params)}
+
+OK_TEXT = [1, 0, 1, 1, 0, 1, 0, 1]
+DELETE_TEXT = [0, 1, 0, 0, 1, 0, 1, 0]
+
+class TestVerifiedSteps(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('core.geometry.DisplayGeometry.primary', Monitor(0, 0, 400, 300, 1.0, True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_match(self):
+        """测试屏幕与目标区域都未变化时匹配；无坐标的操作只比较整屏指纹"""
+        screen = with_text(make_screen(), 200, 150, OK_TEXT)
+        step = saved_step(screen, "click", {"x": 200, "y": 150})
+        self.assertEqual(check_step(step, screen.copy()), (True, "ok"))
+        hotkey = saved_step(screen, "hotkey", {"keys": ["ctrl", "s"]})
+        self.assertEqual(check_step(hotkey, screen.copy()), (True, "ok"))
+
+    def test_changed_text_at_target_is_mismatch(self):
+        """测试整屏指纹仍匹配但目标处文字变化（如对话框内容不同）时不匹配"""
+        screen = with_text(make_screen(), 200, 150, OK_TEXT)
+        changed = with_text(make_screen(), 200, 150, DELETE_TEXT)
+        self.assertTrue(fingerprint(screen).matches(fingerprint(changed)))
+        ok, reason = check_step(saved_step(screen, "click", {"x": 200, "y": 150}), changed)
+        self.assertFalse(ok)
+        self.assertIn("目标区域", reason)
+
+    def test_missing_target_hash_is_mismatch(self):
+        """测试旧记录没有目标区域哈希时不按坐标盲点"""
+        screen = make_screen()
+        step = {"action": "click", "params": {"x": 200, "y": 150}, "fingerprint": fingerprint(screen).to_dict()}
+        self.assertFalse(check_step(step, screen)[0])
+        self.assertFalse(check_step({"action": "click", "params": {"x": 200, "y": 150}}, screen)[0])
+
+    def test_stops_at_first_mismatch(self):
+        """测试逐步复用，遇到第一个不匹配的步骤即停止，之后的步骤不执行"""
+        first = with_text(make_screen(), 200, 150, OK_TEXT)
+        second = with_text(make_screen(1), 100, 100, OK_TEXT)
+        third = with_text(make_screen(2), 300, 200, OK_TEXT)
+        steps = [saved_step(first, "click", {"x": 200, "y": 150}),
+                 saved_step(second, "click", {"x": 100, "y": 100}),
+                 saved_step(third, "click", {"x": 300, "y": 200})]
+        screens = iter([first, with_text(make_screen(1), 100, 100, DELETE_TEXT), third])
+        executed = []
+        replayed = replay_verified_steps(steps, lambda: next(screens), lambda step, saved_fp: executed.append((step, saved_fp)) or True)
+        self.assertEqual(replayed, steps[:1])
+        self.assertEqual(executed, [({k: v for k, v in steps[0].items() if k != "fingerprint"}, steps[0]["fingerprint"])])
+
+    def test_stops_on_failed_execution_or_stop_request(self):
+        """测试步骤执行失败或请求停止时不再继续"""
+        screen = with_text(make_screen(), 200, 150, OK_TEXT)
+        steps = [saved_step(screen, "click", {"x": 200, "y": 150})] * 2
+        self.assertEqual(replay_verified_steps(steps, lambda: screen, lambda step, saved_fp: False), [])
+        self.assertEqual(replay_verified_steps(steps, lambda: screen, lambda step, saved_fp: True, lambda: True), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+from core.window_registry import WindowRegistry
+from core.waits import ActionWatch, Condition, FrameProbe, frame_changed, frame_stable, wait_until, window_appeared
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def __call__(self):
+        return self.now
+
+class TestWaits(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def wait(self, condition, timeout):
+        return wait_until(condition, timeout, min_interval=0.05, max_interval=0.4, backoff=2,
+                          sleep=self.clock.sleep, clock=self.clock)
+
+    def frames(self, values):
+        """按时间返回画面：values为[(开始时间, 灰度值)]"""
+        def grab():
+            value = [v for t, v in values if t <= self.clock.now][-1]
+            return np.full((36, 64), value, dtype=np.int16)
+        return FrameProbe(grab, max_age=0, clock=self.clock)
+
+    def test_returns_as_soon_as_satisfied(self):
+        """测试条件满足即返回，轮询间隔逐步增大且不越过截止时间"""
+        result = self.wait(Condition(lambda: self.clock.now >= 0.3 and "ok"), timeout=5)
+        self.assertTrue(result.satisfied)
+        self.assertEqual(result.value, "ok")
+        self.assertEqual(self.clock.sleeps, [0.05, 0.1, 0.2])
+        result = self.wait(Condition(lambda: False), timeout=1)
+        self.assertFalse(result.satisfied)
+        self.assertAlmostEqual(result.elapsed, 1.0)
+
+    def test_frame_changed_then_stable(self):
+        """测试画面变化与画面稳定条件"""
+        probe = self.frames([(0, 0), (0.2, 50), (0.4, 100), (0.6, 120)])
+        changed = frame_changed(probe)
+        self.assertTrue(self.wait(changed, timeout=2).satisfied)
+        self.assertAlmostEqual(self.clock.now, 0.35)
+        stable = self.wait(frame_stable(probe, quiet=0.3, clock=self.clock), timeout=5)
+        self.assertTrue(stable.satisfied)
+        self.assertGreaterEqual(self.clock.now, 0.9)
+
+    def test_composition(self):
+        """测试条件组合与新窗口条件"""
+        class Registry:
+            def new_since(inner, since):
+                return ["记事本"] if self.clock.now >= 0.1 else []
+        appeared = window_appeared(0, registry=Registry())
+        never = Condition(lambda: False, "never")
+        result = self.wait(never | appeared, timeout=1)
+        self.assertEqual(result.value, "记事本")
+        self.assertFalse(self.wait(never & appeared, timeout=0.2).satisfied)
+
+    def test_action_watch_ignores_earlier_windows(self):
+        """测试操作前已出现（但尚未枚举到）的窗口不算界面响应，操作后出现的窗口才算"""
+        class Registry(WindowRegistry):
+            windows = {1: ("桌面", (0, 0, 1920, 1080))}
+
+            def _enumerate(inner):
+                return dict(inner.windows)
+        registry = Registry().start()
+        registry.windows[2] = ("弹窗", (0, 0, 200, 100))
+        watch = ActionWatch(self.frames([(0, 0)]), registry=registry)
+        self.assertFalse(watch.wait(timeout=0.2, stable_timeout=0.2).satisfied)
+
+        registry.windows[3] = ("另存为", (100, 100, 500, 400))
+        registry.sync()
+        result = watch.wait(timeout=0.2, stable_timeout=1)
+        self.assertTrue(result.satisfied)
+        self.assertEqual(result.value.title, "另存为")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import unittest
+from collections import deque
+from types import SimpleNamespace
+from unittest.mock import patch
+from core.window_registry import WindowRegistry, X11WindowRegistry
+
+class FakeRegistry(WindowRegistry):
+    """以字典模拟平台窗口列表，调用sync()相当于一次完整枚举"""
+    def __init__(self, windows):
+        super().__init__()
+        self.platform_windows = dict(windows)
+        self.enumerations = 0
+
+    def _enumerate(self):
+        self.enumerations += 1
+        return dict(self.platform_windows)
+
+class TestWindowRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = FakeRegistry({1: ("桌面", (0, 0, 1920, 1080)), 2: ("记事本", (10, 10, 800, 600))}).start()
+
+    def test_title_index_and_new_since(self):
+        """测试标题索引与新窗口查询，启动时已存在的窗口不算新窗口"""
+        before = time.time()
+        self.assertEqual(self.registry.find("记事本", exact=True), 2)
+        self.assertEqual(self.registry.find("记事"), 2)
+        self.assertIsNone(self.registry.find("记事", exact=True))
+        self.assertEqual(self.registry.new_since(0), [])
+
+        self.registry._upsert(3, "另存为", (100, 100, 500, 400))
+        self.assertEqual([info.handle for info in self.registry.new_since(before)], [3])
+        self.registry._upsert(3, "保存", (100, 100, 500, 400))
+        self.assertIsNone(self.registry.find("另存为"))
+        self.assertEqual(self.registry.find("保存"), 3)
+        self.registry._remove(3)
+        self.assertEqual(self.registry.new_since(before), [])
+        self.assertEqual(self.registry.enumerations, 1)
+
+    def test_sync_diff(self):
+        """测试完整枚举后与缓存对比，增删窗口"""
+        self.registry.platform_windows = {1: ("桌面", (0, 0, 1920, 1080)), 4: ("画图", (0, 0, 640, 480))}
+        self.registry.sync()
+        self.assertEqual(sorted(self.registry.titles()), ["桌面", "画图"])
+        self.assertEqual(self.registry.get(4).rect, (0, 0, 640, 480))
+
+    def test_mark_is_baseline_before_action(self):
+        """测试操作前的基线：之前出现但尚未枚举到的窗口不算新窗口，操作后出现的才算"""
+        self.registry.platform_windows[3] = ("弹窗", (0, 0, 200, 100))
+        since = self.registry.mark()
+        self.registry.platform_windows[4] = ("另存为", (100, 100, 500, 400))
+        self.registry.sync()
+        self.assertEqual([info.handle for info in self.registry.new_since(since)], [4])
+
+    def test_wait_for_woken_by_change(self):
+        """测试等待窗口时由变化通知唤醒"""
+        timer = threading.Timer(0.05, self.registry._upsert, (5, "设置", (0, 0, 300, 300)))
+        timer.start()
+        start = time.time()
+        self.assertEqual(self.registry.wait_for("设置", timeout=2), 5)
+        self.assertLess(time.time() - start, 1)
+        self.assertIsNone(self.registry.wait_for("不存在", timeout=0.05))
+
+class FakeX11Window:
+    def __init__(self, display, handle):
+        self.display = display
+        self.id = handle
+
+    def get_full_property(self, atom, property_type):
+        if self.id == 0:
+            return SimpleNamespace(value=list(self.display.clients)) if atom == "_NET_CLIENT_LIST" else None
+        if atom == "_NET_WM_NAME" and self.id in self.display.windows:
+            return SimpleNamespace(value=self.display.windows[self.id][0].encode("utf-8"))
+        return None
+
+    def get_geometry(self):
+        _, (_, _, width, height) = self.display.windows[self.id]
+        return SimpleNamespace(width=width, height=height)
+
+    def translate_coords(self, window, x, y):
+        _, (left, top, _, _) = self.display.windows[window.id]
+        return SimpleNamespace(x=left + x, y=top + y)
+
+    def change_attributes(self, event_mask):
+        pass
+
+class FakeX11Display:
+    """模拟X连接：windows为{句柄: (标题, (x, y, 宽, 高))}，emit()向事件队列追加事件并唤醒select"""
+    def __init__(self, display_name=None):
+        self.windows = {}
+        self.clients = []
+        self.events = deque()
+        self._read, self._write = os.pipe()
+        os.set_blocking(self._read, False)
+        self.root = FakeX11Window(self, 0)
+
+    def screen(self):
+        return SimpleNamespace(root=self.root)
+
+    def intern_atom(self, name):
+        return name
+
+    def create_resource_object(self, kind, handle):
+        return FakeX11Window(self, handle)
+
+    def fileno(self):
+        return self._read
+
+    def pending_events(self):
+        try:
+            os.read(self._read, 1024)
+        except BlockingIOError:
+            pass
+        return len(self.events)
+
+    def next_event(self):
+        return self.events.popleft()
+
+    def close(self):
+        os.close(self._read)
+        os.close(self._write)
+
+    def emit(self, event_type, handle, atom=None):
+        self.events.append(SimpleNamespace(type=event_type, window=FakeX11Window(self, handle), atom=atom))
+        os.write(self._write, b"x")
+
+class TestX11WindowRegistry(unittest.TestCase):
+    def setUp(self):
+        self.display = FakeX11Display()
+        self.display.windows = {1: ("桌面", (0, 0, 1920, 1080))}
+        self.display.clients = [1]
+        with patch("Xlib.display.Display", return_value=self.display):
+            self.registry = X11WindowRegistry().start()
+        self.addCleanup(self.registry.stop)
+
+    def wait_until(self, predicate, timeout=2):
+        deadline = time.time() + timeout
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_events_update_cache(self):
+        """测试由客户窗口列表、标题与销毁事件增量更新缓存，不重新枚举"""
+        from Xlib import X
+        self.assertEqual(self.registry.titles(), ["桌面"])
+        self.assertEqual(self.registry.new_since(0), [])
+
+        since = self.registry.mark()
+        self.display.windows[2] = ("记事本", (10, 20, 800, 600))
+        self.display.clients.append(2)
+        self.display.emit(X.PropertyNotify, 0, "_NET_CLIENT_LIST")
+        self.assertEqual(self.registry.wait_for("记事本", timeout=2), 2)
+        new, = self.registry.new_since(since)
+        self.assertEqual((new.handle, new.rect), (2, (10, 20, 810, 620)))
+
+        self.display.windows[2] = ("无标题 - 记事本", (10, 20, 800, 600))
+        self.display.emit(X.PropertyNotify, 2, "_NET_WM_NAME")
+        self.assertEqual(self.registry.wait_for("无标题", timeout=2), 2)
+        self.assertEqual(self.registry.get(2).first_seen, new.first_seen)
+
+        self.display.emit(X.DestroyNotify, 2)
+        self.assertTrue(self.wait_until(lambda: self.registry.get(2) is None))
+        self.assertEqual(self.registry.titles(), ["桌面"])
+
+if __name__ == '__main__':
+    unittest.main()
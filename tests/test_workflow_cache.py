@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+from core.workflow_cache import WorkflowCache, normalize_instruction
+
+class TestWorkflowCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "workflow_cache.json")
+        self.workflow = [
+            {"action": "hotkey", "id": -1, "target": "None", "params": {"key_sequence": ["win", "r"]}},
+            {"action": "finish", "id": -1, "target": "None", "params": {}}
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_normalize_instruction(self):
+        """测试指令规范化"""
+        self.assertEqual(normalize_instruction(" 打开  微信！"), "打开微信")
+        self.assertEqual(normalize_instruction("Open Chrome."), "openchrome")
+
+    def test_exact_hit_and_persistence(self):
+        """测试规范化后精确命中并持久化到磁盘"""
+        WorkflowCache(self.path).put("打开微信", self.workflow)
+        cache = WorkflowCache(self.path)
+        self.assertEqual(cache.get("打开 微信。"), self.workflow)
+
+    def test_similarity_lookup(self):
+        """测试相似指令命中与不相关指令未命中"""
+        cache = WorkflowCache(self.path, threshold=0.7)
+        cache.put("查看华南理工大学计算机学院培养计划", self.workflow)
+        cache.put("打开微信给姐姐发消息", [])
+        self.assertEqual(cache.get("查看华南理工大学计算机学院的培养计划"), self.workflow)
+        self.assertIsNone(cache.get("关闭电脑"))
+
+    def test_invalidate(self):
+        """测试执行失败后缓存失效"""
+        cache = WorkflowCache(self.path)
+        cache.put("打开微信", self.workflow)
+        self.assertTrue(cache.invalidate("打开微信"))
+        self.assertIsNone(cache.get("打开微信"))
+        self.assertIsNone(WorkflowCache(self.path).get("打开微信"))
+
+    def test_similar_instruction_with_different_literals(self):
+        """测试相似指令的文件名、数字或否定词不同时不复用工作流"""
+        cache = WorkflowCache(self.path)
+        cache.put("打开D盘的文档文件夹，删除其中的report_final_v1.docx", self.workflow)
+        cache.put("我回家吃饭", self.workflow)
+        self.assertIsNone(cache.get("打开D盘的文档文件夹，删除其中的report_final_v2.docx"))
+        self.assertIsNone(cache.get("我不回家吃饭"))
+        self.assertEqual(cache.get("打开D盘的文档文件夹,删除其中的report_final_v1.docx"), self.workflow)
+
+    def test_exact_only_lookup(self):
+        """测试fuzzy=False时只接受精确命中"""
+        cache = WorkflowCache(self.path, threshold=0.7)
+        cache.put("查看华南理工大学计算机学院培养计划", self.workflow)
+        self.assertIsNone(cache.get("查看华南理工大学计算机学院的培养计划", fuzzy=False))
+        self.assertEqual(cache.get("查看华南理工大学计算机学院培养计划。", fuzzy=False), self.workflow)
+
+    def test_invalidate_exact_only(self):
+        """测试失效只移除精确一致的条目，不影响相似指令的条目"""
+        cache = WorkflowCache(self.path, threshold=0.7)
+        cache.put("查看华南理工大学计算机学院培养计划", self.workflow)
+        self.assertFalse(cache.invalidate("查看华南理工大学计算机学院的培养计划"))
+        self.assertEqual(len(cache), 1)
+
+    def test_invalidate_removes_fuzzy_hit(self):
+        """测试相似命中的工作流执行失败后，移除实际提供工作流的条目，之后的相似指令不再命中"""
+        cache = WorkflowCache(self.path, threshold=0.7)
+        cache.put("查看华南理工大学计算机学院培养计划", self.workflow)
+        self.assertEqual(cache.get("查看华南理工大学计算机学院的培养计划"), self.workflow)
+        self.assertTrue(cache.invalidate("查看华南理工大学计算机学院的培养计划"))
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get("查看一下华南理工大学计算机学院的培养计划"))
+        self.assertEqual(len(WorkflowCache(self.path)), 0)
+
+    def test_put_skipped_after_invalidation(self):
+        """测试流式生成期间指令已失效时，生成结束后不写入缓存"""
+        cache = WorkflowCache(self.path)
+        version = cache.version
+        cache.invalidate("打开微信")
+        cache.put("打开微信", self.workflow, since_version=version)
+        self.assertIsNone(cache.get("打开微信"))
+        cache.put("打开微信", self.workflow, since_version=cache.version)
+        self.assertEqual(cache.get("打开微信"), self.workflow)
+
+    def test_instances_share_file_without_losing_updates(self):
+        """测试多个实例（如并行回放的各工作进程）共用缓存文件时互不覆盖，失效也会移除其他实例写入的条目"""
+        first, second = WorkflowCache(self.path), WorkflowCache(self.path)
+        first.put("打开微信", self.workflow)
+        second.put("打开记事本", self.workflow)
+        self.assertEqual(len(WorkflowCache(self.path)), 2)
+        self.assertEqual(second.get("打开微信", fuzzy=False), self.workflow)
+
+        self.assertTrue(second.invalidate("打开微信"))
+        self.assertIsNone(WorkflowCache(self.path).get("打开微信", fuzzy=False))
+        self.assertEqual([name for name in os.listdir(self.test_dir)], ["workflow_cache.json"])
+
+    def test_concurrent_writers(self):
+        """测试多线程同时写入时所有条目都保存下来"""
+        import threading
+        caches = [WorkflowCache(self.path) for _ in range(4)]
+        threads = [threading.Thread(target=lambda c=cache, i=i: [c.put(f"打开程序{i}-{j}", self.workflow) for j in range(5)])
+                   for i, cache in enumerate(caches)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(WorkflowCache(self.path)), 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,7 @@ import sys
 import time
 import re
 import shutil
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator
 
 from PyQt5.QtCore import Qt, QPoint
 import PyQt5.QtCore as QtCore
@@ -17,13 +17,26 @@ from PyQt5.QtWidgets import (
     QLineEdit, QListWidget, QMainWindow, QPushButton, QSizePolicy,
     QSpinBox, QVBoxLayout, QWidget, QMessageBox, QGridLayout
 )
-
 import config
 from core import screen_controller
 from core.recorder import ActionRecorder
+from core.action_history import ActionHistory
+from core.fingerprint import ScreenFingerprint, fingerprint
+from core.geometry import get_geometry
+from core.verified_steps import replay_verified_steps, saved_fingerprint
+from core.waits import ActionWatch, Condition, wait_until
+from core.window_registry import get_window_registry
+from core.loop_guard import LoopDetector
+from core.element_tracker import ElementTracker
+from core.local_detector import draw_labels
+from core.spatial_index import SpatialIndex
+from core.streaming import stream_in_background
 from core.api.client import APIClient
 import utils
 
+# 操作后等待桌面发生变化的最长时间（秒）
+DESKTOP_CHANGE_TIMEOUT = getattr(config, "DESKTOP_CHANGE_TIMEOUT", 4.0)
+
 class HistoryComboBox(QComboBox):
     """带历史记录功能的下拉框组件"""
     
@@ -129,6 +142,29 @@ class FloatingWindow(QMainWindow):
         self.dragging = False
         self.old_pos = QPoint()
         self._pending_click_timer = None
+        self.element_tracker = ElementTracker()
+        self.spatial_index = SpatialIndex.from_objs([])
+        # 在第一个操作之前建立窗口注册表，否则首个操作打开的窗口会被当作启动时已存在的窗口
+        get_window_registry()
+        self._watch_display_changes()
+
+    def _watch_display_changes(self) -> None:
+        """显示器增减、主屏切换或分辨率/缩放变化时，让缓存的显示器布局失效"""
+        app = QApplication.instance()
+        if app is None:
+            return
+        geometry = get_geometry()
+
+        def watch_screen(screen):
+            geometry.invalidate()
+            screen.geometryChanged.connect(geometry.invalidate)
+            screen.logicalDotsPerInchChanged.connect(geometry.invalidate)
+
+        for screen in app.screens():
+            watch_screen(screen)
+        app.screenAdded.connect(watch_screen)
+        app.screenRemoved.connect(geometry.invalidate)
+        app.primaryScreenChanged.connect(geometry.invalidate)
 
     def _setup_window(self) -> None:
         """窗口基本设置"""
@@ -332,8 +368,20 @@ class FloatingWindow(QMainWindow):
             utils.update_status(self.input_box, "请输入录制名称")
             return
             
+        def parse_screen():
+            """截图并解析界面，由录制器在后台线程调用，使录制的点击能映射到元素id"""
+            utils.take_screenshot(self.controller)
+            result, _ = utils.process_image()
+            if result.status != 'success':
+                return config.SCREENSHOT_PATH, None
+            elements, _ = utils.parse_data(result.parsed_content)
+            return config.SCREENSHOT_PATH, elements
+
+        def capture():
+            return self.controller.screen_shot(use_cache=False, region=get_geometry().custom_capture_region)
+
         # 开始录制
-        if self.recorder.start_recording():
+        if self.recorder.start_recording(parse_screen, capture):
             utils.update_status(self.input_box, f"正在录制: {recording_name}")
             self.record_btn.setVisible(False)
             self.stop_record_btn.setVisible(True)
@@ -660,26 +708,15 @@ class FloatingWindow(QMainWindow):
                     break
                 
                 print(f"执行动作: {action}")
-                hwnd_titles = utils.get_all_windows_titles()
+                watch = ActionWatch()
 
                 utils.execute_action(self.controller, action, None)
 
-                # 比较hwnd_titles
-                new_hwnd_titles = utils.get_all_windows_titles()
-                # 获得新打开的窗口标题
-                new_windows = set(new_hwnd_titles) - set(hwnd_titles)
-                if new_windows:
-                    # 获取第一个新窗口的句柄
-                    new_window_title = next(iter(new_windows))
-                    try:
-                        hwnd = self.controller.find_window_by_title(new_window_title)
-                        self.controller.maximize_window(hwnd)
-                    except Exception as e:
-                        logging.error(f"窗口最大化失败: {str(e)}")
+                # 等待界面响应并稳定，无变化时最多等待WAIT_RESPONSE_TIMEOUT
+                watch.wait(should_stop=lambda: self.stop_requested)
+                # 最大化操作后新打开的窗口
+                self._maximize_new_window(watch.since)
                 print(f"动作执行完成")
-
-                # 延迟两秒
-                time.sleep(2)
             utils.update_status(self.input_box, "预存操作执行完成")
         except Exception as e:
             logging.error(f"预存操作执行失败: {str(e)}")
@@ -692,13 +729,25 @@ class FloatingWindow(QMainWindow):
         QtCore.QTimer.singleShot(int(config.SCREENSHOT_DELAY * 1000), loop.quit)
         loop.exec_()
 
+    def _maximize_new_window(self, since):
+        """最大化since之后新打开的第一个窗口（查询窗口注册表的缓存，不再前后两次枚举全部窗口）"""
+        new_windows = get_window_registry().new_since(since)
+        if not new_windows:
+            return
+        try:
+            # 注册表已给出新窗口的句柄，按标题再查找可能命中同名的旧窗口
+            self.controller.maximize_window(new_windows[0].handle)
+        except Exception as e:
+            logging.error(f"窗口最大化失败: {str(e)}")
+
     def _take_and_log_screenshot(self, image_path=config.SCREENSHOT_PATH):
         utils.update_status(self.input_box, "正在截图...")
         screenshot_duration = utils.take_screenshot(self.controller, image_path)
         utils.log_operation("截图", "屏幕", {}, screenshot_duration, "success")
 
     def _extract_curr_objs(self, objs):
-        return [{"id": obj["id"], "content": obj["content"]} for obj in objs if obj["content"] != "No object detected."]
+        """提取提示词所需的元素，内容的去重与截断由提示词压缩器完成"""
+        return objs.take([content != "No object detected." for content in objs.contents()])
 
     def _parse_and_log_instruction(self, instruction, pre_actions, curr_objs, analysis="", type='text'):
         utils.update_status(self.input_box, "正在解析指令...")
@@ -712,8 +761,11 @@ class FloatingWindow(QMainWindow):
         utils.log_operation("处理图像", "screen", {}, 0, "success")
         return result
 
-    def _save_labeled_image(self, result):
+    def _save_labeled_image(self, result, objs=None):
         labeled_image = result.labeled_image
+        # 跨帧跟踪改写了元素id时，按持久id重新绘制标注图
+        if objs and any(obj["id"] != index for index, obj in enumerate(objs)):
+            labeled_image = draw_labels(config.SCREENSHOT_PATH, objs)
         if labeled_image:
             try:
                 labeled_image.save(config.LABELED_IMAGE_PATH)
@@ -724,9 +776,19 @@ class FloatingWindow(QMainWindow):
 
     def _parse_and_log_data(self, result):
             objs, _ = utils.parse_data(result.parsed_content) 
+            # 未变化的元素区域复用缓存的标签，本地检测结果借此获得内容
+            utils.get_element_cache().annotate(config.SCREENSHOT_PATH, objs)
+            # 跨帧匹配元素，使同一元素在各帧中保持相同的id
+            self.element_tracker.update(objs)
+            self.spatial_index = SpatialIndex.from_objs(objs)
             utils.log_operation("解析数据", "screen", {}, 0, "success")
             return objs
 
+    def _reset_element_tracking(self):
+        """开始新的解析循环时重置元素跟踪，差量提示会话随之重新发送完整元素表"""
+        self.element_tracker.reset()
+        utils.get_model_parser().element_session.reset()
+
     def process_input(self):
         """处理用户输入（支持预存操作执行）"""
         # 获取输入内容或选中历史操作
@@ -766,8 +828,15 @@ class FloatingWindow(QMainWindow):
 
         instruction = self.input_box.text()
         self.keep_running()
+        self.controller.reset_capture_windows()
         start_time = time.time()
-        pre_actions = []
+        pre_actions = ActionHistory()
+
+        if is_workflow_mode and getattr(config, "WORKFLOW_AUTO_CONFIRM", False):
+            # 自动确认模式：边生成边执行，第一个步骤生成后立即开始执行
+            utils.update_status(self.input_box, "正在流式生成工作流...")
+            self._run_workflow(self._stream_workflow_steps(instruction), instruction, start_time)
+            return
 
         if is_workflow_mode:
             try:
@@ -816,8 +885,27 @@ class FloatingWindow(QMainWindow):
                 raise ValueError("指令不能为空")
             logging.info(f"开始处理指令: {instruction}")
 
+            # 每个成功步骤执行前的屏幕指纹，随操作记录一起保存
+            fingerprints = []
+            self._replay_verified_steps(instruction, pre_actions, fingerprints)
+            self._follow_state_graph(instruction, pre_actions, fingerprints)
+
+            state_graph = utils.get_state_graph()
+            # 上一个成功步骤(执行前指纹, 操作, 延迟)，在下一次解析出执行后指纹时写入状态图
+            pending_transition = None
+            loop_guard = LoopDetector()
+            # 因循环或超出预算而中止的运行不是成功的操作序列，不能保存为该指令的记录
+            aborted = False
+            self._reset_element_tracking()
+            tokens_at_start = utils.get_model_parser().total_tokens
             while not self.stop_requested:
-                hwnd_titles = utils.get_all_windows_titles()
+                verdict = loop_guard.check_budgets(utils.get_model_parser().total_tokens - tokens_at_start)
+                if verdict.status == LoopDetector.ABORT:
+                    utils.update_status(self.input_box, verdict.message)
+                    aborted = True
+                    break
+
+                window_check_time = get_window_registry().mark()
 
                 self._take_and_log_screenshot(config.PRE_DESKTOP_PATH)
                 self._wait_for_screenshot_delay()
@@ -836,12 +924,17 @@ class FloatingWindow(QMainWindow):
                     break
 
                 if result.status == 'success': 
-                    # 保存标记图像
-                    self._save_labeled_image(result)
-
                     # 解析数据
                     objs = self._parse_and_log_data(result)
+
+                    # 保存标记图像
+                    self._save_labeled_image(result, objs)
                     curr_objs = self._extract_curr_objs(objs)
+                    screen_fp = fingerprint(config.SCREENSHOT_PATH, objs)
+                    if pending_transition is not None:
+                        state_graph.record_transition(pending_transition[0], pending_transition[1],
+                                                      screen_fp, pending_transition[2], instruction)
+                        pending_transition = None
 
                     # 指令解析
                     utils.update_status(self.input_box, "分析者正在分析...")
@@ -856,42 +949,58 @@ class FloatingWindow(QMainWindow):
                     if action is None:
                         continue
                     action_data = utils.robust_json_extract(action)
+                    step_start = time.time()
                     action_result = utils.execute_action(self.controller, action_data, objs)
                     if action_result is None:
+                        # 模型判定任务完成，当前界面即为该指令的目标状态
+                        state_graph.record_goal(instruction, screen_fp)
                         break
                     action_type, target_icon, params, execute_duration, status, action_data = action_result
                     print("执行对象：", action_data)
                     utils.log_operation(action_type, target_icon, params, execute_duration, status)
-                    if status == "success" and self.check_desktop_stabilized(action_type):
+                    # 组合操作中途界面发生意外变化(partial)时，已执行的部分计入历史并重新解析界面
+                    changed = status in ("success", "partial") and self.check_desktop_stabilized(
+                        action_type, self._target_region(params))
+                    step_latency = time.time() - step_start
+
+                    # 循环检测：先提示模型换方法，仍无改善时中止
+                    verdict = loop_guard.observe(
+                        screen_fp, action_data, changed,
+                        utils.get_model_parser().total_tokens - tokens_at_start
+                    )
+                    if verdict.status == LoopDetector.ABORT:
+                        utils.update_status(self.input_box, verdict.message)
+                        aborted = True
+                        break
+                    if verdict.status == LoopDetector.HINT:
+                        pre_actions.add_note(verdict.message)
+
+                    if changed:
                         pre_actions.append(action_data)
+                        fingerprints.append(saved_fingerprint(screen_fp, config.SCREENSHOT_PATH, params))
+                        pending_transition = (screen_fp, action_data, step_latency)
 
-                        # 比较hwnd_titles
-                        new_hwnd_titles = utils.get_all_windows_titles()
-                        # 获得新打开的窗口标题
-                        new_windows = set(new_hwnd_titles) - set(hwnd_titles)
-                        if new_windows:
-                            # 获取第一个新窗口的句柄
-                            new_window_title = next(iter(new_windows))
-                            try:
-                                hwnd = self.controller.find_window_by_title(new_window_title)
-                                self.controller.maximize_window(hwnd)
-                            except Exception as e:
-                                logging.error(f"窗口最大化失败: {str(e)}")
+                        # 最大化操作后新打开的窗口
+                        self._maximize_new_window(window_check_time)
                     else:
-                        # 当前执行并没有改变状态，需要重新执行
+                        # 当前执行并没有改变状态，需要重新执行；作废该响应，避免重试时命中缓存的同一操作
+                        utils.get_model_parser().discard_last_response()
                         continue
 
                 else:   
                     utils.update_status(self.input_box, f"操作失败: {result.message}")
                     break
             # 保存操作记录
-            if not self.stop_requested:
+            if not self.stop_requested and not aborted:
                 os.remove(config.SCREENSHOT_PATH)
                 os.remove(config.LABELED_IMAGE_PATH)
                 os.remove(config.PRE_DESKTOP_PATH)
                 with open(config.PRE_ACTIONS_PATH + "/" + f"{instruction}.jsonl", 'w', encoding='utf-8') as f:
-                    for action in pre_actions:
-                        f.write(json.dumps(action, ensure_ascii=False) + '\n')
+                    for action, screen_fp in zip(pre_actions, fingerprints):
+                        f.write(json.dumps({**action, "fingerprint": screen_fp}, ensure_ascii=False) + '\n')
+            logging.info(f"操作历史压缩统计: {pre_actions.metrics}")
+            utils.get_element_cache().save()
+            logging.info(f"元素缓存统计: {utils.get_element_cache().stats}")
 
         except Exception as e:
             logging.error(f"指令执行过程中出现异常: {str(e)}", exc_info=True)
@@ -908,53 +1017,149 @@ class FloatingWindow(QMainWindow):
 
             self.finish_running()
 
+    def _stream_workflow_steps(self, instruction: str) -> Iterator[Dict[str, Any]]:
+        """在后台线程中流式生成工作流，并在界面线程中逐个产出已生成的步骤"""
+        # 等待下一个步骤时保持界面响应
+        return stream_in_background(lambda: utils.stream_workflow(instruction),
+                                    on_idle=QApplication.processEvents,
+                                    should_stop=lambda: self.stop_requested)
+
+    def _replay_verified_steps(self, instruction, pre_actions, fingerprints) -> int:
+        """复用该指令上次成功运行保存的步骤
+
+        逐步比较当前屏幕与保存的执行前状态（整屏指纹与目标坐标附近区域的哈希），
+        匹配则直接按保存的坐标执行，无需解析界面和调用模型；
+        遇到第一个不匹配的步骤即停止，交由完整流程继续。
+
+        Returns:
+            复用的步骤数
+        """
+        saved_path = os.path.join(config.PRE_ACTIONS_PATH, f"{instruction}.jsonl")
+        if not os.path.exists(saved_path):
+            return 0
+
+        def capture():
+            self._take_and_log_screenshot(config.PRE_DESKTOP_PATH)
+            return config.PRE_DESKTOP_PATH
+
+        def execute(step, saved_fp):
+            utils.update_status(self.input_box, f"正在复用已验证步骤{len(pre_actions) + 1}...")
+            action_result = utils.execute_action(self.controller, step, None)
+            if action_result is None:
+                return False
+            action_type, target_icon, params, execute_duration, status, _ = action_result
+            utils.log_operation(action_type, target_icon, params, execute_duration, status)
+            if status not in ("success", "partial"):
+                return False
+            # 已执行的步骤先计入历史，界面未按预期变化时由完整流程在此基础上继续
+            pre_actions.append(step)
+            fingerprints.append(saved_fp)
+            return status == "success" and self.check_desktop_stabilized(action_type)
+
+        replayed = replay_verified_steps(utils.load_action_history(saved_path), capture, execute,
+                                         lambda: self.stop_requested)
+        logging.info(f"已复用{len(replayed)}个已验证步骤: {instruction}")
+        return len(replayed)
+
+    def _follow_state_graph(self, instruction, pre_actions, fingerprints) -> int:
+        """沿状态图中已知的最短路径执行，直到到达该指令的目标状态
+
+        只使用该指令此前成功运行时记录的转移；每步执行前解析界面，
+        屏幕指纹（含元素签名）与路径上的预期状态一致才执行，不一致即停止，交由完整流程继续。
+
+        Returns:
+            执行的步骤数
+        """
+        # 没有记录过目标状态时无路可走，不必截图解析
+        state_graph = utils.get_state_graph()
+        if not state_graph.has_goal(instruction):
+            return 0
+        current_fp = self._parsed_screen_fingerprint()
+        plan = state_graph.plan(current_fp, instruction) if current_fp else []
+        if not plan:
+            return 0
+
+        followed = 0
+        for step, expected_fp in plan:
+            if self.stop_requested:
+                break
+            utils.update_status(self.input_box, f"正在沿已知路径执行步骤{followed + 1}/{len(plan)}...")
+            # 执行前的桌面截图，供执行后判断界面是否变化
+            self._take_and_log_screenshot(config.PRE_DESKTOP_PATH)
+            action_result = utils.execute_action(self.controller, step, None)
+            if action_result is None:
+                break
+            action_type, target_icon, params, execute_duration, status, _ = action_result
+            utils.log_operation(action_type, target_icon, params, execute_duration, status)
+            if status not in ("success", "partial"):
+                break
+
+            # 已执行的步骤都计入历史，界面未按预期变化时由完整流程在此基础上继续
+            pre_actions.append(step)
+            fingerprints.append(saved_fingerprint(current_fp, config.SCREENSHOT_PATH, step.get("params")))
+            followed += 1
+            if status != "success" or not self.check_desktop_stabilized(action_type):
+                logging.info(f"已知路径步骤{followed}执行后界面未变化，转入完整流程")
+                break
+
+            current_fp = self._parsed_screen_fingerprint()
+            if current_fp is None or not expected_fp.matches(current_fp):
+                logging.info(f"已知路径步骤{followed}后到达未预期的界面，转入完整流程")
+                break
+
+        logging.info(f"沿状态图已知路径执行了{followed}/{len(plan)}个步骤: {instruction}")
+        return followed
+
+    def _parsed_screen_fingerprint(self) -> Optional[ScreenFingerprint]:
+        """截图并解析界面，返回带元素签名的屏幕指纹；解析失败时返回None"""
+        self._take_and_log_screenshot()
+        result = self._process_and_log_image()
+        if result.status != 'success':
+            return None
+        return fingerprint(config.SCREENSHOT_PATH, self._parse_and_log_data(result))
+
     def _execute_workflow(self, workflow, dialog, instruction, start_time=None):
         """执行生成的工作流（带失败降级处理）"""
         dialog.accept()
+        self._run_workflow(workflow, instruction, start_time)
+
+    def _run_workflow(self, workflow: Iterable[Dict[str, Any]], instruction, start_time=None):
+        """逐步执行工作流，workflow可以是列表，也可以是流式生成的步骤"""
         if start_time is None:
             start_time = time.time()  # 如果没有传入开始时间，则记录当前时间
             
         try:
-            pre_actions = []
+            pre_actions = ActionHistory()
             for step_idx, step in enumerate(workflow, 1):
                 if self.stop_requested:
                     break
                 
                 try:
-                    hwnd_titles = utils.get_all_windows_titles()
+                    watch = ActionWatch()
 
                     # 工作流模式执行
                     utils.update_status(self.input_box, f"正在执行工作流步骤{step_idx}...")
                     result = utils.execute_action(self.controller, step, None, True)
 
-                    # 比较hwnd_titles
-                    new_hwnd_titles = utils.get_all_windows_titles()
-                    # 获得新打开的窗口标题
-                    new_windows = set(new_hwnd_titles) - set(hwnd_titles)
-                    if new_windows:
-                        # 获取第一个新窗口的句柄
-                        new_window_title = next(iter(new_windows))
-                        try:
-                            hwnd = self.controller.find_window_by_title(new_window_title)
-                            self.controller.maximize_window(hwnd)
-                        except Exception as e:
-                            logging.error(f"窗口最大化失败: {str(e)}")
+                    # 等待界面响应并稳定后再进行下一步
+                    watch.wait(should_stop=lambda: self.stop_requested)
+                    # 最大化操作后新打开的窗口
+                    self._maximize_new_window(watch.since)
 
                     if self.check_desktop_stabilized(step["action"]):
                         pre_actions.append(step)
 
                     pre_actions.append(step)
-                    time.sleep(1)  # 步骤间间隔
 
 
                 except Exception as e:
                     logging.error(f"工作流步骤{step_idx}执行失败，启动降级处理: {str(e)}")
+                    # 缓存的工作流已不适用于当前环境，下次重新生成
+                    utils.get_workflow_cache().invalidate(instruction)
                     # 失败时切换为单步执行模式
                     success = self._handle_failed_step(instruction, pre_actions, step, step_idx)
                     if not success:
                         raise RuntimeError(f"步骤{step_idx}降级执行失败") from e
-                
-                time.sleep(1)  # 步骤间间隔
             
             total_time = time.time() - start_time
             print("工作流执行完成，耗时:", total_time)
@@ -980,18 +1185,23 @@ class FloatingWindow(QMainWindow):
             # 使用常规流程执行步骤
             utils.update_status(self.input_box, f"AI介入{failed_step}")
             print("AI介入：", failed_step)
-            pre_actions = []
+            pre_actions = ActionHistory()
+            loop_guard = LoopDetector()
+            self._reset_element_tracking()
             # 截图、处理图像、解析数据
             while True:
-                hwnd_titles = utils.get_all_windows_titles()
+                if self.stop_requested:
+                    return False
+                window_check_time = get_window_registry().mark()
 
                 self._take_and_log_screenshot(config.PRE_DESKTOP_PATH)
                 self._wait_for_screenshot_delay()
                 self._take_and_log_screenshot()
                 result = self._process_and_log_image()
-                self._save_labeled_image(result)
                 objs = self._parse_and_log_data(result)
+                self._save_labeled_image(result, objs)
                 curr_objs = self._extract_curr_objs(objs)
+                screen_fp = fingerprint(config.SCREENSHOT_PATH, objs)
                 
                 instruction = failed_step
                 analasis = self._parse_and_log_instruction(instruction, pre_actions, curr_objs, type='omni')
@@ -1008,23 +1218,22 @@ class FloatingWindow(QMainWindow):
                 action_type, target_icon, params, execute_duration, status, action_data = action_result
                 print("执行对象：", action_data)
                 utils.log_operation(action_type, target_icon, params, execute_duration, status)
-                if status == "success" and self.check_desktop_stabilized(action_type):
-                        pre_actions.append(action_data)
+                changed = status in ("success", "partial") and self.check_desktop_stabilized(
+                    action_type, self._target_region(params))
+                verdict = loop_guard.observe(screen_fp, action_data, changed)
+                if verdict.status == LoopDetector.ABORT:
+                    utils.update_status(self.input_box, verdict.message)
+                    return False
+                if verdict.status == LoopDetector.HINT:
+                    pre_actions.add_note(verdict.message)
+                if changed:
+                    pre_actions.append(action_data)
 
-                        # 比较hwnd_titles
-                        new_hwnd_titles = utils.get_all_windows_titles()
-                        # 获得新打开的窗口标题
-                        new_windows = set(new_hwnd_titles) - set(hwnd_titles)
-                        if new_windows:
-                            # 获取第一个新窗口的句柄
-                            new_window_title = next(iter(new_windows))
-                            try:
-                                hwnd = self.controller.find_window_by_title(new_window_title)
-                                self.controller.maximize_window(hwnd)
-                            except Exception as e:
-                                logging.error(f"窗口最大化失败: {str(e)}")
+                    # 最大化操作后新打开的窗口
+                    self._maximize_new_window(window_check_time)
                 else:
-                    # 当前执行并没有改变状态，需要重新执行
+                    # 当前执行并没有改变状态，需要重新执行；作废该响应，避免重试时命中缓存的同一操作
+                    utils.get_model_parser().discard_last_response()
                     continue
         finally:
             self.mode_combo.setCurrentIndex(original_mode)
@@ -1043,8 +1252,20 @@ class FloatingWindow(QMainWindow):
             logging.error(f"步骤{step_number}完整流程重试失败: {str(e)}")
             return False
 
-    def check_desktop_stabilized(self, action_type):
+    def _target_region(self, params, margin=0.02):
+        """由操作坐标在空间索引中命中目标元素，返回其外扩后的归一化区域，未命中时返回None"""
+        if not params or params.get('x') is None or params.get('y') is None:
+            return None
+        index = self.spatial_index.hit(*get_geometry().screen_to_normalized(params['x'], params['y']))
+        if index is None:
+            return None
+        xmin, ymin, xmax, ymax = self.spatial_index.bboxes[index]
+        return (max(0.0, xmin - margin), max(0.0, ymin - margin),
+                min(1.0, xmax + margin), min(1.0, ymax + margin))
+
+    def check_desktop_stabilized(self, action_type, region=None):
         """检查桌面状态是否发生变化
+        region为目标元素所在的归一化区域时，该区域内的局部变化（如勾选框、按钮状态）也视为变化
         返回True表示发生了变化，False表示没有变化
         """
         if action_type not in ["click", "open","scroll"]:
@@ -1056,27 +1277,34 @@ class FloatingWindow(QMainWindow):
                 logging.warning("缺少历史桌面截图")
                 return False
                 
-            for attempt in range(4):
-                # 截取当前桌面
+            def desktop_changed():
+                # 截取当前桌面并比较相似度
                 self._take_and_log_screenshot(config.CURRENT_DESKTOP_PATH)
-                
-                # 比较相似度
                 similarity = utils.compare_image_similarity(
                     config.PRE_DESKTOP_PATH,
                     config.CURRENT_DESKTOP_PATH
                 )
-                
-                if similarity["ssim"] < 0.98 and similarity["mse"] > 100:
-                    print("桌面状态发生变化")
-                    if os.path.exists(config.PRE_DESKTOP_PATH):
-                        os.remove(config.PRE_DESKTOP_PATH)
-                    os.rename(config.CURRENT_DESKTOP_PATH, config.PRE_DESKTOP_PATH)
-                    return True
-                    
-                attempt += 1
-                time.sleep(1)  # 等待1秒后重试
-                
-            logging.warning("桌面状态未在4秒内发生变化")
+                changed = similarity["ssim"] < 0.98 and similarity["mse"] > 100
+                if not changed and region is not None:
+                    local = utils.compare_image_similarity(
+                        config.PRE_DESKTOP_PATH,
+                        config.CURRENT_DESKTOP_PATH,
+                        region
+                    )
+                    changed = local["ssim"] < 0.98 and local["mse"] > 100
+                return changed
+
+            # 变化出现即返回；截图与比较本身较慢，轮询间隔从0.2秒起逐步增大
+            result = wait_until(Condition(desktop_changed, "desktop_changed"), DESKTOP_CHANGE_TIMEOUT,
+                                min_interval=0.2, max_interval=1.0, should_stop=lambda: self.stop_requested)
+            if result.satisfied:
+                print("桌面状态发生变化")
+                if os.path.exists(config.PRE_DESKTOP_PATH):
+                    os.remove(config.PRE_DESKTOP_PATH)
+                os.rename(config.CURRENT_DESKTOP_PATH, config.PRE_DESKTOP_PATH)
+                return True
+
+            logging.warning(f"桌面状态未在{result.elapsed:.1f}秒内发生变化")
             return False
             
         except FileNotFoundError as e:
@@ -1,6 +1,5 @@
 # utils.py
 # 工具函数模块，包含日志记录、状态更新等常用函数
-import ast
 import json
 import logging
 import re
@@ -8,43 +7,33 @@ import time
 from datetime import datetime
 from typing import final
 from jsonschema import validate
-from PyQt5.QtWidgets import QApplication
 import os
-import pyautogui
 
 import config
+from core.action_schema import COMPOSITE_SUB_ACTIONS, JSON_SCHEMA, MAX_COMPOSITE_ACTIONS
 
-JSON_SCHEMA = {
-    "type": "object",
-    "properties": {
-        "id": {"type": "integer"},
-        "action": {"type": "string"},
-        "target": {"type": "string"},
-        "value": {
-            "type": "object",
-            "properties": {
-                "button_type": {"type": "string"},
-                "text_content": {"type": "string"},
-                "key_sequence": {"type": "array"},
-                "direction": {"type": "string"},
-                "clicks": {"type": "integer"}
-            },
-        }
-    },
-    "required": ["id", "action", "target"]
-}
+# 校验组合操作中input是否生效时比较的区域：以输入坐标为中心的半宽、半高（屏幕坐标）
+COMPOSITE_INPUT_REGION = getattr(config, "COMPOSITE_INPUT_REGION", (150, 25))
+# 该区域输入前后平均灰度差低于此值视为输入未生效
+COMPOSITE_INPUT_CHANGE_THRESHOLD = getattr(config, "COMPOSITE_INPUT_CHANGE_THRESHOLD", 1.0)
 
 
 JSON_PATTERN = re.compile(r'```json(.*?)```', re.DOTALL)
 def log_operation(action_type: str, target: str, params: dict, duration: float, status: str):
     """记录操作日志（新增坐标记录）"""
-    # 从参数中提取坐标信息
-    coord = {
-        'x': params.get('x'),
-        'y': params.get('y'),
-        'screen_width': pyautogui.size()[0],
-        'screen_height': pyautogui.size()[1]
-    } if 'x' in params or 'y' in params else None
+    # 从参数中提取坐标信息（屏幕尺寸来自缓存的显示器布局）
+    coord = None
+    if 'x' in params or 'y' in params:
+        from core.geometry import get_geometry
+        geometry = get_geometry()
+        screen_width, screen_height = geometry.screen_size
+        coord = {
+            'x': params.get('x'),
+            'y': params.get('y'),
+            'screen_width': screen_width,
+            'screen_height': screen_height,
+            'capture_region': list(geometry.capture_region)
+        }
     
     log_entry = {
         "timestamp": datetime.now().isoformat(),
@@ -113,22 +102,46 @@ def load_instruction_history(file_path) -> list:
 
 def update_status(input_box, message: str):
     """更新状态提示"""
+    from PyQt5.QtWidgets import QApplication
     input_box.setPlaceholderText(message)
     QApplication.processEvents()
 
 def take_screenshot(controller, image_path = config.SCREENSHOT_PATH):
-    """截图操作"""
+    """截图操作
+
+    用于解析的截图按截图范围配置重新确定区域（目标窗口或整屏），并作为归一化bbox的参照区域；
+    其余截图（操作前后的对比图）沿用该区域，使前后两张图可以直接比较
+    """
+    from core.geometry import get_geometry
     start_time = time.time()
-    img = controller.screen_shot()
+    geometry = get_geometry()
+    if image_path == config.SCREENSHOT_PATH:
+        region = controller.capture_region()
+        img = controller.screen_shot(region=region)
+        geometry.set_capture_region(region, img.size)
+    else:
+        img = controller.screen_shot(region=geometry.custom_capture_region)
     img.save(image_path)
     duration = time.time() - start_time
     return duration
 
 def process_image():
-    """图像处理"""
-    from core.api.client import APIClient
-    client = APIClient()
+    """图像处理（简单界面优先使用本地检测，置信度不足时调用远程解析服务）"""
+    from core.api.client import APIClient, ProcessResult
+    from core import local_detector
     start_time = time.time()
+    if local_detector.LOCAL_DETECTOR_ENABLED:
+        detection = local_detector.detect(config.SCREENSHOT_PATH)
+        if detection.confident:
+            result = ProcessResult(
+                status='success',
+                labeled_image=local_detector.draw_labels(config.SCREENSHOT_PATH, detection.elements),
+                parsed_content=detection.elements
+            )
+            return result, time.time() - start_time
+        logging.info(f"本地检测置信度{detection.confidence:.2f}不足，调用远程解析服务")
+
+    client = APIClient()
     result = client.process_image(
         image_path=config.SCREENSHOT_PATH,
         box_threshold=config.BOX_THRESHOLD,
@@ -140,58 +153,42 @@ def process_image():
     return result, duration
 
 def parse_data(result):
-    """解析数据"""
-    start_time = time.time()
-    objs = []
-    
+    """解析数据
+
+    Args:
+        result: 解析服务返回的parsed_content，可以是原生的元素列表/字典，也可以是字符串
+
+    Returns:
+        (元素表, 耗时)
+    """
+    from core.content_parser import parse_content
+
     # 处理空结果
-    if not result or not result.strip():
+    if not result or (isinstance(result, str) and not result.strip()):
         logging.warning("解析数据: 接收到空结果")
-        return [], time.time() - start_time
-    
-    # 使用正则表达式提取所有花括号内容
-    import re
-    pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-    matches = re.findall(pattern, result)
-    
-    for match in matches:
-        try:
-            try:
-                icon_data = json.loads(match)
-            except json.JSONDecodeError:
-                icon_data = ast.literal_eval(match)
-                
-            # 验证必要字段
-            if all(key in icon_data for key in ["type", "content", "bbox"]):
-                objs.append(icon_data)
-            else:
-                logging.warning(f"解析数据: 缺少必要字段 - {match[:50]}...")
-                
-        except Exception as e:
-            logging.error(f"解析错误: {str(e)[:100]} - 数据: {match[:50]}...")
-            continue
-
-    # 使用列表推导式
-    ret = [
-        {
-            "id": idx,
-            "type": obj["type"],
-            "content": obj["content"],
-            "bbox": obj["bbox"],
-        }
-        for idx, obj in enumerate(objs)
-    ]
+        empty = parse_content(None)
+        return empty.elements, empty.duration
+
+    ret, errors, duration = parse_content(result)
 
     # 记录解析结果统计
-    duration = time.time() - start_time
-    logging.info(f"解析数据: 成功解析 {len(ret)} 个对象，耗时 {duration:.2f}s")
-    
+    logging.info(f"解析数据: 成功解析 {len(ret)} 个对象，{len(errors)} 个片段格式错误，耗时 {duration:.2f}s")
+
     return ret, duration
 
+_model_parser = None
+
+def get_model_parser():
+    """获取共享的模型解析器，使响应缓存等状态在多次调用间保留"""
+    global _model_parser
+    if _model_parser is None:
+        from core.model_parser import ModelParser
+        _model_parser = ModelParser()
+    return _model_parser
+
 def parse_instruction(instruction, pre_actions, current_icons, analysis = "", type = "text"):
     """指令解析"""
-    from core.model_parser import ModelParser
-    model_parser = ModelParser()
+    model_parser = get_model_parser()
     start_time = time.time()
     if type == "text":
         action = model_parser.parse_instruction(
@@ -250,6 +247,9 @@ def execute_action(controller, action_data, objs, ifWorkFlw=False):
     # 初始化执行器
     executor = PyAutoGUIWrapper() if ifWorkFlw else controller
     log_prefix = "[Workflow]" if ifWorkFlw else "[SingleStep]"
+
+    if action_type == 'composite':
+        return _execute_composite_action(executor, final_action, objs, ifWorkFlw, log_prefix)
     
     try:
         # 获取坐标参数
@@ -285,6 +285,86 @@ def execute_action(controller, action_data, objs, ifWorkFlw=False):
         logging.error(f"{log_prefix} 执行失败: {str(e)}")
         raise e
 
+def _execute_composite_action(executor, final_action, objs, ifWorkFlw, log_prefix):
+    """依次执行组合操作中的子操作
+
+    每个子操作执行后重新截图并检查：
+    - input子操作：输入框附近的区域必须发生变化，否则输入没有落到目标上；
+      未显式要求回车的input不按回车，避免表单在填完所有字段前被提交
+    - 除最后一个外的子操作：与执行前的屏幕指纹比较，子操作只应改变局部内容，
+      若界面整体发生变化（弹窗、跳转），剩余子操作引用的元素已不可信
+    任一检查不通过即停止并返回partial，由调用方重新解析界面。
+
+    Returns:
+        与单个操作相同格式的结果，状态为success或partial；
+        final_action中的子操作列表仅保留实际执行的部分（含解析出的坐标）
+    """
+    from core.fingerprint import fingerprint
+    from core.geometry import get_geometry
+
+    sub_actions = (final_action.get('params') or {}).get('actions') or []
+    if not sub_actions or len(sub_actions) > MAX_COMPOSITE_ACTIONS:
+        raise ValueError(f"组合操作的子操作数应为1~{MAX_COMPOSITE_ACTIONS}，实际为{len(sub_actions)}")
+    invalid = [sub.get('action') for sub in sub_actions if sub.get('action') not in COMPOSITE_SUB_ACTIONS]
+    if invalid:
+        raise ValueError(f"组合操作不支持的子操作类型: {invalid}")
+
+    start_time = time.time()
+    # 与解析界面时相同的截图区域，区域外（其他窗口）的变化不影响判断
+    region = get_geometry().custom_capture_region
+    before = executor.screen_shot(use_cache=False, region=region)
+    baseline = fingerprint(before)
+    executed = []
+    status = "success"
+    for index, sub_action in enumerate(sub_actions):
+        is_last = index == len(sub_actions) - 1
+        if sub_action.get('action') == 'input':
+            sub_action = {**sub_action, 'params': {'press_enter': False, **(sub_action.get('params') or {})}}
+        result = execute_action(executor, sub_action, objs, ifWorkFlw)
+        executed.append(result[-1])
+        if is_last and sub_action.get('action') != 'input':
+            break
+
+        after = executor.screen_shot(use_cache=False, region=region)
+        problem = _check_sub_action_effect(result[-1], before, after, region)
+        if problem is None and not is_last:
+            current = fingerprint(after)
+            if not baseline.matches(current):
+                problem = f"界面发生意外变化(距离{baseline.distance(current)})"
+        if problem is not None:
+            status = "partial"
+            logging.warning(f"{log_prefix} 组合操作第{index + 1}/{len(sub_actions)}步后{problem}，停止执行剩余子操作")
+            break
+        before = after
+
+    params = {**final_action.get('params', {}), "actions": executed}
+    final_action = {**final_action, "params": params}
+    duration = time.time() - start_time
+    logging.info(f"{log_prefix} composite 执行{len(executed)}/{len(sub_actions)}个子操作，耗时: {duration:.2f}s")
+    return 'composite', final_action.get('target'), params, duration, status, final_action
+
+def _check_sub_action_effect(sub_action, before, after, region=None):
+    """检查子操作是否产生了预期效果，返回问题描述，没有问题时返回None
+
+    只有input有可观察的局部效果（输入框内的文字变化）；click与hotkey可能只改变焦点，不做局部检查。
+    region为截图覆盖的屏幕区域(left, top, width, height)，None表示整个主屏。
+    """
+    from core.fingerprint import crop_box, region_difference
+    from core.geometry import get_geometry
+
+    params = sub_action.get('params') or {}
+    if sub_action.get('action') != 'input' or params.get('x') is None or params.get('y') is None:
+        return None
+    region = region or get_geometry().primary.rect
+    x, y = get_geometry().screen_to_image(params['x'], params['y'], before.size, region)
+    scale = before.size[0] / region[2]
+    half_width, half_height = COMPOSITE_INPUT_REGION
+    box = crop_box(before.size, x, y, int(half_width * scale), int(half_height * scale))
+    difference = region_difference(before, after, box)
+    if difference < COMPOSITE_INPUT_CHANGE_THRESHOLD:
+        return f"输入框区域未发生变化(差异{difference:.2f})，输入可能未生效"
+    return None
+
 def _get_action_coordinates(action_type, target_icon, params, objs, executor, ifWorkFlw):
     """获取动作坐标"""
     from core.api import client
@@ -321,7 +401,8 @@ def _execute_core_action(executor, action_type, params, final_action, log_prefix
         'open': lambda: executor.open(params.get('x'), params.get('y')),
         'input': lambda: executor.input(
             params['text_content'],
-            params.get('x'), params.get('y')
+            params.get('x'), params.get('y'),
+            press_enter=params.get('press_enter', True)
         ),
         'scroll': lambda: executor.scroll(params['direction']),
         'hotkey': lambda: executor.hot_key(*params['key_sequence']),
@@ -348,8 +429,9 @@ def _execute_core_action(executor, action_type, params, final_action, log_prefix
         logging.error(f"{log_prefix} 操作执行失败: {str(e)}")
         raise 
 
-def compare_image_similarity(image1_path, image2_path):
+def compare_image_similarity(image1_path, image2_path, region=None):
     """比较图像相似度
+    region为归一化的(xmin, ymin, xmax, ymax)时只比较该区域
     返回包含SSIM、PSNR和MSE的字典，值范围：
     - SSIM: [-1, 1]（1表示完全相同）
     - PSNR: [0, ∞]（值越大越好，通常>30可认为相似）
@@ -365,6 +447,13 @@ def compare_image_similarity(image1_path, image2_path):
         # 加载并转换图像为灰度图
         img1 = Image.open(image1_path).convert('L')
         img2 = Image.open(image2_path).convert('L')
+
+        if region is not None:
+            img1, img2 = (
+                img.crop((int(region[0] * img.width), int(region[1] * img.height),
+                          int(region[2] * img.width), int(region[3] * img.height)))
+                for img in (img1, img2)
+            )
         
         # 统一图像尺寸
         if img1.size != img2.size:
@@ -399,24 +488,76 @@ def compare_image_similarity(image1_path, image2_path):
         }
 
 def get_all_windows_titles():
-    """获取所有窗口标题"""
-    import win32gui
-    def _enum_windows(hwnd, result):
-        result.append(win32gui.GetWindowText(hwnd))
-    windows = []
-    win32gui.EnumWindows(_enum_windows, windows)
-    return windows
-
-def generate_workflow(instruction):
-    """生成工作流"""
-    from core.model_parser import WorkFlowGenerator
-    model_parser = WorkFlowGenerator()
+    """获取所有窗口标题（来自窗口注册表的缓存）"""
+    from core.window_registry import get_window_registry
+    return get_window_registry().titles()
+
+_workflow_cache = None
+_state_graph = None
+_element_cache = None
+
+def get_workflow_cache():
+    """获取共享的工作流缓存"""
+    global _workflow_cache
+    if _workflow_cache is None:
+        from core.workflow_cache import WorkflowCache
+        _workflow_cache = WorkflowCache()
+    return _workflow_cache
+
+def get_state_graph():
+    """获取共享的界面状态转移图"""
+    global _state_graph
+    if _state_graph is None:
+        from core.state_graph import StateGraph
+        _state_graph = StateGraph()
+    return _state_graph
+
+def get_element_cache():
+    """获取共享的元素内容缓存"""
+    global _element_cache
+    if _element_cache is None:
+        from core.element_cache import ElementCache
+        _element_cache = ElementCache()
+    return _element_cache
+
+def generate_workflow(instruction, fuzzy=True):
+    """生成工作流（优先使用缓存）
+
+    Args:
+        fuzzy: 是否允许复用相似指令的缓存；生成结果不经用户确认直接执行时应为False
+    """
     start_time = time.time()
-    workflow = model_parser.generate_workflow(instruction)
-    workflow = robust_json_extract(workflow)
+    workflow = get_workflow_cache().get(instruction, fuzzy=fuzzy)
+    if workflow is None:
+        from core.model_parser import WorkFlowGenerator
+        model_parser = WorkFlowGenerator()
+        workflow = model_parser.generate_workflow(instruction)
+        workflow = robust_json_extract(workflow)
+        get_workflow_cache().put(instruction, workflow)
     duration = time.time() - start_time
     return workflow, duration
 
+def stream_workflow(instruction):
+    """流式生成工作流，每个步骤生成完毕即产出（优先使用缓存）
+
+    边生成边执行，不经用户确认，因此只复用精确命中的缓存；
+    生成期间若已有步骤执行失败并使该指令失效，生成结束后不写入缓存。
+    """
+    cache = get_workflow_cache()
+    workflow = cache.get(instruction, fuzzy=False)
+    if workflow is not None:
+        yield from workflow
+        return
+
+    from core.model_parser import WorkFlowGenerator
+    model_parser = WorkFlowGenerator()
+    version = cache.version
+    steps = []
+    for step in model_parser.stream_workflow(instruction):
+        steps.append(step)
+        yield step
+    cache.put(instruction, steps, since_version=version)
+
 def maximize_window(title, controller):
     """最大化指定窗口"""
     try:
@@ -426,6 +567,13 @@ def maximize_window(title, controller):
     except Exception as e:
         logging.error(f"最大化窗口失败: {str(e)}")
 
+def _wait_recorded_delay(seconds):
+    """回放录制的延迟：录制时的等待通常是在等界面加载，界面在此期间变化并稳定后即可继续，
+    始终无变化时等满录制的时长"""
+    from core.waits import ActionWatch
+    result = ActionWatch().wait(timeout=seconds)
+    logging.info(f"录制延迟{seconds}s，实际等待{result.elapsed:.2f}s")
+
 def _execute_core_action(executor, action_type, params, final_action, log_prefix):
     """执行核心操作逻辑"""
     from core.api import client
@@ -439,13 +587,14 @@ def _execute_core_action(executor, action_type, params, final_action, log_prefix
         'open': lambda: executor.open(params.get('x'), params.get('y')),
         'input': lambda: executor.input(
             params['text_content'],
-            params.get('x'), params.get('y')
+            params.get('x'), params.get('y'),
+            press_enter=params.get('press_enter', True)
         ),
         'scroll': lambda: executor.scroll(params['direction']),
         'hotkey': lambda: executor.hot_key(*params['key_sequence']),
         'press_enter': lambda: executor.press_enter(),
         'finish': lambda: None,
-        'delay': lambda: time.sleep(params.get('seconds', 1)),  # 添加延迟操作
+        'delay': lambda: _wait_recorded_delay(params.get('seconds', 1)),  # 添加延迟操作
         'move': lambda: executor.move_to(params.get('x'), params.get('y'))  # 添加鼠标移动操作
     }
 